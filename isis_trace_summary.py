@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+import sys
+import argparse
+from sciimg.isis3 import telemetry
+
+
+def format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1024.0:
+            return "%.1f%s"%(num_bytes, unit)
+        num_bytes /= 1024.0
+    return "%.1fTB"%num_bytes
+
+
+def print_summary(summary, title):
+    print("%-20s|%7s|%7s|%6s|%11s|%9s|%11s|%10s|%10s"%(title, "Calls", "Items", "Fail", "Wall (s)", "Max (s)", "CPU (s)", "Peak RSS", "Written"))
+    names = sorted(summary.keys(), key=lambda n: summary[n]["wall"], reverse=True)
+    for name in names:
+        s = summary[name]
+        print("%-20s|%7d|%7d|%6d|%11.2f|%9.2f|%11.2f|%10s|%10s"%(name,
+                                                                s["calls"],
+                                                                s["items"],
+                                                                s["failures"],
+                                                                s["wall"],
+                                                                s["wall_max"],
+                                                                s["cpu"],
+                                                                format_bytes(s["max_rss_kb"] * 1024),
+                                                                format_bytes(s["bytes_written"])))
+    print("")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--data", help="ISIS command trace file(s) (JSONL)", required=True, type=str, nargs='+')
+    parser.add_argument("-a", "--app", help="Only summarize per application", action="store_true")
+    parser.add_argument("-s", "--stage", help="Only summarize per pipeline stage", action="store_true")
+    args = parser.parse_args()
+
+    records = []
+    for trace_file in args.data:
+        records += telemetry.load_trace(trace_file)
+
+    if len(records) == 0:
+        print("No trace records found")
+        sys.exit(1)
+
+    show_all = not args.app and not args.stage
+
+    if args.app or show_all:
+        print_summary(telemetry.summarize(records, key="app"), "Application")
+    if args.stage or show_all:
+        print_summary(telemetry.summarize(records, key="stage"), "Stage")
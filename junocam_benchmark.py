@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+Times the JunoCam raw image conversion steps on a synthetic image, against the per-pixel loops
+they replaced. The loops are slow, so they're timed on the first --reference-lines lines and
+scaled up to the full image.
+"""
+import sys
+import time
+import argparse
+import numpy as np
+from sciimg.pipelines.junocam import decompanding
+
+
+JUNOCAM_RAW_WIDTH = 1648
+TRIPLET_LINES = 384
+
+
+def synthetic_image(lines, seed=0):
+    """
+    8 bit companded values, mostly dark sky with a brighter limb, as uint8
+    """
+    rng = np.random.RandomState(seed)
+    img = rng.normal(40.0, 25.0, (lines, JUNOCAM_RAW_WIDTH))
+    img[:, JUNOCAM_RAW_WIDTH // 3:] += rng.uniform(0, 150, (lines, JUNOCAM_RAW_WIDTH - JUNOCAM_RAW_WIDTH // 3))
+    return np.clip(np.rint(img), 0, 255).astype(np.uint8)
+
+
+def reference_decompand(img_data, table=decompanding.CompandingTableEnum.SQROOT):
+    ctable = decompanding.companding_table(table)
+    for a in range(0, len(img_data)):
+        for b in range(0, len(img_data[a])):
+            img_data[a][b] = ctable[int(round(img_data[a][b]))]
+
+
+def time_call(func, repeat=1):
+    best = None
+    for i in range(0, repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_decompand(img, reference_lines, repeat):
+    reference = img[:reference_lines].astype(np.float32)
+    loop_time = time_call(lambda: reference_decompand(reference.copy()))
+
+    float_img = img.astype(np.float32)
+    results = [
+        ("loop", loop_time * img.shape[0] / float(reference_lines)),
+        ("in place (float32)", time_call(lambda: decompanding.decompand(float_img.copy()), repeat)),
+        ("copy (uint8)", time_call(lambda: decompanding.decompanded(img), repeat))
+    ]
+
+    check = reference.copy()
+    reference_decompand(check)
+    if not np.array_equal(check, decompanding.decompanded(img[:reference_lines])):
+        print("decompand: vectorized result differs from the loop")
+        sys.exit(1)
+    return results
+
+
+def bench_radiometry(img, reference_lines, repeat):
+    from sciimg.processes import junocam_conversions
+    weights = (0.902, 1.0, 1.8879)
+    max_value = float(decompanding.SQROOT[-1]) * max(weights)
+
+    def general(raw):
+        image_data = raw.astype(np.float32)
+        decompanding.decompand(image_data)
+        junocam_conversions.apply_weights(image_data, *weights)
+        image_data /= max_value
+        junocam_conversions.convert_to_srgb(image_data)
+        image_data *= max_value
+        return image_data
+
+    def fused(raw):
+        luts = junocam_conversions.radiometric_luts(True, *weights, max_value=max_value)
+        return junocam_conversions.apply_radiometric_luts(raw, luts)
+
+    reference = img[:reference_lines]
+    results = [
+        ("separate steps", time_call(lambda: general(reference)) * img.shape[0] / float(reference_lines)),
+        ("lookup tables", time_call(lambda: fused(img), repeat))
+    ]
+    if not np.array_equal(general(reference), fused(reference)):
+        print("radiometry: lookup tables differ from the separate steps")
+        sys.exit(1)
+    return results
+
+
+def reference_srgb(img_data):
+    for a in range(0, len(img_data)):
+        for b in range(0, len(img_data[a])):
+            c = img_data[a][b]
+            if c < 0.0031308:
+                c = c * 12.92
+            else:
+                c = c ** (1.0 / 2.4) * 1.055 - 0.055
+            img_data[a][b] = c
+
+
+def bench_srgb(img, reference_lines, repeat):
+    from sciimg.processes import junocam_conversions
+    linear = img.astype(np.float32) / 255.0
+    reference = linear[:reference_lines].copy()
+    results = [
+        ("loop", time_call(lambda: reference_srgb(reference.copy())) * img.shape[0] / float(reference_lines)),
+        ("vectorized", time_call(lambda: junocam_conversions.convert_to_srgb(linear.copy()), repeat)),
+        ("vectorized, by triplet", time_call(lambda: junocam_conversions.convert_to_srgb(linear.copy(), chunk_lines=TRIPLET_LINES), repeat))
+    ]
+    check = linear[:reference_lines].copy()
+    junocam_conversions.convert_to_srgb(check)
+    reference_srgb(reference)
+    if not np.allclose(check, reference, rtol=1e-6, atol=1e-7):
+        print("srgb: vectorized result differs from the loop")
+        sys.exit(1)
+    return results
+
+
+def reference_fill_dead_pixel(data, band_num, band_id, band_height=TRIPLET_LINES // 3):
+    from sciimg.pipelines.junocam.corrections import DEAD_PIXEL_MAP
+    top = band_num * band_height
+    for cx, cy, radius in DEAD_PIXEL_MAP[band_id]:
+        cy += top
+        for y in range(-radius, radius):
+            for x in range(-radius, radius):
+                if cy + y >= len(data) or cx + radius > len(data[cy + y]):
+                    continue
+                try:
+                    x0 = data[cy + y][cx - radius]
+                    x1 = data[cy + y][cx + radius]
+                    y0 = data[cy - radius][cx + x]
+                    y1 = data[cy + radius][cx + x]
+                    fx = ((x + radius) / (radius * 2.0))
+                    fy = ((y + radius) / (radius * 2.0))
+                    ix = (x0 * fx) + (x1 * (1.0 - fx))
+                    iy = (y0 * fy) + (y1 * (1.0 - fy))
+                    data[cy + y][cx + x] = np.mean([ix, iy])
+                except:
+                    pass
+
+
+def reference_fillpixels(img_data):
+    for triplet in range(0, img_data.shape[0] // TRIPLET_LINES):
+        for band_id in range(0, 3):
+            reference_fill_dead_pixel(img_data, triplet * 3 + band_id, band_id)
+
+
+def bench_fill(img, reference_lines, repeat):
+    from sciimg.pipelines.junocam import fillpixels
+    reference_lines = max(TRIPLET_LINES, reference_lines - reference_lines % TRIPLET_LINES)
+    reference = img[:reference_lines].copy()
+    filled = img.copy()
+    results = [
+        ("loop", time_call(lambda: reference_fillpixels(reference.copy())) * img.shape[0] / float(reference_lines)),
+        ("stencils", time_call(lambda: fillpixels.fillpixels(filled), repeat))
+    ]
+    reference = img[:reference_lines].copy()
+    check = reference.copy()
+    fillpixels.fillpixels(check)
+    reference_fillpixels(reference)
+    if not np.array_equal(check, reference):
+        print("fill: stencil result differs from the loop")
+        sys.exit(1)
+    return results
+
+
+def reference_fix_flipped_bits(image_data):
+    from scipy import signal
+    md = signal.medfilt2d(image_data, kernel_size=3)
+    for a in range(1, image_data.shape[0] - 1):
+        for b in range(1, image_data.shape[1] - 1):
+            if abs(image_data[a][b] - md[a][b]) > 10.0:
+                image_data[a][b] = np.nan
+    for a in range(1, image_data.shape[0] - 1):
+        x = image_data[a]
+        not_nan = np.logical_not(np.isnan(x))
+        indices = np.arange(len(x))
+        image_data[a] = np.interp(indices, indices[not_nan], x[not_nan])
+
+
+def bench_flippedbits(img, reference_lines, repeat):
+    from sciimg.pipelines.junocam import flippedbits
+    float_img = img.astype(np.float32)
+    reference = float_img[:reference_lines].copy()
+    results = [
+        ("loop", time_call(lambda: reference_fix_flipped_bits(reference.copy())) * img.shape[0] / float(reference_lines)),
+        ("vectorized, 1 thread", time_call(lambda: flippedbits.fix_flipped_bits(float_img.copy(), num_threads=1), repeat)),
+        ("vectorized, threaded", time_call(lambda: flippedbits.fix_flipped_bits(float_img.copy()), repeat))
+    ]
+    check = reference.copy()
+    flippedbits.fix_flipped_bits(check)
+    reference_fix_flipped_bits(reference)
+    if not np.array_equal(check, reference):
+        print("flippedbits: vectorized result differs from the loop")
+        sys.exit(1)
+    return results
+
+
+BENCHMARKS = {
+    "decompand": bench_decompand,
+    "fill": bench_fill,
+    "flippedbits": bench_flippedbits,
+    "radiometry": bench_radiometry,
+    "srgb": bench_srgb
+}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-b", "--benchmark", help="Benchmark(s) to run", required=False, type=str, nargs='+', choices=sorted(BENCHMARKS.keys()), default=sorted(BENCHMARKS.keys()))
+    parser.add_argument("-l", "--lines", help="Lines in the synthetic image", required=False, type=int, default=66 * TRIPLET_LINES)
+    parser.add_argument("-L", "--reference-lines", help="Lines the per-pixel loops are timed on", required=False, type=int, default=TRIPLET_LINES)
+    parser.add_argument("-r", "--repeat", help="Best of this many runs", required=False, type=int, default=3)
+    args = parser.parse_args()
+
+    img = synthetic_image(args.lines)
+    reference_lines = min(args.reference_lines, args.lines)
+    print("Synthetic image: %d x %d"%(img.shape[1], img.shape[0]))
+
+    for name in args.benchmark:
+        results = BENCHMARKS[name](img, reference_lines, args.repeat)
+        loop_time = results[0][1]
+        print("%s:"%name)
+        for label, elapsed in results:
+            print("    %-24s %9.3f s  %8.1fx"%(label, elapsed, loop_time / elapsed if elapsed > 0 else float("inf")))
@@ -11,11 +11,7 @@ from sciimg.processes.match import get_files_min_max_values
 
 
 def calc_min_max_multi_cubs(data_inputs, bands=[1, 3, 5], is_verbose=False):
-    check_bands = []
-    for data_input in data_inputs:
-        for band in bands:
-            check_bands.append("%s+%s"%(data_input, band))
-    min_value, max_value = get_files_min_max_values(check_bands, is_verbose=is_verbose)
+    min_value, max_value = get_files_min_max_values(data_inputs, is_verbose=is_verbose, bands=bands)
     return min_value, max_value
 
 def calc_min_max(data_input, bands=[1, 3, 5], is_verbose=False):
@@ -9,6 +9,9 @@ import types
 
 from sciimg.processes.process import process_data_file
 from sciimg.isis3 import _core
+from sciimg.isis3 import telemetry
+from sciimg.isis3 import stagecache
+from sciimg.isis3 import scratch
 
 def print_if_verbose(s, is_verbose=True):
     if is_verbose:
@@ -36,9 +39,27 @@ if __name__ == "__main__":
     parser.add_argument("-n", "--nocleanup", help="Don't clean up, leave temp files", action="store_true")
 
     parser.add_argument("-o", "--option", help="Mission-specific option(s)", required=False, type=str, nargs='+')
+    parser.add_argument("-T", "--trace", help="Record ISIS command performance to a JSONL trace file", required=False, type=str)
+    parser.add_argument("-C", "--cache-dir", help="Reuse ISIS stage results from this cache directory (shared across runs)", required=False, type=str)
+    parser.add_argument("--cache-size", help="Stage cache size limit in GB", required=False, type=float, default=20.0)
+    parser.add_argument("--scratch", help="Directory for intermediate files (e.g. /dev/shm or a local disk)", required=False, type=str)
+    parser.add_argument("--scratch-budget", help="Scratch space limit in GB", required=False, type=float)
+    parser.add_argument("--scratch-spill", help="Directory for intermediate files once the scratch budget is used", required=False, type=str)
+    parser.add_argument("--resume", help="Keep the work files of a failed run and carry on from its last completed step", action="store_true")
 
     args = parser.parse_args()
 
+    if args.trace is not None:
+        telemetry.set_trace_file(args.trace)
+    if args.cache_dir is not None:
+        stagecache.set_cache_dir(args.cache_dir, int(args.cache_size * 1024 * 1024 * 1024), verbose=args.verbose)
+    if args.scratch is not None:
+        scratch.set_scratch_dir(args.scratch,
+                                int(args.scratch_budget * 1024 * 1024 * 1024) if args.scratch_budget is not None else None,
+                                args.scratch_spill)
+    if args.resume is True:
+        scratch.set_resume(True)
+
     source = args.data
 
     metadata_only = args.metadata
@@ -9,6 +9,10 @@ import zipfile
 from shutil import copyfile
 from sciimg.isis3 import info
 from sciimg.isis3 import _core
+from sciimg.isis3 import telemetry
+from sciimg.isis3 import stagecache
+from sciimg.isis3 import scratch
+from sciimg.isis3 import workers
 from sciimg.processes.junocam_conversions import png_to_img
 from sciimg.pipelines.junocam import processing
 from sciimg.pipelines.junocam import jcspice
@@ -91,9 +95,29 @@ if __name__ == "__main__":
     parser.add_argument("-l", "--linear", help="Use linear colorspace for output", action="store_true")
     parser.add_argument("-L", "--limitlon", help="Limit longitude 360 degrees", action="store_true")
     parser.add_argument("-B", "--fixbiterror", help="Detect and fix flipped bits", action="store_true")
+    parser.add_argument("-T", "--trace", help="Record ISIS command performance to a JSONL trace file", required=False, type=str)
+    parser.add_argument("-C", "--cache-dir", help="Reuse ISIS stage results from this cache directory (shared across runs)", required=False, type=str)
+    parser.add_argument("--cache-size", help="Stage cache size limit in GB", required=False, type=float, default=20.0)
+    parser.add_argument("--scratch", help="Directory for intermediate files (e.g. /dev/shm or a local disk)", required=False, type=str)
+    parser.add_argument("--scratch-budget", help="Scratch space limit in GB", required=False, type=float)
+    parser.add_argument("--scratch-spill", help="Directory for intermediate files once the scratch budget is used", required=False, type=str)
+    parser.add_argument("--roi", help="Only process this region (planetocentric degrees, positive east)", required=False, type=float, nargs=4, metavar=("MINLAT", "MAXLAT", "MINLON", "MAXLON"))
+    parser.add_argument("--resume", help="Keep the work files of a failed run and carry on from its last completed step", action="store_true")
+    parser.add_argument("-P", "--preview", help="Quick look: map project N (default 4) times coarser than the camera resolution and skip the model", required=False, type=int, nargs='?', const=4, metavar="N")
 
     args = parser.parse_args()
 
+    if args.trace is not None:
+        telemetry.set_trace_file(args.trace)
+    if args.cache_dir is not None:
+        stagecache.set_cache_dir(args.cache_dir, int(args.cache_size * 1024 * 1024 * 1024), verbose=args.verbose)
+    if args.scratch is not None:
+        scratch.set_scratch_dir(args.scratch,
+                                int(args.scratch_budget * 1024 * 1024 * 1024) if args.scratch_budget is not None else None,
+                                args.scratch_spill)
+    if args.resume is True:
+        scratch.set_resume(True)
+
     is_verbose = args.verbose
     nocleanup = args.nocleanup
     fill_dead_pixels = args.fill
@@ -111,6 +135,15 @@ if __name__ == "__main__":
     linear_colorspace = args.linear
     limit_longitude = args.limitlon
     fix_bit_error = args.fixbiterror
+    roi = args.roi
+    preview = args.preview
+
+    if roi is not None and (roi[0] >= roi[1] or roi[2] >= roi[3]):
+        print("Invalid region of interest:", roi)
+        sys.exit(1)
+    if preview is not None and preview < 1:
+        print("Invalid preview factor:", preview)
+        sys.exit(1)
 
     additional_options = {}
 
@@ -139,6 +172,7 @@ if __name__ == "__main__":
         label_file = predicted_label_file
         img_file = predicted_img_file
     else:
+        telemetry.set_stage("png_to_img")
         label_file, img_file, max_value = png_to_img(png_file, metadata_file,
                                            fill_dead_pixels=fill_dead_pixels,
                                            do_decompand=do_decompand,
@@ -161,8 +195,9 @@ if __name__ == "__main__":
     product_id = info.get_product_id(label_file)
     cube_file_red = "%s_%s_Mosaic.cub" % (product_id, "RED")
 
-    out_file_map_rgb_cub = "%s_Mosaic_RGB.cub" % product_id
-    out_file_map_rgb_tiff = "%s_Mosaic_RGB.tif" % product_id
+    output_suffix = "_Preview" if preview is not None else ""
+    out_file_map_rgb_cub = "%s_Mosaic_RGB%s.cub" % (product_id, output_suffix)
+    out_file_map_rgb_tiff = "%s_Mosaic_RGB%s.tif" % (product_id, output_suffix)
 
     if not (skip_existing and os.path.exists(out_file_map_rgb_cub) and os.path.exists(out_file_map_rgb_tiff)):
         out_file_map_rgb_tiff = processing.process_pds_data_file(label_file,
@@ -173,7 +208,16 @@ if __name__ == "__main__":
                                                                  additional_options=additional_options,
                                                                  num_threads=num_threads,
                                                                  max_value=max_value,
-                                                                 limit_longitude=limit_longitude)
+                                                                 limit_longitude=limit_longitude,
+                                                                 roi=roi,
+                                                                 preview=preview)
+
+    if preview is not None:
+        telemetry.print_stage_times("Stage timings (preview, 1/%d resolution)"%preview)
+        workers.shutdown()
+        if os.path.exists("print.prt"):
+            os.unlink("print.prt")
+        sys.exit(0)
 
     if is_verbose:
         print("Creating output model...")
@@ -183,6 +227,7 @@ if __name__ == "__main__":
     if is_verbose:
         print("Creating Wavefront OBJ file: %s"%obj_file_path)
 
+    telemetry.set_stage("model")
     model_spec_dict = modeling.create_obj(label_file, out_file_map_rgb_cub, obj_file_path, scalar=scalar, verbose=is_verbose, limit_longitude=limit_longitude)
 
     model_spec_dict["rgb_map_tiff"] = out_file_map_rgb_tiff
@@ -192,5 +237,10 @@ if __name__ == "__main__":
     f.write(json.dumps(model_spec_dict, indent=4))
     f.close()
 
+    telemetry.set_stage(None)
+    telemetry.print_stage_times("Stage timings (full)")
+
+    workers.shutdown()
+
     if os.path.exists("print.prt"):
         os.unlink("print.prt")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+import os
+import sys
+import argparse
+from sciimg.isis3 import _core
+from sciimg.isis3 import telemetry
+from sciimg.processes import campaign
+
+
+if __name__ == "__main__":
+
+    try:
+        _core.is_isis3_initialized()
+    except:
+        print("ISIS3 has not been initialized. Please do so. Now.")
+        sys.exit(1)
+
+    parser = argparse.ArgumentParser(description="Runs process_junocam.py over many products concurrently. Arguments after '--' are passed on to process_junocam.py.")
+    parser.add_argument("-d", "--data", help="Product directories or zip files", required=True, type=str, nargs='+')
+    parser.add_argument("-j", "--jobs", help="Maximum number of products processed at once", required=False, type=int)
+    parser.add_argument("-c", "--cpus", help="CPU budget (cores)", required=False, type=int)
+    parser.add_argument("-M", "--memory", help="Memory budget in GB", required=False, type=float)
+    parser.add_argument("-D", "--disk", help="Disk budget in GB", required=False, type=float)
+    parser.add_argument("--product-memory", help="Expected peak memory of a product in GB", required=False, type=float, default=4.0)
+    parser.add_argument("--product-disk", help="Expected disk use of a product in GB", required=False, type=float, default=20.0)
+    parser.add_argument("-s", "--skipexisting", help="Skip products that already have a mosaic (also passes -S on)", action="store_true")
+    parser.add_argument("-r", "--retries", help="Times to retry a failed product", required=False, type=int, default=1)
+    parser.add_argument("-J", "--summary", help="Write a JSON summary of the run to this file", required=False, type=str)
+    parser.add_argument("-T", "--trace", help="Record ISIS command performance to a JSONL trace file", required=False, type=str)
+    parser.add_argument("-v", "--verbose", help="Verbose output", action="store_true")
+
+    argv = sys.argv[1:]
+    script_args = []
+    if "--" in argv:
+        script_args = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+    args = parser.parse_args(argv)
+
+    if args.trace is not None:
+        telemetry.set_trace_file(args.trace)
+
+    gb = 1024 * 1024 * 1024
+    budget = campaign.Budget(cpus=args.cpus,
+                             memory=int(args.memory * gb) if args.memory is not None else None,
+                             disk=int(args.disk * gb) if args.disk is not None else None,
+                             max_jobs=args.jobs,
+                             product_memory=int(args.product_memory * gb),
+                             product_disk=int(args.product_disk * gb))
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "process_junocam.py")
+    command = [sys.executable, script] + script_args
+    if args.skipexisting and "-S" not in script_args:
+        command.append("-S")
+
+    products = campaign.find_products(args.data)
+    summary_file = os.path.abspath(args.summary) if args.summary is not None else None
+    campaign.run_campaign(products, command, budget, retries=args.retries, skip_existing=args.skipexisting, summary_file=summary_file, verbose=args.verbose)
+
+    failed = [p for p in products if p.status == "failed"]
+    for product in failed:
+        print("Failed: %s (see %s)"%(product.name, product.log_file))
+    print("%d products: %d ok, %d skipped, %d failed"%(len(products),
+                                                        len([p for p in products if p.status == "ok"]),
+                                                        len([p for p in products if p.status == "skipped"]),
+                                                        len(failed)))
+    sys.exit(1 if len(failed) > 0 else 0)
@@ -1,6 +1,12 @@
 import subprocess
 import sys
 import os
+import time
+import tempfile
+import asyncio
+import multiprocessing
+from sciimg.isis3 import telemetry
+from sciimg.isis3 import stagecache
 
 """
 Note: Probably need a better check than just looking at two environment variables
@@ -37,10 +43,147 @@ def printProgress (iteration, total, prefix = '', suffix = '', decimals = 1, bar
     sys.stdout.flush()
 
 
+"""
+Runs a child process to completion, returning its combined stdout/stderr, exit code, resource
+usage (for that child only, via wait4) and wall time.
+"""
+def __run_process(proc_cmd):
+    start = time.time()
+    proc = subprocess.Popen(proc_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = proc.stdout.read()
+    proc.stdout.close()
+
+    if hasattr(os, "wait4"):
+        pid, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    else:
+        proc.wait()
+        rusage = None
+
+    return output, proc.returncode, rusage, time.time() - start
+
+
+"""
+ISIS appends every application's session log to print.prt in the current directory. If
+SCIIMG_ISIS_PREFERENCES names a preference file, it's passed to each application with -preference
+so that a pipeline run can send that log to its own work directory (see sciimg.isis3.scratch).
+"""
+ISIS_PREFERENCES_ENV = "SCIIMG_ISIS_PREFERENCES"
+
+
+def preference_args():
+    if ISIS_PREFERENCES_ENV in os.environ:
+        return ["-preference=%s"%os.environ[ISIS_PREFERENCES_ENV]]
+    return []
+
+
+def __isis_command(cmd, params):
+    proc_cmd = [cmd] + ["%s=%s"%(k, params[k]) for k in params.keys()] + preference_args()
+    output, returncode, rusage, wall_time = __run_process(proc_cmd)
+    return __command_result(cmd, params, proc_cmd, output, returncode, rusage, wall_time)
+
+
+def __command_result(cmd, params, proc_cmd, output, returncode, rusage, wall_time):
+    if telemetry.is_enabled():
+        telemetry.record(cmd, params, wall_time, rusage, returncode, telemetry.output_size(params))
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, proc_cmd, output=output)
+    return str(output, "UTF-8")
+
+
 def isis_command(cmd, params):
-    proc_cmd = [cmd] + ["%s=%s"%(k, params[k]) for k in params.keys()]
-    s = subprocess.check_output(proc_cmd, stderr=subprocess.STDOUT)
-    return str(s, "UTF-8")
+    if stagecache.is_cacheable(cmd):
+        return stagecache.run_cached(cmd, params, __isis_command)
+    return __isis_command(cmd, params)
+
+
+"""
+Asynchronous ISIS commands. These run ISIS from an asyncio event loop rather than from a pool of
+forked python workers, with a process wide semaphore bounding how many ISIS processes run at once.
+The limit is the CPU count, reduced if available memory can't hold that many ISIS processes, and
+can be set with the SCIIMG_MAX_ISIS_PROCS environment variable.
+"""
+MAX_ISIS_PROCS_ENV = "SCIIMG_MAX_ISIS_PROCS"
+ISIS_PROCESS_MEMORY = 1024 * 1024 * 1024
+
+__ISIS_SEMAPHORE__ = None
+
+
+def available_memory():
+    # MemAvailable counts reclaimable page cache, which SC_AVPHYS_PAGES doesn't
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_concurrency():
+    if MAX_ISIS_PROCS_ENV in os.environ:
+        return max(1, int(os.environ[MAX_ISIS_PROCS_ENV]))
+
+    limit = multiprocessing.cpu_count()
+    available = available_memory()
+    if available is not None:
+        limit = min(limit, int(available / ISIS_PROCESS_MEMORY))
+    return max(1, limit)
+
+
+def get_isis_semaphore(max_procs=None):
+    """
+    The semaphore for the running event loop (asyncio semaphores can't be shared between loops).
+    max_procs lowers the limit for the loop (a -t/--threads option, say). It replaces the loop's
+    semaphore, so it's given before any ISIS command starts on the loop.
+    """
+    global __ISIS_SEMAPHORE__
+    loop = asyncio.get_running_loop()
+    if __ISIS_SEMAPHORE__ is None or __ISIS_SEMAPHORE__[0] is not loop or max_procs is not None:
+        limit = default_concurrency()
+        if max_procs is not None:
+            limit = max(1, min(limit, max_procs))
+        __ISIS_SEMAPHORE__ = (loop, asyncio.Semaphore(limit))
+    return __ISIS_SEMAPHORE__[1]
+
+
+"""
+The child is started and reaped by __run_process in a thread of the loop's executor, rather than
+with asyncio.create_subprocess_exec, so that wait4 can give its resource usage for the trace.
+asyncio's child watcher only watches the processes it starts, so nothing else reaps it first.
+"""
+async def __run_process_async(proc_cmd):
+    async with get_isis_semaphore():
+        return await asyncio.get_running_loop().run_in_executor(None, __run_process, proc_cmd)
+
+
+async def __isis_command_async(cmd, params):
+    proc_cmd = [cmd] + ["%s=%s"%(k, params[k]) for k in params.keys()] + preference_args()
+    output, returncode, rusage, wall_time = await __run_process_async(proc_cmd)
+    return __command_result(cmd, params, proc_cmd, output, returncode, rusage, wall_time)
+
+
+async def isis_command_async(cmd, params):
+    if not stagecache.is_cacheable(cmd):
+        return await __isis_command_async(cmd, params)
+
+    try:
+        key = stagecache.cache_key(cmd, params)
+    except (IOError, OSError):
+        key = None
+    output = stagecache.fetch(cmd, params, key) if key is not None else None
+    if output is not None:
+        return output
+
+    output = await __isis_command_async(cmd, params)
+    if key is not None:
+        stagecache.store(cmd, params, key, output)
+    return output
 
 
 def is_any_not_none(values):
@@ -48,3 +191,176 @@ def is_any_not_none(values):
         if f is not None:
             return True
     return False
+
+
+DEFAULT_BATCH_CHUNK_SIZE = 64
+BATCH_DELIMITER = ","
+
+
+class BatchResult:
+
+    def __init__(self, params, error=None, output=None):
+        self.params = params
+        self.error = error
+        self.output = output
+
+    def is_ok(self):
+        return self.error is None
+
+
+def __chunks(items, chunk_size):
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def __batch_template(param_list):
+    keys = list(param_list[0].keys())
+    for params in param_list:
+        if set(params.keys()) != set(keys):
+            raise Exception("All parameter sets in a batch must use the same parameters")
+
+    constant = []
+    varying = []
+    for k in keys:
+        values = set([str(params[k]) for params in param_list])
+        if len(values) == 1:
+            constant.append(k)
+        else:
+            varying.append(k)
+
+    # A batch list needs at least one column
+    if len(varying) == 0:
+        varying.append(constant.pop(0))
+
+    for k in varying:
+        for params in param_list:
+            v = str(params[k])
+            if BATCH_DELIMITER in v or "\n" in v:
+                raise Exception("Batch parameter value '%s' contains the batch delimiter"%v)
+
+    return constant, varying
+
+
+class _Batch:
+    """
+    One -batchlist run: the command line, its list file and error list
+    """
+
+    def __init__(self, cmd, param_list, template):
+        self.cmd = cmd
+        self.param_list = param_list
+        self.constant, self.varying = template
+        self.lines = [BATCH_DELIMITER.join([str(params[k]) for k in self.varying]) for params in param_list]
+
+        list_fd, self.list_file = tempfile.mkstemp(suffix=".lis")
+        err_fd, self.err_file = tempfile.mkstemp(suffix=".err")
+        os.close(err_fd)
+        os.unlink(self.err_file)
+
+        with os.fdopen(list_fd, "w") as f:
+            for line in self.lines:
+                f.write(line)
+                f.write("\n")
+
+        self.proc_cmd = [cmd]
+        self.proc_cmd += ["%s=%s"%(k, param_list[0][k]) for k in self.constant]
+        self.proc_cmd += ["%s=$%d"%(k, i + 1) for i, k in enumerate(self.varying)]
+        self.proc_cmd += ["-batchlist=%s"%self.list_file,
+                          "-errlist=%s"%self.err_file,
+                          "-onerror=continue",
+                          "-delimiter=%s"%BATCH_DELIMITER]
+        self.proc_cmd += preference_args()
+
+    def results(self, output, returncode, rusage, wall_time):
+        output = str(output, "UTF-8")
+        failed_run = output if returncode != 0 else None
+
+        if telemetry.is_enabled():
+            trace_params = dict([(k, self.param_list[0][k]) for k in self.constant])
+            trace_params.update(dict([(k, "$%d"%(i + 1)) for i, k in enumerate(self.varying)]))
+            bytes_written = sum([telemetry.output_size(params) for params in self.param_list])
+            telemetry.record(self.cmd, trace_params, wall_time, rusage, returncode, bytes_written, batch_size=len(self.param_list))
+
+        failed_lines = []
+        if os.path.exists(self.err_file):
+            with open(self.err_file, "r") as f:
+                failed_lines = [line.strip() for line in f.readlines() if len(line.strip()) > 0]
+
+        if failed_run is not None and len(failed_lines) == 0:
+            # The run failed without telling us which items did. Treat them all as failed.
+            return [BatchResult(params, error=failed_run, output=output) for params in self.param_list]
+
+        results = []
+        for line, params in zip(self.lines, self.param_list):
+            error = output if line.strip() in failed_lines else None
+            results.append(BatchResult(params, error=error, output=output))
+        return results
+
+    def failed(self, ex):
+        return [BatchResult(params, error=str(ex)) for params in self.param_list]
+
+    def cleanup(self):
+        os.unlink(self.list_file)
+        if os.path.exists(self.err_file):
+            os.unlink(self.err_file)
+
+
+def __run_batch(cmd, param_list):
+    batch = _Batch(cmd, param_list, __batch_template(param_list))
+    try:
+        try:
+            output, returncode, rusage, wall_time = __run_process(batch.proc_cmd)
+        except OSError as ex:
+            return batch.failed(ex)
+        return batch.results(output, returncode, rusage, wall_time)
+    finally:
+        batch.cleanup()
+
+
+def __cache_lookup(cmd, param_list):
+    """
+    Restores cached items. Returns the results so far (None for misses), the cache keys and the
+    indexes of the items still to run.
+    """
+    results = [None] * len(param_list)
+    keys = [None] * len(param_list)
+    misses = []
+    for i, params in enumerate(param_list):
+        try:
+            keys[i] = stagecache.cache_key(cmd, params)
+        except (IOError, OSError):
+            keys[i] = None
+        output = stagecache.fetch(cmd, params, keys[i]) if keys[i] is not None else None
+        if output is not None:
+            results[i] = BatchResult(params, output=output)
+        else:
+            misses.append(i)
+    return results, keys, misses
+
+
+def __cache_store(cmd, param_list, results, keys, misses, run_results):
+    for i, result in zip(misses, run_results):
+        if result.is_ok() and keys[i] is not None:
+            stagecache.store(cmd, param_list[i], keys[i], result.output)
+        results[i] = result
+    return results
+
+
+def isis_command_batch(cmd, param_list, chunk_size=DEFAULT_BATCH_CHUNK_SIZE):
+    """
+    Runs one ISIS application over a list of parameter dicts using -batchlist, so that ISIS
+    startup is paid once per chunk rather than once per file. Parameters with the same value
+    for every item are passed on the command line, the rest through the batch list. Returns a
+    BatchResult per parameter dict, in order. A failed item doesn't stop the rest of the batch.
+    Items with a result in the stage cache are restored instead of being run.
+    """
+    if not stagecache.is_cacheable(cmd):
+        results = []
+        for chunk in __chunks(param_list, chunk_size):
+            results += __run_batch(cmd, chunk)
+        return results
+
+    results, keys, misses = __cache_lookup(cmd, param_list)
+    run_results = []
+    for chunk in __chunks([param_list[i] for i in misses], chunk_size):
+        run_results += __run_batch(cmd, chunk)
+    return __cache_store(cmd, param_list, results, keys, misses, run_results)
@@ -1,9 +1,11 @@
 from sciimg.isis3._core import isis_command
 from sciimg.isis3._core import is_any_not_none
+from sciimg.isis3._core import isis_command_batch
+from sciimg.isis3._core import isis_command_async
 import os
 
 
-def spiceinit(from_cube, is_ringplane=False, spkpredict=False, ckpredicted=False, cknadir=False, web=False):
+def __spiceinit_params(from_cube, is_ringplane=False, spkpredict=False, ckpredicted=False, cknadir=False, web=False):
     params = {
         "from": from_cube
     }
@@ -23,11 +25,28 @@ def spiceinit(from_cube, is_ringplane=False, spkpredict=False, ckpredicted=False
     if is_ringplane is True:
         params["shape"] = "ringplane"
 
-    s = isis_command("spiceinit", params)
+    return params
+
+
+def spiceinit(from_cube, is_ringplane=False, spkpredict=False, ckpredicted=False, cknadir=False, web=False):
+    s = isis_command("spiceinit", __spiceinit_params(from_cube, is_ringplane, spkpredict, ckpredicted, cknadir, web))
     return s
 
 
-def cam2map(from_cube, to_cube, projection="equirectangular", map=None, resolution="CAMERA", minlat=None, maxlat=None, minlon=None, maxlon=None, defaultrange="CAMERA", band=-1):
+async def spiceinit_async(from_cube, is_ringplane=False, spkpredict=False, ckpredicted=False, cknadir=False, web=False):
+    s = await isis_command_async("spiceinit", __spiceinit_params(from_cube, is_ringplane, spkpredict, ckpredicted, cknadir, web))
+    return s
+
+
+"""
+Runs spiceinit over a list of cubes through ISIS batch mode. Returns a list of BatchResult, in order.
+"""
+def spiceinit_batch(from_cubes, is_ringplane=False, spkpredict=False, ckpredicted=False, cknadir=False, web=False):
+    param_list = [__spiceinit_params(from_cube, is_ringplane, spkpredict, ckpredicted, cknadir, web) for from_cube in from_cubes]
+    return isis_command_batch("spiceinit", param_list)
+
+
+def __cam2map_params(from_cube, to_cube, projection="equirectangular", map=None, resolution="CAMERA", minlat=None, maxlat=None, minlon=None, maxlon=None, defaultrange="CAMERA", band=-1):
 
     if map is None:
         map = "%s/base/templates/maps/%s.map"%(os.environ["ISISDATA"], projection)
@@ -59,10 +78,35 @@ def cam2map(from_cube, to_cube, projection="equirectangular", map=None, resoluti
 
     if resolution == "MAP":
         params["pixres"] = "map"
+    elif resolution not in (None, "CAMERA"):
+        # Meters per pixel
+        params["pixres"] = "mpp"
+        params["resolution"] = resolution
 
+    return params
+
+
+def cam2map(from_cube, to_cube, projection="equirectangular", map=None, resolution="CAMERA", minlat=None, maxlat=None, minlon=None, maxlon=None, defaultrange="CAMERA", band=-1):
+    params = __cam2map_params(from_cube, to_cube, projection, map, resolution, minlat, maxlat, minlon, maxlon, defaultrange, band)
     s = isis_command("cam2map", params)
     return s
 
+
+async def cam2map_async(from_cube, to_cube, projection="equirectangular", map=None, resolution="CAMERA", minlat=None, maxlat=None, minlon=None, maxlon=None, defaultrange="CAMERA", band=-1):
+    params = __cam2map_params(from_cube, to_cube, projection, map, resolution, minlat, maxlat, minlon, maxlon, defaultrange, band)
+    s = await isis_command_async("cam2map", params)
+    return s
+
+
+"""
+cubes: list of (from_cube, to_cube) tuples, all projected with the same map/options.
+Returns a list of BatchResult in the same order.
+"""
+def cam2map_batch(cubes, projection="equirectangular", map=None, resolution="CAMERA", minlat=None, maxlat=None, minlon=None, maxlon=None, defaultrange="CAMERA", band=-1):
+    param_list = [__cam2map_params(from_cube, to_cube, projection, map, resolution, minlat, maxlat, minlon, maxlon, defaultrange, band) for from_cube, to_cube in cubes]
+    return isis_command_batch("cam2map", param_list)
+
+
 def ringscam2map(from_cube, to_cube, projection="ringscylindrical", map=None, resolution="CAMERA", band=-1):
 
     if map is None:
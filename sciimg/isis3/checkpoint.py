@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import hashlib
+import traceback
+from sciimg.isis3 import stagecache
+
+
+"""
+Resumable pipeline runs.
+
+A product's checkpoint manifest, kept in its work directory, lists the steps that have completed,
+the files each left for the steps after it (with their size and modification time) and any values
+they produced, along with a hash of the input file(s), the processing options and the ISIS
+environment. When a run with --resume finds the work directory of a failed run (see
+sciimg.isis3.scratch) it skips every step up to the last one whose files are still intact and
+carries on from there. A manifest made with other inputs or options is ignored and the product
+starts over.
+
+A pipeline step looks like:
+
+    if not checkpoint.is_done("cubeit"):
+        utility.cubeit(list_file, cub_file)
+        checkpoint.done("cubeit", [cub_file])
+
+Without resuming, nothing is read or written and every step runs.
+"""
+
+MANIFEST_FILE = "checkpoint.json"
+
+
+def options_hash(source_files, options):
+    """
+    Identifies a run: the content of its input file(s), its options (anything json can write out)
+    and the ISIS install and kernels it runs against
+    """
+    if isinstance(source_files, str):
+        source_files = [source_files]
+    key_data = {
+        "inputs": [stagecache.file_fingerprint(f) for f in source_files],
+        "options": options,
+        "environment": stagecache.environment_fingerprint()
+    }
+    return hashlib.sha1(json.dumps(key_data, sort_keys=True, default=str).encode("UTF-8")).hexdigest()
+
+
+def file_stamp(file_name):
+    st = os.stat(file_name)
+    return [st.st_mtime_ns, st.st_size]
+
+
+class Checkpoint:
+
+    def __init__(self, manifest_file=None, run_hash=None):
+        self.manifest_file = manifest_file
+        self.run_hash = run_hash
+        self.__steps = []
+        self.__files = {}
+        self.__resume_at = 0
+        self.__position = 0
+        if manifest_file is not None:
+            self.__load()
+
+    def is_enabled(self):
+        return self.manifest_file is not None
+
+    def __is_intact(self, file_name):
+        try:
+            return self.__files.get(file_name) == file_stamp(file_name)
+        except OSError:
+            return False
+
+    def __load(self):
+        if not os.path.exists(self.manifest_file):
+            return
+        try:
+            with open(self.manifest_file, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("run") != self.run_hash:
+                print("Inputs or options have changed since the last run, starting over")
+                return
+            steps = manifest["steps"]
+            files = manifest["files"]
+        except (IOError, OSError, ValueError, KeyError):
+            traceback.print_exc(file=sys.stdout)
+            return
+
+        self.__steps = steps
+        self.__files = files
+        for i in range(len(steps) - 1, -1, -1):
+            if all([self.__is_intact(f) for f in steps[i]["outputs"]]):
+                self.__resume_at = i + 1
+                break
+        del self.__steps[self.__resume_at:]
+        if self.__resume_at > 0:
+            print("Resuming after step '%s'"%self.__steps[self.__resume_at - 1]["name"])
+
+    def is_resuming(self):
+        return self.__resume_at > 0
+
+    def is_done(self, name):
+        """
+        Whether the step can be skipped. The first step that can't be ends resuming: it and
+        everything after it runs again.
+        """
+        if self.__position < self.__resume_at and self.__steps[self.__position]["name"] == name:
+            self.__position += 1
+            return True
+        del self.__steps[self.__position:]
+        self.__resume_at = self.__position
+        return False
+
+    def value(self, name, default=None):
+        """
+        The value recorded by the last completed step named name
+        """
+        for step in reversed(self.__steps):
+            if step["name"] == name:
+                return step.get("value", default)
+        return default
+
+    def done(self, name, outputs=(), value=None):
+        """
+        Records a completed step, with the files the steps after it need from it and a value
+        (anything json can write out) to give them if it's skipped
+        """
+        if not self.is_enabled():
+            return
+        outputs = [os.path.abspath(f) for f in outputs]
+        for f in outputs:
+            self.__files[f] = file_stamp(f)
+        del self.__steps[self.__position:]
+        self.__steps.append({"name": name, "outputs": outputs, "value": value})
+        self.__position = len(self.__steps)
+        self.__resume_at = self.__position
+        self.__write()
+
+    def __write(self):
+        tmp_file = "%s.tmp"%self.manifest_file
+        with open(tmp_file, "w") as f:
+            json.dump({
+                "run": self.run_hash,
+                "steps": self.__steps,
+                "files": self.__files
+            }, f, indent=4)
+        os.replace(tmp_file, self.manifest_file)
+
+
+def open_checkpoint(work, source_files, options):
+    """
+    The checkpoint for a run in work (a sciimg.isis3.scratch.WorkDir). It does nothing unless
+    the work directory is resumable.
+    """
+    if not work.resumable:
+        return Checkpoint()
+    return Checkpoint(work.file(MANIFEST_FILE), options_hash(source_files, options))
@@ -0,0 +1,361 @@
+import os
+import re
+import numpy as np
+from sciimg.isis3 import labels
+
+
+"""
+Native reader/writer for ISIS3 cubes with attached labels.
+
+The cube core is exposed as a numpy.memmap in its storage layout (BandSequential or Tile), so
+pixel data can be read and written in-process rather than through an ISIS application and a
+temporary file. DN values are scaled by the label's Base/Multiplier and ISIS special pixels
+(NULL, LRS, LIS, HIS, HRS) become NaN, or can be masked out with valid_mask().
+
+New cubes are always written BandSequential. Their labels can be copied from a template cube,
+in which case the template's attached blobs (History, Tables, OriginalLabel, ...) are carried
+over as well.
+"""
+
+DEFAULT_LABEL_BYTES = 65536
+
+FORMAT_BANDSEQUENTIAL = "BandSequential"
+FORMAT_TILE = "Tile"
+
+# Special pixel bit patterns for 32 bit floating point cubes. Anything from NULL up is special.
+NULL4_BITS = 0xFF7FFFFB
+HRS4_BITS = 0xFF7FFFFF
+NULL4 = np.array([NULL4_BITS], dtype=np.uint32).view(np.float32)[0]
+
+"""
+Per pixel type: numpy type, NULL value, valid minimum, valid maximum. Integer values outside
+the valid range are the special pixels.
+"""
+PIXEL_TYPES = {
+    "UnsignedByte": (np.uint8, 0, 1, 254),
+    "SignedWord": (np.int16, -32768, -32752, 32767),
+    "UnsignedWord": (np.uint16, 0, 3, 65522),
+    "SignedInteger": (np.int32, -8388613, -8388608, 2147483647),
+    "UnsignedInteger": (np.uint32, 0, 3, 4294967284),
+    "Real": (np.float32, NULL4, None, None)
+}
+
+
+class CubeFormatException(Exception):
+    pass
+
+
+class Cube:
+
+    def __init__(self, file_name, mode="r"):
+        self.file_name = file_name
+        self.mode = mode
+        self.label_text = labels.read_label_text(file_name)
+        self.label = labels.parse_label(self.label_text)
+
+        core = self.label.find_object("Core")
+        if core is None:
+            raise CubeFormatException("%s has no attached cube core"%file_name)
+        dimensions = core.find_group("Dimensions")
+        pixels = core.find_group("Pixels")
+        if dimensions is None or pixels is None:
+            raise CubeFormatException("%s has an incomplete Core object"%file_name)
+
+        self.samples = int(dimensions["Samples"])
+        self.lines = int(dimensions["Lines"])
+        self.bands = int(dimensions["Bands"])
+        self.format = core.get("Format", FORMAT_BANDSEQUENTIAL)
+        self.start_byte = int(core["StartByte"])
+
+        self.pixel_type = pixels["Type"]
+        if self.pixel_type not in PIXEL_TYPES:
+            raise CubeFormatException("Unsupported pixel type: %s"%self.pixel_type)
+        self.byte_order = pixels.get("ByteOrder", "Lsb")
+        self.base = float(pixels.get("Base", "0.0"))
+        self.multiplier = float(pixels.get("Multiplier", "1.0"))
+
+        self.dtype = np.dtype(PIXEL_TYPES[self.pixel_type][0]).newbyteorder("<" if self.byte_order.upper() == "LSB" else ">")
+
+        if self.format == FORMAT_TILE:
+            self.tile_samples = int(core["TileSamples"])
+            self.tile_lines = int(core["TileLines"])
+            self.tile_columns = int(np.ceil(self.samples / float(self.tile_samples)))
+            self.tile_rows = int(np.ceil(self.lines / float(self.tile_lines)))
+            shape = (self.bands, self.tile_rows, self.tile_columns, self.tile_lines, self.tile_samples)
+        elif self.format == FORMAT_BANDSEQUENTIAL:
+            shape = (self.bands, self.lines, self.samples)
+        else:
+            raise CubeFormatException("Unsupported cube format: %s"%self.format)
+
+        self.raw = np.memmap(file_name, dtype=self.dtype, mode=mode, offset=self.start_byte - 1, shape=shape)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        if self.raw is not None:
+            if self.mode != "r":
+                self.raw.flush()
+            self.raw._mmap.close()
+            self.raw = None
+
+    def flush(self):
+        self.raw.flush()
+
+    def __check_band(self, band):
+        if band < 1 or band > self.bands:
+            raise IndexError("Band %s out of range (1-%s)"%(band, self.bands))
+
+    def dn(self, band=None, lines=None):
+        """
+        Stored values for a band (1-based, as with ISIS) as (lines, samples), or for all bands as
+        (bands, lines, samples). BandSequential cubes return a view onto the memmap, Tile cubes a copy.
+        lines (a slice) limits it to those lines; from a Tile cube only the rows of tiles holding
+        them are read.
+        """
+        if band is None:
+            if self.format == FORMAT_TILE:
+                return np.stack([self.dn(b, lines) for b in range(1, self.bands + 1)])
+            return self.raw if lines is None else self.raw[:, lines, :]
+
+        self.__check_band(band)
+        if self.format == FORMAT_BANDSEQUENTIAL:
+            return self.raw[band - 1] if lines is None else self.raw[band - 1][lines]
+
+        start, stop, step = (0, self.lines, 1) if lines is None else lines.indices(self.lines)
+        if step < 0:
+            return self.dn(band)[lines]
+        if stop <= start:
+            return np.zeros((0, self.samples), dtype=self.dtype)
+        first_row = start // self.tile_lines
+        last_row = (stop + self.tile_lines - 1) // self.tile_lines
+        tiles = self.raw[band - 1][first_row:last_row]
+        assembled = tiles.transpose(0, 2, 1, 3).reshape((last_row - first_row) * self.tile_lines, self.tile_columns * self.tile_samples)
+        offset = first_row * self.tile_lines
+        return assembled[start - offset:stop - offset:step, :self.samples]
+
+    def valid_mask(self, dn):
+        """
+        True where dn (as returned from dn()) isn't an ISIS special pixel
+        """
+        if self.pixel_type == "Real":
+            bits = dn.view(np.dtype(np.uint32).newbyteorder(self.dtype.byteorder))
+            return ((bits < NULL4_BITS) | (bits > HRS4_BITS)) & np.isfinite(dn)
+        valid_min, valid_max = PIXEL_TYPES[self.pixel_type][2:]
+        return (dn >= valid_min) & (dn <= valid_max)
+
+    def read(self, band=None, fill=np.nan, lines=None):
+        """
+        Pixel values (Base + Multiplier * DN) as float32 with special pixels set to fill. lines
+        (a slice) limits it to those lines.
+        """
+        dn = self.dn(band, lines)
+        values = dn.astype(np.float32)
+        if self.multiplier != 1.0:
+            values *= self.multiplier
+        if self.base != 0.0:
+            values += self.base
+        values[~self.valid_mask(dn)] = fill
+        return values
+
+    def read_masked(self, band=None):
+        dn = self.dn(band)
+        values = self.read(band, fill=0.0)
+        return np.ma.masked_array(values, mask=~self.valid_mask(dn))
+
+    def __to_dn(self, values):
+        if self.pixel_type == "Real" and self.base == 0.0 and self.multiplier == 1.0:
+            dn = np.array(values, dtype=np.float32)
+            dn[~np.isfinite(dn)] = NULL4
+            return dn
+
+        values = np.asarray(values, dtype=np.float64)
+        invalid = ~np.isfinite(values)
+        dn = (np.where(invalid, 0.0, values) - self.base) / self.multiplier
+
+        np_type, null, valid_min, valid_max = PIXEL_TYPES[self.pixel_type]
+        if self.pixel_type == "Real":
+            dn = dn.astype(np.float32)
+        else:
+            dn = np.clip(np.rint(dn), valid_min, valid_max).astype(np_type)
+        dn[invalid] = null
+        return dn
+
+    def write(self, band, values, start_line=0):
+        """
+        Writes pixel values (lines, samples) to a band (1-based). NaN/inf are written as NULL.
+        BandSequential cubes can be written a block of lines at a time, from start_line (0-based).
+        """
+        if self.mode == "r":
+            raise CubeFormatException("%s is open read-only"%self.file_name)
+        self.__check_band(band)
+
+        values = np.asarray(values)
+        if start_line != 0 or values.shape[0] != self.lines:
+            if self.format != FORMAT_BANDSEQUENTIAL:
+                raise CubeFormatException("Only BandSequential cubes can be written in blocks of lines")
+            if values.ndim != 2 or values.shape[1] != self.samples or start_line < 0 or start_line + values.shape[0] > self.lines:
+                raise ValueError("Lines %s to %s of %s samples are outside the cube"%(start_line, start_line + values.shape[0], values.shape[-1]))
+            self.raw[band - 1, start_line:start_line + values.shape[0]] = self.__to_dn(values)
+            return
+        if values.shape != (self.lines, self.samples):
+            raise ValueError("Expected band of shape %s, got %s"%((self.lines, self.samples), values.shape))
+
+        dn = self.__to_dn(values)
+        if self.format == FORMAT_BANDSEQUENTIAL:
+            self.raw[band - 1] = dn
+            return
+
+        padded = np.zeros((self.tile_rows * self.tile_lines, self.tile_columns * self.tile_samples), dtype=dn.dtype)
+        padded[:self.lines, :self.samples] = dn
+        self.raw[band - 1] = padded.reshape(self.tile_rows, self.tile_lines, self.tile_columns, self.tile_samples).transpose(0, 2, 1, 3)
+
+
+__CORE_PATTERN = re.compile(r"^[ \t]*Object[ \t]*=[ \t]*Core[ \t]*\r?$.*?^[ \t]*End_Object[ \t]*\r?$", re.MULTILINE | re.DOTALL | re.IGNORECASE)
+__OBJECT_PATTERN = re.compile(r"^[ \t]*Object[ \t]*=[ \t]*(\S+)", re.IGNORECASE)
+__END_OBJECT_PATTERN = re.compile(r"^[ \t]*End_Object\b", re.IGNORECASE)
+__KEYWORD_PATTERN = re.compile(r"^([ \t]*)(StartByte|Bytes)([ \t]*=[ \t]*)(\d+)(.*)$", re.IGNORECASE)
+
+
+def __core_text(samples, lines, bands, pixel_type, base, multiplier):
+    return "\n".join([
+        "  Object = Core",
+        "    StartByte   = 1",
+        "    Format      = BandSequential",
+        "",
+        "    Group = Dimensions",
+        "      Samples = %d"%samples,
+        "      Lines   = %d"%lines,
+        "      Bands   = %d"%bands,
+        "    End_Group",
+        "",
+        "    Group = Pixels",
+        "      Type       = %s"%pixel_type,
+        "      ByteOrder  = Lsb",
+        "      Base       = %s"%repr(float(base)),
+        "      Multiplier = %s"%repr(float(multiplier)),
+        "    End_Group",
+        "  End_Object"
+    ])
+
+
+def __attached_blobs(label_text):
+    """
+    Returns (object name, start byte, bytes) for the top level objects stored after the core
+    """
+    blobs = []
+    depth = 0
+    current = None
+    for line in label_text.splitlines():
+        m = __OBJECT_PATTERN.match(line)
+        if m is not None:
+            depth += 1
+            if depth == 1:
+                current = {"name": m.group(1)}
+            continue
+        if __END_OBJECT_PATTERN.match(line):
+            if depth == 1 and current is not None and "StartByte" in current and "Bytes" in current:
+                blobs.append((current["name"], current["StartByte"], current["Bytes"]))
+            depth -= 1
+            continue
+        m = __KEYWORD_PATTERN.match(line)
+        if m is not None and depth == 1 and current is not None:
+            current["StartByte" if m.group(2).lower() == "startbyte" else "Bytes"] = int(m.group(4))
+    return blobs
+
+
+def __relocate_label(label_text, label_bytes, core_start, blob_starts):
+    """
+    Rewrites the Core StartByte, the Label Bytes and the StartByte of each attached blob (in order)
+    """
+    out = []
+    depth = 0
+    name = None
+    blob_index = 0
+    for line in label_text.splitlines():
+        m = __OBJECT_PATTERN.match(line)
+        if m is not None:
+            depth += 1
+            if depth == 1:
+                name = m.group(1)
+            out.append(line)
+            continue
+        if __END_OBJECT_PATTERN.match(line):
+            depth -= 1
+            out.append(line)
+            continue
+
+        m = __KEYWORD_PATTERN.match(line)
+        if m is not None:
+            keyword = m.group(2).lower()
+            if depth == 2 and keyword == "startbyte" and name.lower() == "isiscube":
+                line = "%s%s%s%d%s"%(m.group(1), m.group(2), m.group(3), core_start, m.group(5))
+            elif depth == 1 and keyword == "bytes" and name.lower() == "label":
+                line = "%s%s%s%d%s"%(m.group(1), m.group(2), m.group(3), label_bytes, m.group(5))
+            elif depth == 1 and keyword == "startbyte" and blob_index < len(blob_starts):
+                line = "%s%s%s%d%s"%(m.group(1), m.group(2), m.group(3), blob_starts[blob_index], m.group(5))
+                blob_index += 1
+        out.append(line)
+    return "\n".join(out) + "\n"
+
+
+def create(file_name, samples, lines, bands=1, pixel_type="Real", template=None, base=0.0, multiplier=1.0, groups=()):
+    """
+    Writes a new BandSequential cube filled with NULL and returns it opened for writing. With a
+    template cube, its label (groups, attached tables/history) is copied and only the core is
+    replaced. Otherwise groups (label text, see labels.format_group) are added to the IsisCube
+    object.
+    """
+    if pixel_type not in PIXEL_TYPES:
+        raise CubeFormatException("Unsupported pixel type: %s"%pixel_type)
+
+    core_text = __core_text(samples, lines, bands, pixel_type, base, multiplier)
+    blobs = []
+    if template is not None:
+        template_text = labels.read_label_text(template)
+        label_text = __CORE_PATTERN.sub(lambda m: core_text, template_text, count=1)
+        blobs = __attached_blobs(template_text)
+    else:
+        label_text = "\n".join([
+            "Object = IsisCube",
+            core_text] + ["\n" + group for group in groups] + [
+            "End_Object",
+            "",
+            "Object = Label",
+            "  Bytes = %d"%DEFAULT_LABEL_BYTES,
+            "End_Object",
+            "End"
+        ])
+
+    np_type = PIXEL_TYPES[pixel_type][0]
+    core_bytes = samples * lines * bands * np.dtype(np_type).itemsize
+
+    # Leave room for the start byte values to grow when the label is rewritten
+    label_bytes = DEFAULT_LABEL_BYTES
+    while len(label_text) + 1024 > label_bytes:
+        label_bytes += DEFAULT_LABEL_BYTES
+
+    blob_starts = []
+    next_start = label_bytes + core_bytes + 1
+    for blob_name, blob_start, blob_size in blobs:
+        blob_starts.append(next_start)
+        next_start += blob_size
+
+    label_text = __relocate_label(label_text, label_bytes, label_bytes + 1, blob_starts)
+
+    null_band = np.full((lines, samples), PIXEL_TYPES[pixel_type][1], dtype=np.dtype(np_type).newbyteorder("<"))
+    with open(file_name, "wb") as f:
+        f.write(label_text.encode("latin-1"))
+        f.write(b"\0" * (label_bytes - len(label_text)))
+        for b in range(0, bands):
+            f.write(null_band.tobytes())
+        if len(blobs) > 0:
+            with open(template, "rb") as t:
+                for blob_name, blob_start, blob_size in blobs:
+                    t.seek(blob_start - 1)
+                    f.write(t.read(blob_size))
+
+    return Cube(file_name, mode="r+")
@@ -0,0 +1,164 @@
+import math
+import numpy as np
+from sciimg.isis3 import cube
+from sciimg.isis3 import workers
+
+
+"""
+Single-pass band statistics for ISIS cubes, computed in-process from the memory-mapped core.
+
+Each band is streamed once, in blocks of lines, collecting the valid pixel count, minimum,
+maximum, mean, standard deviation and a fixed-bin histogram (special pixels excluded, as with
+ISIS 'stats'). BandStats merge exactly (the histogram included, given the same bins), so dataset
+wide stretches need one read per file and files can be spread over the shared worker pool.
+
+Histograms need a fixed range to be mergeable: pass hist_range, otherwise integer cubes use the
+full range of their pixel type and Real cubes skip the histogram.
+"""
+
+DEFAULT_HISTOGRAM_BINS = 256
+DEFAULT_BLOCK_LINES = 512
+
+
+class BandStats:
+
+    def __init__(self, hist_range=None, bins=DEFAULT_HISTOGRAM_BINS):
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.hist_range = tuple(hist_range) if hist_range is not None else None
+        self.histogram = np.zeros(bins, dtype=np.int64) if hist_range is not None else None
+
+    def add(self, values):
+        """
+        Adds a block of valid (non-special, finite) pixel values
+        """
+        n = values.size
+        if n == 0:
+            return
+
+        block_min = float(values.min())
+        block_max = float(values.max())
+        block_mean = float(values.mean(dtype=np.float64))
+        block_m2 = float(((values - block_mean) ** 2).sum(dtype=np.float64))
+        self.__combine(n, block_min, block_max, block_mean, block_m2)
+
+        if self.histogram is not None:
+            self.histogram += np.histogram(values, bins=len(self.histogram), range=self.hist_range)[0]
+
+    def __combine(self, n, minimum, maximum, mean, m2):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.minimum = minimum if self.minimum is None else min(self.minimum, minimum)
+        self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+
+    def merge(self, other):
+        if other.count > 0:
+            self.__combine(other.count, other.minimum, other.maximum, other.mean, other.m2)
+        if self.histogram is not None:
+            if other.histogram is None or other.hist_range != self.hist_range or len(other.histogram) != len(self.histogram):
+                self.histogram = None
+                self.hist_range = None
+            else:
+                self.histogram += other.histogram
+        return self
+
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def percentile(self, pct):
+        """
+        Approximate value at pct (0-100) from the histogram
+        """
+        if self.histogram is None or self.count == 0:
+            return None
+        cumulative = np.cumsum(self.histogram)
+        index = int(np.searchsorted(cumulative, cumulative[-1] * pct / 100.0))
+        edges = np.linspace(self.hist_range[0], self.hist_range[1], len(self.histogram) + 1)
+        return float(edges[min(index + 1, len(edges) - 1)])
+
+
+def __default_hist_range(c):
+    if c.pixel_type == "Real":
+        return None
+    valid_min, valid_max = cube.PIXEL_TYPES[c.pixel_type][2:]
+    low = c.base + c.multiplier * valid_min
+    high = c.base + c.multiplier * valid_max
+    return min(low, high), max(low, high)
+
+
+def cube_stats(file_name, bands=None, hist_range=None, bins=DEFAULT_HISTOGRAM_BINS, block_lines=DEFAULT_BLOCK_LINES):
+    """
+    Returns {band: BandStats} for the given bands (1-based) of a cube, all bands by default
+    """
+    with cube.Cube(file_name) as c:
+        if bands is None:
+            bands = range(1, c.bands + 1)
+        if hist_range is None:
+            hist_range = __default_hist_range(c)
+
+        results = {}
+        for band in bands:
+            stats = BandStats(hist_range, bins)
+            dn = c.dn(band)
+            for line in range(0, c.lines, block_lines):
+                block = dn[line:line + block_lines]
+                values = block[c.valid_mask(block)].astype(np.float32)
+                if c.multiplier != 1.0:
+                    values *= c.multiplier
+                if c.base != 0.0:
+                    values += c.base
+                stats.add(values)
+            results[band] = stats
+        return results
+
+
+def __cube_stats_worker(args):
+    file_name, bands, hist_range, bins = args
+    return cube_stats(file_name, bands, hist_range, bins)
+
+
+def files_stats(file_names, bands=None, hist_range=None, bins=DEFAULT_HISTOGRAM_BINS, num_threads=1):
+    """
+    Statistics for the same bands across several cubes, one read per file. Returns {band: BandStats}
+    merged over all files.
+    """
+    work = [(file_name, bands, hist_range, bins) for file_name in file_names]
+    per_file = workers.map_items(__cube_stats_worker, work, num_threads)
+
+    merged = {}
+    for results in per_file:
+        for band, stats in results.items():
+            if band in merged:
+                merged[band].merge(stats)
+            else:
+                merged[band] = stats
+    return merged
+
+
+def merge_bands(results):
+    """
+    Merges {band: BandStats} into a single BandStats over all bands
+    """
+    if len(results) == 0:
+        return None
+    first = results[sorted(results.keys())[0]]
+    bins = len(first.histogram) if first.histogram is not None else DEFAULT_HISTOGRAM_BINS
+    merged = BandStats(first.hist_range, bins)
+    for band in sorted(results.keys()):
+        merged.merge(results[band])
+    return merged
+
+
+def files_min_max(file_names, bands=None, num_threads=1):
+    stats = merge_bands(files_stats(file_names, bands, num_threads=num_threads))
+    if stats is None or stats.count == 0:
+        return 0, 0
+    return stats.minimum, stats.maximum
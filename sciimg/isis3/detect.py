@@ -0,0 +1,149 @@
+import os
+from sciimg.isis3 import labels
+from sciimg.isis3.scripting import getkey
+
+
+"""
+One-pass mission/instrument detection.
+
+describe() reads a file's label once, classifies it from a handful of keywords and caches the
+resulting FileDescriptor (validated against the file's mtime and size). The pipelines'
+is_supported_file() accept either a file name or a descriptor, so dispatching on a file costs
+one label parse no matter how many pipelines are asked.
+"""
+
+class Mission:
+    CASSINI = "CASSINI"
+    VOYAGER = "VOYAGER"
+    GALILEO = "GALILEO"
+    JUNO = "JUNO"
+
+
+CUBE_EXTENSIONS = ("CUB",)
+LABEL_EXTENSIONS = ("LBL", "BEL", "IMG") # Note: 'BEL' is for .LBL_label via atlas wget script
+COMPRESSED_EXTENSIONS = ("IMQ",)
+
+# Instrument group SpacecraftName -> mission, for cubes
+__CUBE_SPACECRAFT__ = {
+    "Cassini-Huygens": Mission.CASSINI,
+    "VOYAGER_1": Mission.VOYAGER,
+    "VOYAGER_2": Mission.VOYAGER,
+    "VOYAGER 1": Mission.VOYAGER,
+    "VOYAGER 2": Mission.VOYAGER,
+    "Galileo Orbiter": Mission.GALILEO,
+    "JUNO": Mission.JUNO
+}
+
+__VOYAGER_NAMES__ = {
+    "VOYAGER_1": Mission.VOYAGER,
+    "VOYAGER_2": Mission.VOYAGER,
+    "VOYAGER 1": Mission.VOYAGER,
+    "VOYAGER 2": Mission.VOYAGER
+}
+
+# PDS label keyword -> {value: mission}, checked in this order
+__LABEL_KEYWORDS__ = (
+    ("INSTRUMENT_HOST_NAME", dict([("CASSINI ORBITER", Mission.CASSINI)] + list(__VOYAGER_NAMES__.items()))),
+    ("SpacecraftName", __VOYAGER_NAMES__),
+    ("SPACECRAFT_NAME", {"GALILEO ORBITER": Mission.GALILEO, "JUNO": Mission.JUNO})
+)
+
+# The file types each mission's pipeline takes
+__MISSION_FILE_TYPES__ = {
+    Mission.CASSINI: ("CUB", "LBL", "BEL"),
+    Mission.VOYAGER: ("CUB", "IMQ", "IMG", "LBL"),
+    Mission.GALILEO: ("CUB", "LBL"),
+    Mission.JUNO: ("CUB", "LBL")
+}
+
+__DESCRIPTOR_CACHE__ = {}
+
+
+class FileDescriptor:
+
+    def __init__(self, file_name, file_type, mission=None, spacecraft=None, instrument=None):
+        self.file_name = file_name
+        self.file_type = file_type
+        self.mission = mission
+        self.spacecraft = spacecraft
+        self.instrument = instrument
+
+    def is_supported(self):
+        return self.mission is not None
+
+    def __repr__(self):
+        return "FileDescriptor(%s, %s, %s, %s, %s)"%(self.file_name, self.file_type, self.mission, self.spacecraft, self.instrument)
+
+
+def __describe_cube(file_name):
+    label = labels.load_label(file_name)
+    spacecraft = labels.find_value(label, "SpacecraftName", grpname="Instrument")
+    instrument = labels.find_value(label, "InstrumentId", grpname="Instrument")
+    return FileDescriptor(file_name, "CUB", __CUBE_SPACECRAFT__.get(spacecraft), spacecraft, instrument)
+
+
+def __describe_label(file_name, file_type):
+    label = labels.load_label(file_name)
+    instrument = label.get("INSTRUMENT_ID")
+    for keyword, missions in __LABEL_KEYWORDS__:
+        value = label.get(keyword)
+        if value is not None and value in missions and file_type in __MISSION_FILE_TYPES__[missions[value]]:
+            return FileDescriptor(file_name, file_type, missions[value], value, instrument)
+    return FileDescriptor(file_name, file_type, None, label.get("SPACECRAFT_NAME", label.get("INSTRUMENT_HOST_NAME")), instrument)
+
+
+def __describe_compressed(file_name):
+    label = labels.load_label(file_name)
+    spacecraft = label.get("SPACECRAFT_NAME")
+    if spacecraft is None:
+        spacecraft = getkey(file_name, "SpacecraftName", grpname="Instrument")
+    mission = __VOYAGER_NAMES__.get(spacecraft)
+    return FileDescriptor(file_name, "IMQ", mission, spacecraft, label.get("INSTRUMENT_NAME"))
+
+
+def __file_stamp(file_name):
+    st = os.stat(file_name)
+    return st.st_mtime_ns, st.st_size
+
+
+def describe(file_name):
+    """
+    Returns the FileDescriptor for a file (or the descriptor itself, if given one). Files that
+    can't be read or aren't recognized get a descriptor with mission None.
+    """
+    if isinstance(file_name, FileDescriptor):
+        return file_name
+
+    if file_name is None:
+        return FileDescriptor(None, None)
+
+    file_type = file_name[-3:].upper()
+    try:
+        stamp = __file_stamp(file_name)
+    except (IOError, OSError):
+        return FileDescriptor(file_name, file_type)
+
+    key = os.path.abspath(file_name)
+    if key in __DESCRIPTOR_CACHE__:
+        cached_stamp, descriptor = __DESCRIPTOR_CACHE__[key]
+        if cached_stamp == stamp:
+            return descriptor
+
+    try:
+        if file_type in CUBE_EXTENSIONS:
+            descriptor = __describe_cube(file_name)
+        elif file_type in LABEL_EXTENSIONS:
+            descriptor = __describe_label(file_name, file_type)
+        elif file_type in COMPRESSED_EXTENSIONS:
+            descriptor = __describe_compressed(file_name)
+        else:
+            descriptor = FileDescriptor(file_name, file_type)
+    except:
+        descriptor = FileDescriptor(file_name, file_type)
+
+    __DESCRIPTOR_CACHE__[key] = (stamp, descriptor)
+    return descriptor
+
+
+def detect_mission(file_name):
+    return describe(file_name).mission
@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import sqlite3
+import time
+import datetime
+import threading
+import traceback
+from collections import OrderedDict
+from pvl.collections import PVLModule, PVLObject, PVLGroup, Quantity, Units
+
+
+"""
+Label index backing sciimg.isis3.metadata.load_pvl.
+
+Parsed labels are kept in a bounded in-memory LRU and, when a store is given (SCIIMG_LABEL_INDEX
+or metadata.set_label_index_path), in an sqlite database on disk. Both are validated against the
+file's mtime (in nanoseconds) and size, so a changed file is re-parsed. The sqlite store is shared
+by every process pointed at it (pool workers and later command line runs), which makes the label
+parse a once-per-file cost for a whole campaign. It keeps at most max_stored labels, dropping the
+least recently stored first.
+
+Labels are stored as JSON, with the pvl types that JSON doesn't have (aggregates, sets, quantities,
+dates and times) tagged, so reading the store back never runs code from it.
+"""
+
+INDEX_PATH_ENV = "SCIIMG_LABEL_INDEX"
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_STORED = 100000
+
+__SCHEMA__ = """
+CREATE TABLE IF NOT EXISTS label_json (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    stored REAL NOT NULL,
+    label TEXT NOT NULL
+)
+"""
+
+__AGGREGATE_TYPES = (
+    ("MODULE", PVLModule),
+    ("OBJECT", PVLObject),
+    ("GROUP", PVLGroup)
+)
+
+__TIME_TYPES = (
+    ("datetime", datetime.datetime),
+    ("date", datetime.date),
+    ("time", datetime.time)
+)
+
+
+def __to_json(value):
+    for kind, cls in __AGGREGATE_TYPES:
+        if type(value) == cls:
+            return {"pvl": kind, "items": [[k, __to_json(v)] for k, v in value.items()]}
+    if type(value) == Quantity:
+        return {"pvl": "quantity", "value": __to_json(value.value), "units": value.units}
+    if type(value) == Units:
+        return {"pvl": "units", "value": __to_json(value.value), "units": value.units}
+    if type(value) in (set, frozenset):
+        return {"pvl": "set", "items": [__to_json(v) for v in value]}
+    for kind, cls in __TIME_TYPES:
+        if type(value) == cls:
+            return {"pvl": kind, "iso": value.isoformat()}
+    if type(value) == list:
+        return [__to_json(v) for v in value]
+    if value is None or type(value) in (str, int, float, bool):
+        return value
+    raise TypeError("Can't store a %s in the label index"%type(value).__name__)
+
+
+def __from_json(value):
+    if type(value) == list:
+        return [__from_json(v) for v in value]
+    if type(value) != dict:
+        return value
+
+    kind = value["pvl"]
+    for name, cls in __AGGREGATE_TYPES:
+        if kind == name:
+            return cls([(k, __from_json(v)) for k, v in value["items"]])
+    if kind == "quantity":
+        return Quantity(__from_json(value["value"]), value["units"])
+    if kind == "units":
+        return Units(__from_json(value["value"]), value["units"])
+    if kind == "set":
+        return frozenset([__from_json(v) for v in value["items"]])
+    for name, cls in __TIME_TYPES:
+        if kind == name:
+            return cls.fromisoformat(value["iso"])
+    raise ValueError("Unknown label index value type '%s'"%kind)
+
+
+def serialize_label(label):
+    return json.dumps(__to_json(label))
+
+
+def deserialize_label(data):
+    return __from_json(json.loads(data))
+
+
+def file_stamp(file_name):
+    st = os.stat(file_name)
+    return st.st_mtime_ns, st.st_size
+
+
+class LabelIndex:
+
+    def __init__(self, db_path=None, max_entries=DEFAULT_MAX_ENTRIES, max_stored=DEFAULT_MAX_STORED, verbose=False):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_stored = max_stored
+        self.verbose = verbose
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__conn = None
+        self.__conn_pid = None
+
+    def __connect(self):
+        if self.db_path is None:
+            return None
+
+        # Connections can't be carried across a fork, so each process opens its own
+        if self.__conn is not None and self.__conn_pid == os.getpid():
+            return self.__conn
+
+        try:
+            db_dir = os.path.dirname(self.db_path)
+            if len(db_dir) > 0 and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+            conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(__SCHEMA__)
+            conn.commit()
+        except (sqlite3.Error, IOError, OSError):
+            if self.verbose is True:
+                traceback.print_exc(file=sys.stdout)
+            print("Label index at %s is unavailable, continuing without it" % self.db_path)
+            self.db_path = None
+            return None
+
+        self.__conn = conn
+        self.__conn_pid = os.getpid()
+        return conn
+
+    def __remember(self, key, stamp, label):
+        self.__entries[key] = (stamp, label)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False)
+
+    def get(self, file_name):
+        key = os.path.abspath(file_name)
+        try:
+            stamp = file_stamp(key)
+        except (IOError, OSError):
+            return None
+
+        with self.__lock:
+            if key in self.__entries:
+                cached_stamp, label = self.__entries[key]
+                if cached_stamp == stamp:
+                    self.__entries.move_to_end(key)
+                    return label
+                del self.__entries[key]
+
+            conn = self.__connect()
+            if conn is None:
+                return None
+
+            try:
+                row = conn.execute("SELECT mtime_ns, size, label FROM label_json WHERE path = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                if self.verbose is True:
+                    traceback.print_exc(file=sys.stdout)
+                return None
+
+            if row is None or (row[0], row[1]) != stamp:
+                return None
+
+            try:
+                label = deserialize_label(row[2])
+            except:
+                if self.verbose is True:
+                    traceback.print_exc(file=sys.stdout)
+                return None
+
+            self.__remember(key, stamp, label)
+            return label
+
+    def put(self, file_name, label):
+        key = os.path.abspath(file_name)
+        try:
+            stamp = file_stamp(key)
+        except (IOError, OSError):
+            return
+
+        with self.__lock:
+            self.__remember(key, stamp, label)
+
+            conn = self.__connect()
+            if conn is None:
+                return
+
+            try:
+                conn.execute("INSERT OR REPLACE INTO label_json (path, mtime_ns, size, stored, label) VALUES (?, ?, ?, ?, ?)",
+                             (key, stamp[0], stamp[1], time.time(), serialize_label(label)))
+                count = conn.execute("SELECT COUNT(*) FROM label_json").fetchone()[0]
+                if count > self.max_stored:
+                    conn.execute("DELETE FROM label_json WHERE path IN (SELECT path FROM label_json ORDER BY stored LIMIT ?)",
+                                 (count - self.max_stored,))
+                conn.commit()
+            except:
+                if self.verbose is True:
+                    traceback.print_exc(file=sys.stdout)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            conn = self.__connect()
+            if conn is not None:
+                conn.execute("DELETE FROM label_json")
+                conn.commit()
+
+    def __len__(self):
+        return len(self.__entries)
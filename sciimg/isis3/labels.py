@@ -0,0 +1,356 @@
+import os
+import re
+import struct
+from collections import OrderedDict
+
+
+"""
+In-process reader for attached ISIS3 cube labels and detached (or attached) PDS3 labels.
+
+Values are kept as the raw label text (quotes and units stripped), which is the same form
+ISIS 'getkey' prints, so callers that used to shell out to getkey can use these directly.
+Arrays/sets come back as python lists of those strings.
+"""
+
+__LABEL_CACHE__ = OrderedDict()
+
+MAX_CACHED_LABELS = 512
+
+LABEL_READ_SIZE = 65536
+
+__END_PATTERN = re.compile(r"^[ \t]*END[ \t]*\r?$", re.MULTILINE | re.IGNORECASE)
+__BARE_ELEMENT = re.compile(r"[^\s,(){}<>\"']+")
+__NAME = re.compile(r"[^\s=]+")
+
+BLOCK_ROOT = "ROOT"
+BLOCK_OBJECT = "OBJECT"
+BLOCK_GROUP = "GROUP"
+
+
+class LabelParseException(Exception):
+    pass
+
+
+class Block:
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.keywords = []
+        self.blocks = []
+
+    def find_block(self, name, kind=None):
+        name = name.upper()
+        for block in self.blocks:
+            if block.name is not None and block.name.upper() == name and (kind is None or block.kind == kind):
+                return block
+        for block in self.blocks:
+            found = block.find_block(name, kind)
+            if found is not None:
+                return found
+        return None
+
+    def find_object(self, name):
+        return self.find_block(name, BLOCK_OBJECT)
+
+    def find_group(self, name):
+        return self.find_block(name, BLOCK_GROUP)
+
+    def has_keyword(self, keyword):
+        return self.get(keyword) is not None
+
+    def get(self, keyword, default=None):
+        keyword = keyword.upper()
+        for k, v in self.keywords:
+            if k.upper() == keyword:
+                return v
+        return default
+
+    def __contains__(self, keyword):
+        return self.has_keyword(keyword)
+
+    def __getitem__(self, keyword):
+        value = self.get(keyword)
+        if value is None:
+            raise KeyError(keyword)
+        return value
+
+
+def __skip_ws(text, pos):
+    n = len(text)
+    while pos < n:
+        c = text[pos]
+        if c in " \t\r\n\f\v\x00":
+            pos += 1
+        elif text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            if end == -1:
+                end = text.find("\n", pos)
+                pos = n if end == -1 else end + 1
+            else:
+                pos = end + 2
+        else:
+            break
+    return pos
+
+
+def __skip_units(text, pos):
+    p = __skip_ws(text, pos)
+    if p < len(text) and text[p] == "<":
+        end = text.find(">", p)
+        if end != -1:
+            return end + 1
+    return pos
+
+
+def __read_quoted(text, pos):
+    quote = text[pos]
+    end = text.find(quote, pos + 1)
+    if end == -1:
+        raise LabelParseException("Unterminated quoted string at offset %s" % pos)
+    value = re.sub(r"\s*\n\s*", " ", text[pos + 1:end])
+    return value, end + 1
+
+
+def __read_sequence(text, pos):
+    close = ")" if text[pos] == "(" else "}"
+    pos += 1
+    values = []
+    while True:
+        pos = __skip_ws(text, pos)
+        if pos >= len(text):
+            raise LabelParseException("Unterminated array value")
+        c = text[pos]
+        if c == close:
+            return values, pos + 1
+        elif c == ",":
+            pos += 1
+        elif c in "({":
+            value, pos = __read_sequence(text, pos)
+            values.append(value)
+            pos = __skip_units(text, pos)
+        elif c in "\"'":
+            value, pos = __read_quoted(text, pos)
+            values.append(value)
+            pos = __skip_units(text, pos)
+        else:
+            m = __BARE_ELEMENT.match(text, pos)
+            if m is None:
+                raise LabelParseException("Unexpected character '%s' at offset %s" % (c, pos))
+            values.append(m.group(0))
+            pos = __skip_units(text, m.end())
+
+
+def __read_bare(text, pos):
+    end = text.find("\n", pos)
+    if end == -1:
+        end = len(text)
+    line = text[pos:end]
+
+    comment = line.find("/*")
+    if comment != -1:
+        line = line[:comment]
+    units = line.find("<")
+    if units != -1:
+        line = line[:units]
+    return line.strip(), end
+
+
+def __read_value(text, pos):
+    n = len(text)
+    while pos < n and text[pos] in " \t":
+        pos += 1
+    if pos >= n:
+        return "", pos
+
+    c = text[pos]
+    if c in "({":
+        value, pos = __read_sequence(text, pos)
+        pos = __skip_units(text, pos)
+    elif c in "\"'":
+        value, pos = __read_quoted(text, pos)
+        pos = __skip_units(text, pos)
+    else:
+        value, pos = __read_bare(text, pos)
+    return value, pos
+
+
+def parse_label(text):
+    root = Block(BLOCK_ROOT, None)
+    stack = [root]
+    pos = 0
+    n = len(text)
+
+    while True:
+        pos = __skip_ws(text, pos)
+        if pos >= n:
+            break
+
+        m = __NAME.match(text, pos)
+        if m is None:
+            raise LabelParseException("Expected a keyword at offset %d"%pos)
+        name = m.group(0)
+        pos = __skip_ws(text, m.end())
+        upper = name.upper()
+
+        if pos >= n or text[pos] != "=":
+            if upper == "END":
+                break
+            elif upper in ("END_OBJECT", "END_GROUP") and len(stack) > 1:
+                stack.pop()
+            continue
+
+        value, pos = __read_value(text, pos + 1)
+
+        if upper in ("OBJECT", "BEGIN_OBJECT"):
+            block = Block(BLOCK_OBJECT, value)
+            stack[-1].blocks.append(block)
+            stack.append(block)
+        elif upper in ("GROUP", "BEGIN_GROUP"):
+            block = Block(BLOCK_GROUP, value)
+            stack[-1].blocks.append(block)
+            stack.append(block)
+        elif upper in ("END_OBJECT", "END_GROUP"):
+            if len(stack) > 1:
+                stack.pop()
+        else:
+            stack[-1].keywords.append((name, value))
+
+    return root
+
+
+def read_label_text(from_file_name):
+    """
+    Reads only as much of the file as needed to reach the label's END statement.
+    """
+    chunks = []
+    with open(from_file_name, "rb") as f:
+        while True:
+            chunk = f.read(LABEL_READ_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            text = b"".join(chunks).decode("latin-1")
+            m = __END_PATTERN.search(text)
+            if m is not None:
+                return text[:m.end()]
+    return b"".join(chunks).decode("latin-1")
+
+
+def read_imq_label_text(from_file_name):
+    """
+    Reads the PDS label from a compressed Voyager IMQ file. IMQ files are made of variable length
+    records (a 2 byte little-endian length, the data, then a pad byte if the length is odd) and the
+    label is the leading text records up to END, so the Huffman coded image records are never read.
+    """
+    lines = []
+    data = b""
+    pos = 0
+    with open(from_file_name, "rb") as f:
+        while True:
+            if pos + 2 > len(data):
+                chunk = f.read(LABEL_READ_SIZE)
+                if not chunk:
+                    break
+                data = data[pos:] + chunk
+                pos = 0
+                continue
+
+            length = struct.unpack("<H", data[pos:pos + 2])[0]
+            end = pos + 2 + length
+            if end > len(data):
+                chunk = f.read(LABEL_READ_SIZE)
+                if not chunk:
+                    raise LabelParseException("Truncated record in %s"%from_file_name)
+                data = data[pos:] + chunk
+                pos = 0
+                continue
+
+            line = data[pos + 2:end].decode("latin-1").rstrip("\x00")
+            lines.append(line)
+            pos = end + (length & 1)
+            if line.strip().upper() == "END":
+                return "\n".join(lines) + "\n"
+
+    raise LabelParseException("No label END found in %s"%from_file_name)
+
+
+def is_imq_file(from_file_name):
+    return from_file_name[-3:].upper() == "IMQ"
+
+
+def load_label(from_file_name):
+    st = os.stat(from_file_name)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    if from_file_name in __LABEL_CACHE__:
+        cached_stamp, label = __LABEL_CACHE__[from_file_name]
+        if cached_stamp == stamp:
+            __LABEL_CACHE__.move_to_end(from_file_name)
+            return label
+
+    text = read_imq_label_text(from_file_name) if is_imq_file(from_file_name) else read_label_text(from_file_name)
+    label = parse_label(text)
+    __LABEL_CACHE__[from_file_name] = (stamp, label)
+    __LABEL_CACHE__.move_to_end(from_file_name)
+    while len(__LABEL_CACHE__) > MAX_CACHED_LABELS:
+        __LABEL_CACHE__.popitem(last=False)
+    return label
+
+
+def format_value(value):
+    if type(value) == list:
+        return "(%s)" % ", ".join([format_value(v) for v in value])
+    return value
+
+
+def __format_label_value(value):
+    if type(value) == list:
+        return "(%s)" % ", ".join([__format_label_value(v) for v in value])
+    if value == "" or re.search(r"[\s,(){}<>=]", value) is not None:
+        return '"%s"' % value
+    return value
+
+
+def format_group(group, overrides={}, indent="  "):
+    """
+    Label text for a group Block, with the values in overrides (keyword -> str) replacing or
+    following its own. Units aren't kept, so values are in the keywords' default units.
+    """
+    lines = ["%sGroup = %s"%(indent, group.name)]
+    written = set()
+    for keyword, value in group.keywords:
+        if keyword in overrides:
+            value = overrides[keyword]
+            written.add(keyword)
+        lines.append("%s  %s = %s"%(indent, keyword, __format_label_value(value)))
+    for keyword, value in overrides.items():
+        if keyword not in written:
+            lines.append("%s  %s = %s"%(indent, keyword, __format_label_value(value)))
+    lines.append("%sEnd_Group"%indent)
+    return "\n".join(lines)
+
+
+def find_value(label, keyword, objname=None, grpname=None):
+    container = label
+    if objname is not None:
+        container = container.find_object(objname)
+        if container is None:
+            return None
+    if grpname is not None:
+        container = container.find_group(grpname)
+        if container is None:
+            return None
+    return container.get(keyword)
+
+
+def getkey(from_file_name, keyword, objname=None, grpname=None):
+    """
+    Native equivalent of ISIS 'getkey'. Returns the keyword value as a str (arrays formatted as
+    '(a, b, ...)'), or None if the object, group or keyword is not in the label.
+    """
+    label = load_label(from_file_name)
+    value = find_value(label, keyword, objname, grpname)
+    if value is None:
+        return None
+    return format_value(value)
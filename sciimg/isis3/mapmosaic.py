@@ -0,0 +1,168 @@
+import time
+import numpy as np
+from sciimg.isis3 import cube
+from sciimg.isis3 import labels
+from sciimg.isis3 import workers
+from sciimg.isis3 import telemetry
+
+
+"""
+In-process averaging mosaics of map projected cubes, as automos with priority=average.
+
+Cubes projected onto the same map (cam2map with the same map file and resolution) sit on a common
+pixel grid, and their offsets in it follow from the UpperLeftCornerX/Y of their Mapping groups.
+Mosaicking is then a sum and a count per output pixel. Several mosaics (one per color, say) are
+made in one pass: the output is split into blocks of lines, each block is summed from the inputs
+that overlap it, straight from their memory-mapped cores, and written to the output cubes. Blocks
+are spread over the shared worker pool.
+
+As with automos, each mosaic has two bands: the average and the number of inputs that went into it.
+Every mosaic made together covers the same area, the union of all the inputs, so they can be
+stacked with cubeit.
+"""
+
+DEFAULT_BLOCK_LINES = 256
+
+# Differences in pixel resolution or grid alignment up to this fraction of a pixel are tolerated
+GRID_TOLERANCE = 0.01
+
+MAPPING_RANGE_KEYWORDS = ("MinimumLatitude", "MaximumLatitude", "MinimumLongitude", "MaximumLongitude")
+
+
+class MapMosaicException(Exception):
+    pass
+
+
+class Placement:
+
+    def __init__(self, file_name, mosaic, samples, lines, mapping, band_bin=None):
+        self.file_name = file_name
+        self.mosaic = mosaic
+        self.samples = samples
+        self.lines = lines
+        self.mapping = mapping
+        self.band_bin = band_bin
+        self.resolution = float(mapping["PixelResolution"])
+        self.upper_left_x = float(mapping["UpperLeftCornerX"])
+        self.upper_left_y = float(mapping["UpperLeftCornerY"])
+        self.sample = 0
+        self.line = 0
+
+
+def __placement(file_name, mosaic):
+    with cube.Cube(file_name) as c:
+        mapping = c.label.find_group("Mapping")
+        if mapping is None:
+            raise MapMosaicException("%s isn't map projected"%file_name)
+        if c.bands != 1:
+            raise MapMosaicException("%s has %d bands, expected 1"%(file_name, c.bands))
+        return Placement(file_name, mosaic, c.samples, c.lines, mapping, c.label.find_group("BandBin"))
+
+
+def __place(placements):
+    """
+    Sets each input's offset on the grid of the first. Returns the output (samples, lines, upper
+    left x, upper left y).
+    """
+    first = placements[0]
+    resolution = first.resolution
+    for p in placements:
+        if p.mapping.get("ProjectionName") != first.mapping.get("ProjectionName"):
+            raise MapMosaicException("%s and %s have different projections"%(first.file_name, p.file_name))
+        if abs(p.resolution - resolution) * max(p.samples, p.lines) > GRID_TOLERANCE * resolution:
+            raise MapMosaicException("%s and %s have different resolutions"%(first.file_name, p.file_name))
+        sample = (p.upper_left_x - first.upper_left_x) / resolution
+        line = (first.upper_left_y - p.upper_left_y) / resolution
+        if abs(sample - round(sample)) > GRID_TOLERANCE or abs(line - round(line)) > GRID_TOLERANCE:
+            raise MapMosaicException("%s isn't on the pixel grid of %s"%(p.file_name, first.file_name))
+        p.sample = int(round(sample))
+        p.line = int(round(line))
+
+    min_sample = min([p.sample for p in placements])
+    min_line = min([p.line for p in placements])
+    for p in placements:
+        p.sample -= min_sample
+        p.line -= min_line
+    samples = max([p.sample + p.samples for p in placements])
+    lines = max([p.line + p.lines for p in placements])
+    return samples, lines, first.upper_left_x + min_sample * resolution, first.upper_left_y - min_line * resolution
+
+
+def __mapping_group(placements, upper_left_x, upper_left_y):
+    first = placements[0].mapping
+    overrides = {
+        "UpperLeftCornerX": repr(upper_left_x),
+        "UpperLeftCornerY": repr(upper_left_y)
+    }
+    for keyword in MAPPING_RANGE_KEYWORDS:
+        values = [float(p.mapping[keyword]) for p in placements if keyword in p.mapping]
+        if len(values) > 0:
+            overrides[keyword] = repr(min(values) if keyword.startswith("Minimum") else max(values))
+    return labels.format_group(first, overrides)
+
+
+def __mosaic_block(args):
+    first_line, last_line, samples, outputs, inputs = args
+    block_lines = last_line - first_line
+    sums = {}
+    counts = {}
+    for mosaic in outputs:
+        sums[mosaic] = np.zeros((block_lines, samples), dtype=np.float64)
+        counts[mosaic] = np.zeros((block_lines, samples), dtype=np.uint32)
+
+    for file_name, mosaic, sample, line, lines in inputs:
+        start = max(first_line, line)
+        end = min(last_line, line + lines)
+        with cube.Cube(file_name) as c:
+            values = c.read(1, lines=slice(start - line, end - line))
+        valid = np.isfinite(values)
+        rows = slice(start - first_line, end - first_line)
+        cols = slice(sample, sample + values.shape[1])
+        sums[mosaic][rows, cols] += np.where(valid, values, 0.0)
+        counts[mosaic][rows, cols] += valid
+
+    for mosaic, out_file in outputs.items():
+        count = counts[mosaic]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average = np.where(count > 0, sums[mosaic] / count, np.nan)
+        with cube.Cube(out_file, mode="r+") as c:
+            c.write(1, average, start_line=first_line)
+            c.write(2, count.astype(np.float32), start_line=first_line)
+    return block_lines
+
+
+def mosaic(inputs, outputs, block_lines=DEFAULT_BLOCK_LINES, num_threads=1):
+    """
+    inputs: {mosaic: [map projected cube, ...]}, outputs: {mosaic: output cube}. Each output is
+    the average of its inputs, over the area covered by all the inputs.
+    """
+    start = time.time()
+    placements = []
+    for name, file_names in inputs.items():
+        if name not in outputs:
+            raise MapMosaicException("No output for mosaic '%s'"%name)
+        placements += [__placement(file_name, name) for file_name in file_names]
+    if len(placements) == 0:
+        raise MapMosaicException("Nothing to mosaic")
+
+    samples, lines, upper_left_x, upper_left_y = __place(placements)
+    outputs = dict([(name, outputs[name]) for name in inputs])
+    for name, out_file in outputs.items():
+        mine = [p for p in placements if p.mosaic == name]
+        groups = [__mapping_group(placements, upper_left_x, upper_left_y)]
+        if len(mine) > 0 and mine[0].band_bin is not None:
+            groups.append(labels.format_group(mine[0].band_bin))
+        cube.create(out_file, samples, lines, bands=2, pixel_type="Real", groups=groups).close()
+
+    blocks = []
+    for first_line in range(0, lines, block_lines):
+        last_line = min(lines, first_line + block_lines)
+        overlapping = [(p.file_name, p.mosaic, p.sample, p.line, p.lines) for p in placements
+                       if p.line < last_line and p.line + p.lines > first_line]
+        blocks.append((first_line, last_line, samples, outputs, overlapping))
+    workers.map_items(__mosaic_block, blocks, num_threads)
+
+    if telemetry.is_enabled():
+        telemetry.record("mapmosaic", {"inputs": len(placements), "mosaics": len(outputs), "samples": samples, "lines": lines},
+                         time.time() - start, None, 0, len(outputs) * samples * lines * 8)
+    return outputs
@@ -1,4 +1,5 @@
 from sciimg.isis3._core import isis_command
+from sciimg.isis3 import cubestats
 import re
 
 def fillgap(from_cube, to_cube, interp="cubic", direction="sample"):
@@ -22,6 +23,17 @@ def histeq(from_cube, to_cube, minper=0.5, maxper=99.5):
 
 
 def get_data_min_max(from_cube, band=-1):
+    try:
+        stats = cubestats.merge_bands(cubestats.cube_stats(from_cube, bands=[band] if band >= 1 else None))
+        if stats.count == 0:
+            return 0, 0
+        return stats.minimum, stats.maximum
+    except:
+        # Not something the native reader handles (i.e. a detached label). Let ISIS do it.
+        return __get_data_min_max_isis(from_cube, band)
+
+
+def __get_data_min_max_isis(from_cube, band=-1):
 
     if band >= 1:
         from_cube = "%s+%s"%(from_cube, band)
@@ -6,13 +6,37 @@ import tempfile
 import traceback
 import sciimg.isis3.utility
 from sciimg.isis3 import voyager
+from sciimg.isis3 import labels
+from sciimg.isis3.labelindex import LabelIndex
+from sciimg.isis3.labelindex import INDEX_PATH_ENV
 
-__METADATA_CACHE__ = {}
+# In memory only unless a store is asked for
+__LABEL_INDEX__ = LabelIndex(os.environ.get(INDEX_PATH_ENV))
 
-def __read_invalid_voyager_label(img_file):
-    f = open(img_file, "r")
+
+"""
+Points the label index at an sqlite store (i.e. inside a pipeline work directory or one shared by
+a campaign). The path is exported through the environment so that worker processes started
+afterwards share the same store. Pass None to keep the index in memory only.
+"""
+def set_label_index_path(db_path, max_entries=None):
+    global __LABEL_INDEX__
+    if max_entries is None:
+        max_entries = __LABEL_INDEX__.max_entries
+    __LABEL_INDEX__ = LabelIndex(db_path, max_entries=max_entries)
+    if db_path is not None:
+        os.environ[INDEX_PATH_ENV] = db_path
+    elif INDEX_PATH_ENV in os.environ:
+        del os.environ[INDEX_PATH_ENV]
+
+
+def get_label_index():
+    return __LABEL_INDEX__
+
+
+def __fix_voyager_label_lines(label_lines):
     lines = []
-    for line in f.readlines():
+    for line in label_lines:
         line = line.strip()
 
         try:
@@ -28,7 +52,33 @@ def __read_invalid_voyager_label(img_file):
     lab = "\n".join(lines)
     return lab
 
+
+def __read_invalid_voyager_label(img_file):
+    f = open(img_file, "r")
+    return __fix_voyager_label_lines(f.readlines())
+
+
+"""
+The PDS label of an IMQ is stored uncompressed in its leading records, so it's read straight from
+there (see sciimg.isis3.labels.read_imq_label_text). vdcomp is only run if that fails.
+"""
+def __pvl_from_imq_label(imq_file, verbose=False):
+    text = labels.read_imq_label_text(imq_file)
+    try:
+        return pvl.loads(text)
+    except:
+        if verbose is True:
+            traceback.print_exc(file=sys.stdout)
+    return pvl.loads(__fix_voyager_label_lines(text.split("\n")))
+
+
 def __pvl_string_from_imq(imq_file, verbose=False):
+    try:
+        return __pvl_from_imq_label(imq_file, verbose)
+    except:
+        if verbose is True:
+            traceback.print_exc(file=sys.stdout)
+
     tf = tempfile.mkstemp(suffix=".img")
 
     p = None
@@ -53,10 +103,11 @@ def __pvl_string_from_imq(imq_file, verbose=False):
     return p
 
 def load_pvl(from_file, verbose=False):
-    if from_file in __METADATA_CACHE__:
+    p = __LABEL_INDEX__.get(from_file)
+    if p is not None:
         if verbose:
             print("File %s already loaded in cache."%from_file)
-        return __METADATA_CACHE__[from_file]
+        return p
 
     p = None
 
@@ -65,7 +116,8 @@ def load_pvl(from_file, verbose=False):
     else:
         p = pvl.load(from_file)
 
-    __METADATA_CACHE__[from_file] = p
+    if p is not None:
+        __LABEL_INDEX__.put(from_file, p)
 
     return p
 
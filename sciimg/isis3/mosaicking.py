@@ -1,4 +1,5 @@
 from sciimg.isis3._core import isis_command
+from sciimg.isis3._core import isis_command_async
 
 
 class Priority:
@@ -11,7 +12,7 @@ class Grange:
     AUTO = "AUTO"
     USER = "USER"
 
-def automos(from_list, to_file, priority=Priority.ONTOP, grange=Grange.AUTO, minlat=None, maxlat=None, minlon=None, maxlon=None):
+def __automos_params(from_list, to_file, priority=Priority.ONTOP, grange=Grange.AUTO, minlat=None, maxlat=None, minlon=None, maxlon=None):
 
     params = {
         "fromlist": from_list,
@@ -30,5 +31,15 @@ def automos(from_list, to_file, priority=Priority.ONTOP, grange=Grange.AUTO, min
         if maxlon is not None:
             params["maxlon"] = maxlon
 
-    s = isis_command("automos", params)
+    return params
+
+
+def automos(from_list, to_file, priority=Priority.ONTOP, grange=Grange.AUTO, minlat=None, maxlat=None, minlon=None, maxlon=None):
+    s = isis_command("automos", __automos_params(from_list, to_file, priority, grange, minlat, maxlat, minlon, maxlon))
+    return s
+
+
+async def automos_async(from_list, to_file, priority=Priority.ONTOP, grange=Grange.AUTO, minlat=None, maxlat=None, minlon=None, maxlon=None):
+    s = await isis_command_async("automos", __automos_params(from_list, to_file, priority, grange, minlat, maxlat, minlon, maxlon))
     return s
+
@@ -0,0 +1,300 @@
+import os
+import sys
+import glob
+import fcntl
+import shutil
+import tempfile
+import traceback
+from sciimg.isis3._core import ISIS_PREFERENCES_ENV
+
+
+"""
+Scratch space for pipeline intermediates.
+
+Every run of a product gets its own, uniquely named, work directory (raw, fill, cal, stdz, trim and
+mapped cubes, the ISIS session log), which is removed as a whole when processing finishes or
+fails. Final products are built in the work directory and promoted into place with an atomic
+rename, so concurrent runs in one directory tree never see or clobber each other's files. By default it's made under
+<source directory>/work, as it always was. set_scratch_dir() (the --scratch option) moves work
+directories onto faster storage, e.g. /dev/shm or a local NVMe disk, up to a budget: a work
+directory that would push the scratch disk past the budget, or past its free space, spills to the
+secondary location (--scratch-spill, otherwise the source directory).
+
+With set_resume() (the --resume option) a product's work directory has a fixed name instead, is
+kept when processing fails, and is picked up again by the next run so that it can carry on from
+its last checkpoint (see sciimg.isis3.checkpoint). It's locked while in use, so a second run of the
+same product at the same time gets a directory of its own.
+
+Settings are kept in the environment so that pool workers inherit them.
+"""
+
+SCRATCH_DIR_ENV = "SCIIMG_SCRATCH_DIR"
+SCRATCH_BUDGET_ENV = "SCIIMG_SCRATCH_BUDGET_BYTES"
+SCRATCH_SPILL_DIR_ENV = "SCIIMG_SCRATCH_SPILL_DIR"
+RESUME_ENV = "SCIIMG_RESUME"
+
+WORK_DIR_PREFIX = "sciimg-"
+RESUMABLE_SUFFIX = "-resume"
+LOCK_FILE = ".lock"
+ISIS_PREFERENCES_FILE = "IsisPreferences"
+ISIS_SESSION_LOG = "print.prt"
+
+# Expected size of a product's intermediates relative to its input file(s)
+DEFAULT_SIZE_FACTOR = 12
+
+# Always left free on a scratch or spill disk
+MIN_FREE_BYTES = 256 * 1024 * 1024
+
+
+def set_scratch_dir(scratch_dir, budget_bytes=None, spill_dir=None):
+    for env, value in ((SCRATCH_DIR_ENV, scratch_dir), (SCRATCH_BUDGET_ENV, budget_bytes), (SCRATCH_SPILL_DIR_ENV, spill_dir)):
+        if value is None:
+            if env in os.environ:
+                del os.environ[env]
+        elif env == SCRATCH_BUDGET_ENV:
+            os.environ[env] = str(int(value))
+        else:
+            os.environ[env] = os.path.abspath(value)
+
+
+def get_scratch_dir():
+    return os.environ.get(SCRATCH_DIR_ENV)
+
+
+def get_spill_dir():
+    return os.environ.get(SCRATCH_SPILL_DIR_ENV)
+
+
+def set_resume(enabled):
+    if enabled:
+        os.environ[RESUME_ENV] = "1"
+    elif RESUME_ENV in os.environ:
+        del os.environ[RESUME_ENV]
+
+
+def is_resume_enabled():
+    return os.environ.get(RESUME_ENV, "") not in ("", "0")
+
+
+def get_budget():
+    """
+    Scratch budget in bytes, or None to be limited by free space only
+    """
+    if SCRATCH_BUDGET_ENV in os.environ:
+        return int(os.environ[SCRATCH_BUDGET_ENV])
+    return None
+
+
+def directory_size(dir_name):
+    total = 0
+    for root, dirs, files in os.walk(dir_name):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+def scratch_usage(scratch_dir=None):
+    """
+    Bytes held by work directories (of any process) under the scratch directory
+    """
+    if scratch_dir is None:
+        scratch_dir = get_scratch_dir()
+    if scratch_dir is None:
+        return 0
+    return sum([directory_size(d) for d in glob.glob(os.path.join(scratch_dir, "%s*"%WORK_DIR_PREFIX))])
+
+
+def __free_bytes(dir_name):
+    try:
+        return shutil.disk_usage(dir_name).free
+    except OSError:
+        return 0
+
+
+def estimate_size(source_files, size_factor=DEFAULT_SIZE_FACTOR):
+    if isinstance(source_files, str):
+        source_files = [source_files]
+    total = 0
+    for source_file in source_files:
+        try:
+            total += os.path.getsize(source_file)
+        except (OSError, TypeError):
+            pass
+        # Detached labels: the data is in the .IMG next to them
+        base, ext = os.path.splitext(str(source_file))
+        if ext.upper() == ".LBL":
+            for data_ext in (".IMG", ".img"):
+                if os.path.exists(base + data_ext):
+                    total += os.path.getsize(base + data_ext)
+                    break
+    return total * size_factor
+
+
+def __fits(dir_name, estimate, budget=None):
+    if not os.path.isdir(dir_name):
+        return False
+    if __free_bytes(dir_name) < estimate + MIN_FREE_BYTES:
+        return False
+    if budget is not None and scratch_usage(dir_name) + estimate > budget:
+        return False
+    return True
+
+
+def choose_root(source_dirname, estimate=0):
+    """
+    Picks the directory a new work directory goes under: the scratch directory if it's within
+    budget, then the spill directory, then <source_dirname>/work.
+    """
+    scratch_dir = get_scratch_dir()
+    if scratch_dir is not None and __fits(scratch_dir, estimate, get_budget()):
+        return scratch_dir
+
+    spill_dir = get_spill_dir()
+    if spill_dir is not None and __fits(spill_dir, estimate):
+        return spill_dir
+
+    return os.path.join(source_dirname if source_dirname != "" else ".", "work")
+
+
+class WorkDir:
+
+    def __init__(self, path, keep=False, resumable=False, lock=None):
+        self.path = path
+        self.keep = keep
+        self.resumable = resumable
+        self.__lock = lock
+        self.__subdirs = {}
+        self.__saved_preferences = None
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def subdir(self, name):
+        if name not in self.__subdirs:
+            dir_name = os.path.join(self.path, name)
+            if not os.path.exists(dir_name):
+                os.makedirs(dir_name, exist_ok=True)
+            self.__subdirs[name] = dir_name
+        return self.__subdirs[name]
+
+    def usage(self):
+        return directory_size(self.path) if os.path.exists(self.path) else 0
+
+    def promote(self, work_file, to_file):
+        """
+        Moves a finished product out of the work directory. The file appears at to_file complete
+        or not at all: it's renamed into place, after a copy next to it if the work directory is on
+        another file system.
+        """
+        to_dir = os.path.dirname(os.path.abspath(to_file))
+        try:
+            os.replace(work_file, to_file)
+        except OSError:
+            fd, tmp_file = tempfile.mkstemp(prefix=".%s."%os.path.basename(to_file), dir=to_dir)
+            os.close(fd)
+            try:
+                shutil.copyfile(work_file, tmp_file)
+                os.replace(tmp_file, to_file)
+            except:
+                if os.path.exists(tmp_file):
+                    os.unlink(tmp_file)
+                raise
+            os.unlink(work_file)
+        return to_file
+
+    def __write_isis_preferences(self):
+        preferences_file = self.file(ISIS_PREFERENCES_FILE)
+        with open(preferences_file, "w") as f:
+            f.write("Group = SessionLog\n")
+            f.write("  FileName = \"%s\"\n"%self.file(ISIS_SESSION_LOG))
+            f.write("EndGroup\n")
+        return preferences_file
+
+    def cleanup(self):
+        if self.keep:
+            print("Work files kept in %s"%self.path)
+            return
+        if not os.path.exists(self.path):
+            return
+        try:
+            shutil.rmtree(self.path)
+        except OSError:
+            traceback.print_exc(file=sys.stdout)
+
+    def __enter__(self):
+        self.__saved_preferences = os.environ.get(ISIS_PREFERENCES_ENV)
+        os.environ[ISIS_PREFERENCES_ENV] = self.__write_isis_preferences()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self.__saved_preferences is not None:
+            os.environ[ISIS_PREFERENCES_ENV] = self.__saved_preferences
+        elif ISIS_PREFERENCES_ENV in os.environ:
+            del os.environ[ISIS_PREFERENCES_ENV]
+        if exc_type is not None and self.resumable:
+            print("Work files kept in %s, rerun with --resume to continue"%self.path)
+        else:
+            self.cleanup()
+        if self.__lock is not None:
+            self.__lock.close()
+            self.__lock = None
+        return False
+
+    def __repr__(self):
+        return "WorkDir(%s)"%self.path
+
+
+def __lock_dir(path):
+    """
+    Takes the lock on a work directory. Returns the open lock file, or None if another process
+    holds it.
+    """
+    lock = open(os.path.join(path, LOCK_FILE), "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (IOError, OSError):
+        lock.close()
+        return None
+    return lock
+
+
+def find_resumable(source_dirname, product_id):
+    """
+    The work directory a failed resumable run on the product left behind, under any of the
+    places work directories go, or None
+    """
+    name = "%s%s%s"%(WORK_DIR_PREFIX, product_id, RESUMABLE_SUFFIX)
+    for root in (get_scratch_dir(), get_spill_dir(), os.path.join(source_dirname if source_dirname != "" else ".", "work")):
+        if root is not None and os.path.isdir(os.path.join(root, name)):
+            return os.path.abspath(os.path.join(root, name))
+    return None
+
+
+def work_dir(source_dirname, product_id, source_files=None, size_factor=DEFAULT_SIZE_FACTOR, keep=False):
+    """
+    Creates a new work directory for a run on a product. Use it as a context manager so that
+    it's removed however processing ends (unless keep is True, i.e. --nocleanup, or resuming is
+    enabled and processing failed). ISIS applications run inside the context log to the work
+    directory rather than ./print.prt.
+    """
+    if is_resume_enabled():
+        path = find_resumable(source_dirname, product_id)
+        if path is None:
+            estimate = estimate_size(source_files, size_factor) if source_files is not None else 0
+            root = choose_root(source_dirname, estimate)
+            path = os.path.join(os.path.abspath(root), "%s%s%s"%(WORK_DIR_PREFIX, product_id, RESUMABLE_SUFFIX))
+            os.makedirs(path, exist_ok=True)
+        lock = __lock_dir(path)
+        if lock is not None:
+            return WorkDir(path, keep, resumable=True, lock=lock)
+        print("%s is in use by another run, not resuming"%path)
+
+    estimate = estimate_size(source_files, size_factor) if source_files is not None else 0
+    root = choose_root(source_dirname, estimate)
+    if not os.path.exists(root):
+        os.makedirs(root, exist_ok=True)
+    path = tempfile.mkdtemp(prefix="%s%s-"%(WORK_DIR_PREFIX, product_id), dir=os.path.abspath(root))
+    return WorkDir(path, keep)
@@ -2,6 +2,7 @@ import tempfile
 import os
 import sys
 from sciimg.isis3 import voyager
+from sciimg.isis3 import labels
 from sciimg.isis3._core import isis_command
 import traceback
 import pvl
@@ -22,7 +23,38 @@ def __getkey_voy2isis(from_file_name, keyword, objname=None, grpname=None, verbo
     return value
 
 
+"""
+ISIS Instrument group keywords that voy2isis copies verbatim from the IMQ's PDS label. These (and
+the PDS keywords themselves) are answered from the IMQ label records without decompressing.
+"""
+__IMQ_KEYWORDS__ = {
+    "SpacecraftName": "SPACECRAFT_NAME",
+    "TargetName": "TARGET_NAME",
+    "InstrumentId": "INSTRUMENT_NAME",
+    "ScanModeId": "SCAN_MODE_ID",
+    "ShutterModeId": "SHUTTER_MODE_ID",
+    "GainModeId": "GAIN_MODE_ID",
+    "EditModeId": "EDIT_MODE_ID"
+}
+
+
+def __getkey_imq_label(from_file_name, keyword, objname=None, grpname=None):
+    label = labels.load_label(from_file_name)
+    if keyword in __IMQ_KEYWORDS__ and objname is None and grpname in (None, "Instrument"):
+        value = labels.find_value(label, __IMQ_KEYWORDS__[keyword])
+    else:
+        value = labels.find_value(label, keyword, objname, grpname)
+    return labels.format_value(value) if value is not None else None
+
+
 def __getkey_vdcomp(from_file_name, keyword, objname=None, grpname=None, verbose=False):
+    try:
+        value = __getkey_imq_label(from_file_name, keyword, objname, grpname)
+        if value is not None:
+            return value
+    except:
+        if verbose is True:
+            traceback.print_exc(file=sys.stdout)
 
     tf = tempfile.mkstemp(suffix=".img")
     try:
@@ -39,26 +71,51 @@ def __getkey_vdcomp(from_file_name, keyword, objname=None, grpname=None, verbose
 
 
 
+def __getkey_isis(from_file_name, keyword, objname=None, grpname=None, verbose=False):
+    try:
+        cmd = "getkey"
+        params = {
+            "from" : from_file_name,
+            "keyword": keyword
+        }
+
+        if objname is not None:
+            params["objname"] = objname
+
+        if grpname is not None:
+            params["grpname"] = grpname
+
+        s = isis_command(cmd, params)
+        return s.strip()
+    except:
+        if verbose is True:
+            traceback.print_exc(file=sys.stdout)
+        return None
+
+
+"""
+Labels are read in-process (see sciimg.isis3.labels). The ISIS 'getkey' application is only
+run if the native reader can't make sense of the label, and IMQ files only go through voy2isis
+for keywords their PDS label doesn't carry. Values are always returned as str.
+"""
 def getkey(from_file_name, keyword, objname=None, grpname=None, verbose=False):
     if from_file_name[-3:].upper() == "IMQ":
+        try:
+            value = __getkey_imq_label(from_file_name, keyword, objname, grpname)
+            if value is not None:
+                return value
+        except:
+            if verbose is True:
+                traceback.print_exc(file=sys.stdout)
         return __getkey_voy2isis(from_file_name, keyword, objname, grpname, verbose)
     else:
         try:
-            cmd = "getkey"
-            params = {
-                "from" : from_file_name,
-                "keyword": keyword
-            }
-
-            if objname is not None:
-                params["objname"] = objname
-
-            if grpname is not None:
-                params["grpname"] = grpname
-
-            s = isis_command(cmd, params)
-            return s.strip()
-        except:
+            return labels.getkey(from_file_name, keyword, objname, grpname)
+        except (IOError, OSError):
             if verbose is True:
                 traceback.print_exc(file=sys.stdout)
             return None
+        except:
+            if verbose is True:
+                traceback.print_exc(file=sys.stdout)
+            return __getkey_isis(from_file_name, keyword, objname, grpname, verbose)
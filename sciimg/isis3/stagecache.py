@@ -0,0 +1,345 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import hashlib
+import traceback
+
+
+"""
+Content-addressed cache for deterministic ISIS stages.
+
+A cache key is the hash of the input (file content, or the key of the cached stage that produced
+it), the application name, the normalized parameters (files named in parameters are replaced by
+their fingerprint, output names are dropped), the ISIS version and a fingerprint of the installed
+kernel databases. The value is the stage's output cube(s). Entries live under one directory that
+can be shared between runs and are evicted least-recently-used first once the cache grows past
+its size budget.
+
+Enable it with set_cache_dir() (the --cache-dir option on process.py/process_junocam.py) or the
+SCIIMG_STAGE_CACHE_DIR environment variable.
+"""
+
+CACHE_DIR_ENV = "SCIIMG_STAGE_CACHE_DIR"
+CACHE_MAX_BYTES_ENV = "SCIIMG_STAGE_CACHE_MAX_BYTES"
+CACHE_VERBOSE_ENV = "SCIIMG_STAGE_CACHE_VERBOSE"
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024 * 1024
+
+CACHEABLE_APPS = ("ciss2isis", "spiceinit", "cisscal", "voycal", "gllssical", "junocam2isis", "cam2map")
+
+# Applications that update their 'from' cube instead of writing a 'to' cube
+IN_PLACE_APPS = ("spiceinit",)
+
+# Applications that write a set of cubes named after the 'to' parameter (<to>_<suffix>.cub)
+MULTI_OUTPUT_APPS = ("junocam2isis",)
+
+MANIFEST_FILE = "manifest.json"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+__KNOWN_KEYS__ = {}
+__ENVIRONMENT_FINGERPRINT__ = None
+
+
+def set_cache_dir(cache_dir, max_bytes=None, verbose=False):
+    if cache_dir is None:
+        if CACHE_DIR_ENV in os.environ:
+            del os.environ[CACHE_DIR_ENV]
+        return
+    os.environ[CACHE_DIR_ENV] = os.path.abspath(cache_dir)
+    if max_bytes is not None:
+        os.environ[CACHE_MAX_BYTES_ENV] = str(int(max_bytes))
+    if verbose:
+        os.environ[CACHE_VERBOSE_ENV] = "1"
+    elif CACHE_VERBOSE_ENV in os.environ:
+        del os.environ[CACHE_VERBOSE_ENV]
+
+
+def get_cache_dir():
+    return os.environ.get(CACHE_DIR_ENV)
+
+
+def get_max_bytes():
+    return int(os.environ.get(CACHE_MAX_BYTES_ENV, DEFAULT_MAX_BYTES))
+
+
+def is_enabled():
+    return get_cache_dir() is not None
+
+
+def is_verbose():
+    return os.environ.get(CACHE_VERBOSE_ENV) == "1"
+
+
+def is_cacheable(cmd):
+    return is_enabled() and cmd in CACHEABLE_APPS
+
+
+def __file_stamp(file_name):
+    st = os.stat(file_name)
+    return st.st_mtime_ns, st.st_size
+
+
+def __strip_attributes(file_name):
+    """
+    Removes ISIS band/attribute suffixes ('file.cub+1') when they aren't part of the file name
+    """
+    file_name = str(file_name)
+    if os.path.exists(file_name):
+        return file_name
+    if "+" in file_name and os.path.exists(file_name.split("+")[0]):
+        return file_name.split("+")[0]
+    return None
+
+
+def __hash_file(file_name, h):
+    with open(file_name, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            h.update(block)
+
+
+def file_fingerprint(file_name):
+    """
+    Fingerprint of a file's content. Files produced (or restored) by this cache reuse the key of
+    the entry they came from rather than being hashed again. Detached PDS labels include the data
+    file next to them.
+    """
+    path = os.path.abspath(file_name)
+    stamp = __file_stamp(path)
+    if path in __KNOWN_KEYS__ and __KNOWN_KEYS__[path][0] == stamp:
+        return __KNOWN_KEYS__[path][1]
+
+    h = hashlib.sha1()
+    __hash_file(path, h)
+
+    base, ext = os.path.splitext(path)
+    if ext.upper() == ".LBL":
+        for data_ext in (".IMG", ".img"):
+            if os.path.exists(base + data_ext):
+                __hash_file(base + data_ext, h)
+                break
+
+    fingerprint = h.hexdigest()
+    __KNOWN_KEYS__[path] = (stamp, fingerprint)
+    return fingerprint
+
+
+def __remember_output(file_name, key):
+    path = os.path.abspath(file_name)
+    try:
+        __KNOWN_KEYS__[path] = (__file_stamp(path), key)
+    except OSError:
+        pass
+
+
+def environment_fingerprint():
+    """
+    Identifies the ISIS install and the kernel databases it'll select from. Any change to either
+    invalidates every cache entry.
+    """
+    global __ENVIRONMENT_FINGERPRINT__
+    if __ENVIRONMENT_FINGERPRINT__ is not None:
+        return __ENVIRONMENT_FINGERPRINT__
+
+    h = hashlib.sha1()
+
+    isis_root = os.environ.get("ISISROOT", "")
+    h.update(isis_root.encode("UTF-8"))
+    for version_file in ("version", "isis_version.txt"):
+        path = os.path.join(isis_root, version_file)
+        if os.path.exists(path):
+            __hash_file(path, h)
+
+    isis_data = os.environ.get("ISISDATA", "")
+    h.update(isis_data.encode("UTF-8"))
+    for db_file in sorted(glob.glob("%s/*/kernels/*/*.db"%isis_data)):
+        try:
+            h.update(("%s:%s:%s"%((db_file,) + __file_stamp(db_file))).encode("UTF-8"))
+        except OSError:
+            pass
+
+    __ENVIRONMENT_FINGERPRINT__ = h.hexdigest()
+    return __ENVIRONMENT_FINGERPRINT__
+
+
+def cache_key(cmd, params):
+    if "from" not in params:
+        return None
+
+    input_file = __strip_attributes(params["from"])
+    if input_file is None:
+        return None
+
+    normalized = {}
+    for k in params.keys():
+        if k in ("from", "to"):
+            continue
+        v = str(params[k])
+        param_file = __strip_attributes(v) if ("/" in v or "." in v) else None
+        if param_file is not None and os.path.isfile(param_file):
+            v = "file:%s%s"%(file_fingerprint(param_file), v[len(param_file):])
+        normalized[k.lower()] = v
+
+    from_value = str(params["from"])
+    key_data = {
+        "app": cmd,
+        "input": file_fingerprint(input_file),
+        "input_attributes": from_value[len(input_file):],
+        "params": normalized,
+        "environment": environment_fingerprint()
+    }
+    return hashlib.sha1(json.dumps(key_data, sort_keys=True).encode("UTF-8")).hexdigest()
+
+
+def __entry_dir(key):
+    return os.path.join(get_cache_dir(), key[:2], key)
+
+
+def __output_files(cmd, params):
+    """
+    Returns (file, name-in-cache) pairs for what the application wrote.
+    """
+    if cmd in IN_PLACE_APPS:
+        return [(str(params["from"]), "output.cub")]
+
+    to_file = str(params["to"])
+    if cmd in MULTI_OUTPUT_APPS:
+        base = to_file[:-4] if to_file[-4:].lower() == ".cub" else to_file
+        return [(f, "output%s"%f[len(base):]) for f in sorted(glob.glob("%s_*.cub"%base))]
+
+    return [(to_file, "output.cub")]
+
+
+def __restore_file(cmd, params, cached_name):
+    if cmd in IN_PLACE_APPS:
+        return str(params["from"])
+    to_file = str(params["to"])
+    if cmd in MULTI_OUTPUT_APPS:
+        base = to_file[:-4] if to_file[-4:].lower() == ".cub" else to_file
+        return "%s%s"%(base, cached_name[len("output"):])
+    return to_file
+
+
+def fetch(cmd, params, key, verbose=None):
+    """
+    Copies a cached result into place. Returns the application output recorded with it, or None
+    on a miss.
+    """
+    entry_dir = __entry_dir(key)
+    manifest_file = os.path.join(entry_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        return None
+
+    try:
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+
+        for cached_name in manifest["files"]:
+            to_file = __restore_file(cmd, params, cached_name)
+            tmp_file = "%s.cache-%d"%(to_file, os.getpid())
+            shutil.copyfile(os.path.join(entry_dir, cached_name), tmp_file)
+            os.rename(tmp_file, to_file)
+            __remember_output(to_file, "%s:%s"%(key, cached_name))
+
+        os.utime(entry_dir, None)
+        return manifest.get("output", "")
+    except (IOError, OSError, ValueError, KeyError):
+        if verbose or (verbose is None and is_verbose()):
+            traceback.print_exc(file=sys.stdout)
+        return None
+
+
+def store(cmd, params, key, output="", verbose=None):
+    files = __output_files(cmd, params)
+    if len(files) == 0:
+        return
+
+    entry_dir = __entry_dir(key)
+    tmp_dir = "%s.tmp-%d"%(entry_dir, os.getpid())
+    try:
+        if not os.path.exists(tmp_dir):
+            os.makedirs(tmp_dir)
+        for file_name, cached_name in files:
+            shutil.copyfile(file_name, os.path.join(tmp_dir, cached_name))
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump({
+                "app": cmd,
+                "created": time.time(),
+                "files": [cached_name for file_name, cached_name in files],
+                "output": output
+            }, f)
+
+        if os.path.exists(entry_dir):
+            # Another process stored the same result first
+            shutil.rmtree(tmp_dir)
+        else:
+            os.rename(tmp_dir, entry_dir)
+    except (IOError, OSError):
+        if verbose or (verbose is None and is_verbose()):
+            traceback.print_exc(file=sys.stdout)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+
+    for file_name, cached_name in files:
+        __remember_output(file_name, "%s:%s"%(key, cached_name))
+
+    evict()
+
+
+def __dir_size(dir_name):
+    total = 0
+    for f in os.listdir(dir_name):
+        try:
+            total += os.path.getsize(os.path.join(dir_name, f))
+        except OSError:
+            pass
+    return total
+
+
+def evict(max_bytes=None):
+    """
+    Removes least recently used entries until the cache is within its size budget.
+    """
+    if max_bytes is None:
+        max_bytes = get_max_bytes()
+
+    entries = []
+    for entry_dir in glob.glob(os.path.join(get_cache_dir(), "??", "*")):
+        if not os.path.exists(os.path.join(entry_dir, MANIFEST_FILE)):
+            continue
+        try:
+            entries.append((os.stat(entry_dir).st_mtime, __dir_size(entry_dir), entry_dir))
+        except OSError:
+            pass
+
+    total = sum([e[1] for e in entries])
+    for mtime, size, entry_dir in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
+
+
+def run_cached(cmd, params, runner):
+    """
+    Returns the output of runner(cmd, params), or restores a previous identical run's result.
+    """
+    try:
+        key = cache_key(cmd, params)
+    except (IOError, OSError):
+        key = None
+
+    if key is None:
+        return runner(cmd, params)
+
+    output = fetch(cmd, params, key)
+    if output is not None:
+        return output
+
+    output = runner(cmd, params)
+    store(cmd, params, key, output)
+    return output
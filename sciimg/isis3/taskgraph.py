@@ -0,0 +1,69 @@
+import asyncio
+from sciimg.isis3 import _core
+
+
+"""
+A dependency graph of asynchronous tasks.
+
+Each task is a coroutine function and the names of the tasks whose results it takes. run() starts
+every task on the event loop at once; each waits only for its own dependencies, so a task starts
+as soon as its inputs are ready rather than when a whole stage is done. The number of ISIS
+processes running at a time is bounded by the ISIS semaphore in sciimg.isis3._core, and whichever
+task is ready takes the next free slot. That keeps every core busy the way a work-stealing pool
+would, without per-worker queues.
+
+Dependencies have to be added before the tasks that use them, so the graph can't have cycles.
+A task whose dependency raised fails with that same exception, without running.
+"""
+
+
+class TaskGraphException(Exception):
+    pass
+
+
+class TaskGraph:
+
+    def __init__(self):
+        self.__tasks = {}
+        self.__order = []
+
+    def add(self, name, func, deps=()):
+        """
+        func is called as await func(*[result of each dependency])
+        """
+        if name in self.__tasks:
+            raise TaskGraphException("Duplicate task '%s'"%name)
+        for dep in deps:
+            if dep not in self.__tasks:
+                raise TaskGraphException("Task '%s' depends on unknown task '%s'"%(name, dep))
+        self.__tasks[name] = (func, tuple(deps))
+        self.__order.append(name)
+        return name
+
+    def __contains__(self, name):
+        return name in self.__tasks
+
+    def __len__(self):
+        return len(self.__order)
+
+    async def run(self, max_procs=None):
+        """
+        Runs the graph. Returns {name: result}, with the exception as the result of failed tasks.
+        max_procs lowers the number of ISIS processes the tasks run at a time.
+        """
+        if max_procs is not None:
+            _core.get_isis_semaphore(max_procs)
+        futures = {}
+
+        async def run_task(name):
+            func, deps = self.__tasks[name]
+            dep_results = []
+            for dep in deps:
+                dep_results.append(await futures[dep])
+            return await func(*dep_results)
+
+        for name in self.__order:
+            futures[name] = asyncio.ensure_future(run_task(name))
+
+        results = await asyncio.gather(*[futures[name] for name in self.__order], return_exceptions=True)
+        return dict(zip(self.__order, results))
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import socket
+
+
+"""
+Opt-in performance trace of ISIS application runs.
+
+When a trace file is set (set_trace_file() or the SCIIMG_TRACE_FILE environment variable), every
+call through sciimg.isis3._core appends one JSON line with the app name, parameters, wall time,
+child CPU time, peak child RSS and bytes written to the 'to' target(s). Records are tagged with the
+current pipeline stage (set_stage()). Both settings live in the environment so pool workers started
+afterwards inherit them.
+
+Independently of the trace, the wall time spent in each stage is kept in memory by the process that
+sets the stages (stage_times()), for a quick breakdown at the end of a run.
+
+Summarize a trace with isis_trace_summary.py.
+"""
+
+TRACE_FILE_ENV = "SCIIMG_TRACE_FILE"
+TRACE_STAGE_ENV = "SCIIMG_TRACE_STAGE"
+
+__STAGE_TIMES__ = {}
+__STAGE_STARTED__ = [None, None]
+
+
+def set_trace_file(trace_file):
+    if trace_file is None:
+        if TRACE_FILE_ENV in os.environ:
+            del os.environ[TRACE_FILE_ENV]
+    else:
+        os.environ[TRACE_FILE_ENV] = os.path.abspath(trace_file)
+
+
+def get_trace_file():
+    return os.environ.get(TRACE_FILE_ENV)
+
+
+def is_enabled():
+    return get_trace_file() is not None
+
+
+def __end_stage():
+    stage, started = __STAGE_STARTED__
+    if stage is not None:
+        __STAGE_TIMES__[stage] = __STAGE_TIMES__.get(stage, 0.0) + time.time() - started
+    __STAGE_STARTED__[0] = None
+    __STAGE_STARTED__[1] = None
+
+
+def set_stage(stage):
+    __end_stage()
+    if stage is not None:
+        __STAGE_STARTED__[0] = stage
+        __STAGE_STARTED__[1] = time.time()
+    if stage is None:
+        if TRACE_STAGE_ENV in os.environ:
+            del os.environ[TRACE_STAGE_ENV]
+    else:
+        os.environ[TRACE_STAGE_ENV] = stage
+
+
+def get_stage():
+    return os.environ.get(TRACE_STAGE_ENV)
+
+
+def stage_times():
+    """
+    Wall time in seconds spent in each stage set in this process so far. The current stage is
+    counted up to now.
+    """
+    times = dict(__STAGE_TIMES__)
+    stage, started = __STAGE_STARTED__
+    if stage is not None:
+        times[stage] = times.get(stage, 0.0) + time.time() - started
+    return times
+
+
+def reset_stage_times():
+    __STAGE_TIMES__.clear()
+    __STAGE_STARTED__[0] = None
+    __STAGE_STARTED__[1] = None
+
+
+def print_stage_times(title="Stage timings"):
+    times = stage_times()
+    if len(times) == 0:
+        return
+    print("%s:"%title)
+    for stage, wall in times.items():
+        print("    %-20s %9.2f s"%(stage, wall))
+    print("    %-20s %9.2f s"%("total", sum(times.values())))
+
+
+def output_size(params, key="to"):
+    """
+    Size in bytes of the file named by the 'to' parameter (with any ISIS '+band'/attribute suffix
+    removed), or 0 if it doesn't exist.
+    """
+    if key not in params:
+        return 0
+    to_file = str(params[key]).split("+")[0]
+    try:
+        return os.path.getsize(to_file)
+    except OSError:
+        return 0
+
+
+def record(cmd, params, wall_time, rusage, returncode, bytes_written, batch_size=None):
+    trace_file = get_trace_file()
+    if trace_file is None:
+        return
+
+    rec = {
+        "time": time.time(),
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "stage": get_stage(),
+        "app": cmd,
+        "params": dict([(k, str(v)) for k, v in params.items()]),
+        "wall": wall_time,
+        "cpu_user": rusage.ru_utime if rusage is not None else None,
+        "cpu_system": rusage.ru_stime if rusage is not None else None,
+        "max_rss_kb": rusage.ru_maxrss if rusage is not None else None,
+        "bytes_written": bytes_written,
+        "returncode": returncode
+    }
+    if batch_size is not None:
+        rec["batch_size"] = batch_size
+
+    # One write per record on an O_APPEND descriptor keeps lines from concurrent workers intact
+    line = (json.dumps(rec) + "\n").encode("UTF-8")
+    fd = os.open(trace_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def load_trace(trace_file):
+    records = []
+    with open(trace_file, "r") as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass # A partially written line from an interrupted run
+    return records
+
+
+def summarize(records, key="app"):
+    """
+    Aggregates trace records by 'app' or 'stage'. Returns a dict of name -> totals.
+    """
+    summary = {}
+    for rec in records:
+        name = rec.get(key)
+        if name is None:
+            name = "(none)"
+        if name not in summary:
+            summary[name] = {
+                "calls": 0,
+                "items": 0,
+                "failures": 0,
+                "wall": 0.0,
+                "wall_max": 0.0,
+                "cpu": 0.0,
+                "max_rss_kb": 0,
+                "bytes_written": 0
+            }
+        s = summary[name]
+        s["calls"] += 1
+        s["items"] += rec.get("batch_size", 1)
+        if rec.get("returncode", 0) != 0:
+            s["failures"] += 1
+        s["wall"] += rec["wall"]
+        s["wall_max"] = max(s["wall_max"], rec["wall"])
+        s["cpu"] += (rec.get("cpu_user") or 0.0) + (rec.get("cpu_system") or 0.0)
+        s["max_rss_kb"] = max(s["max_rss_kb"], rec.get("max_rss_kb") or 0)
+        s["bytes_written"] += rec.get("bytes_written") or 0
+    return summary
@@ -1,17 +1,37 @@
 from sciimg.isis3._core import isis_command
+from sciimg.isis3._core import isis_command_batch
+from sciimg.isis3._core import isis_command_async
 
 
-def trim(from_cube, to_cube, top=2, bottom=2, left=2, right=2):
-    s = isis_command("trim", {
+def __trim_params(from_cube, to_cube, top=2, bottom=2, left=2, right=2):
+    return {
         "from": from_cube,
         "to": to_cube,
         "top": top,
         "bottom": bottom,
         "left": left,
         "right": right
-    })
+    }
+
+
+def trim(from_cube, to_cube, top=2, bottom=2, left=2, right=2):
+    s = isis_command("trim", __trim_params(from_cube, to_cube, top, bottom, left, right))
     return s
 
+
+async def trim_async(from_cube, to_cube, top=2, bottom=2, left=2, right=2):
+    s = await isis_command_async("trim", __trim_params(from_cube, to_cube, top, bottom, left, right))
+    return s
+
+
+"""
+cubes: list of (from_cube, to_cube) tuples. Returns a list of BatchResult in the same order.
+"""
+def trim_batch(cubes, top=2, bottom=2, left=2, right=2):
+    param_list = [__trim_params(from_cube, to_cube, top, bottom, left, right) for from_cube, to_cube in cubes]
+    return isis_command_batch("trim", param_list)
+
+
 def circle(from_cube, to_cube, rad=None):
     params = {
         "from": from_cube,
@@ -5,17 +5,27 @@ import sciimg.pipelines.cassini_iss.processing as cassproc
 import sciimg.pipelines.voyager_iss.processing as voyproc
 import sciimg.pipelines.galileo_iss.processing as galproc
 import sciimg.pipelines.junocam.processing as jnoproc
+from sciimg.isis3 import detect
 
+__PIPELINES__ = {
+    detect.Mission.CASSINI: cassproc,
+    detect.Mission.VOYAGER: voyproc,
+    detect.Mission.GALILEO: galproc,
+    detect.Mission.JUNO: jnoproc
+}
 
 
-def output_filename(lbl_file_name):
+def get_pipeline(lbl_file_name):
+    """
+    The pipeline module for a file (or sciimg.isis3.detect.FileDescriptor), or None
+    """
+    return __PIPELINES__.get(detect.describe(lbl_file_name).mission)
+
 
-    if cassproc.is_supported_file(lbl_file_name):
-        return cassproc.output_filename(lbl_file_name)
-    elif voyproc.is_supported_file(lbl_file_name):
-        return voyproc.output_filename(lbl_file_name)
-    elif galproc.is_supported_file(lbl_file_name):
-        return galproc.output_filename(lbl_file_name)
+def output_filename(lbl_file_name):
+    pipeline = get_pipeline(lbl_file_name)
+    if pipeline in (cassproc, voyproc, galproc):
+        return pipeline.output_filename(lbl_file_name)
     else:
         return lbl_file_name[:-4]
 
@@ -46,14 +56,8 @@ def guess_from_filename_prefix(filename):
 
 
 def process_pds_data_file(lbl_file_name,  is_verbose=False, skip_if_cub_exists=False, init_spice=True, nocleanup=False, additional_options={}):
-    if cassproc.is_supported_file(lbl_file_name):
-        return cassproc.process_pds_data_file(lbl_file_name, is_verbose, skip_if_cub_exists, init_spice, nocleanup, additional_options)
-    elif voyproc.is_supported_file(lbl_file_name):
-        return voyproc.process_pds_data_file(lbl_file_name, is_verbose, skip_if_cub_exists, init_spice, nocleanup, additional_options)
-    elif galproc.is_supported_file(lbl_file_name):
-        return galproc.process_pds_data_file(lbl_file_name, is_verbose, skip_if_cub_exists, init_spice, nocleanup, additional_options)
-    elif jnoproc.is_supported_file(lbl_file_name):
-        return jnoproc.process_pds_data_file(lbl_file_name, is_verbose, skip_if_cub_exists, init_spice, nocleanup, additional_options)
-    else:
+    pipeline = get_pipeline(lbl_file_name)
+    if pipeline is None:
         raise Exception("Unsupported file type")
+    return pipeline.process_pds_data_file(lbl_file_name, is_verbose, skip_if_cub_exists, init_spice, nocleanup, additional_options)
 
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import atexit
+import threading
+import traceback
+import multiprocessing
+from sciimg.isis3 import telemetry
+from sciimg.isis3 import stagecache
+
+
+"""
+One shared pool of python worker processes.
+
+Rather than each stage forking (and leaking) its own multiprocessing.Pool, work is mapped over a
+single pool that's created on first use, kept across stages and products, grown if a caller asks
+for more workers and shut down at exit (or by shutdown()). Each worker runs the registered
+initializers once when it starts and warms the per-process caches.
+
+Pool start up is recorded in the ISIS command trace (app 'worker_pool') when tracing is enabled,
+so isis_trace_summary.py shows what it costs.
+"""
+
+__POOL__ = None
+__POOL_SIZE__ = 0
+__POOL_PID__ = None
+__INITIALIZERS__ = []
+
+
+def __warm_caches():
+    if stagecache.is_enabled():
+        stagecache.environment_fingerprint()
+
+
+def __initialize_worker(initializers):
+    for func, args in initializers:
+        try:
+            func(*args)
+        except:
+            traceback.print_exc(file=sys.stdout)
+    __warm_caches()
+
+
+def add_initializer(func, args=()):
+    """
+    Registers func(*args) to run in every worker as it starts. A pool that's already running is
+    shut down so that the next one runs it.
+    """
+    __INITIALIZERS__.append((func, tuple(args)))
+    shutdown()
+
+
+def clear_initializers():
+    del __INITIALIZERS__[:]
+    shutdown()
+
+
+def get_pool(num_workers):
+    global __POOL__, __POOL_SIZE__, __POOL_PID__
+    if __POOL__ is not None and __POOL_SIZE__ >= num_workers:
+        return __POOL__
+
+    shutdown()
+    start = time.time()
+    __POOL__ = multiprocessing.Pool(num_workers, initializer=__initialize_worker, initargs=(list(__INITIALIZERS__),))
+    __POOL_SIZE__ = num_workers
+    __POOL_PID__ = os.getpid()
+    if telemetry.is_enabled():
+        telemetry.record("worker_pool", {"workers": num_workers}, time.time() - start, None, 0, 0)
+    return __POOL__
+
+
+def start(num_workers=None):
+    """
+    Creates the pool ahead of use. Forking from a process with other threads running (an asyncio
+    event loop and its executor, say) can leave a worker holding a lock some other thread had, so
+    callers that map from such a thread start the pool beforehand, from the main thread.
+    """
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+    if num_workers > 1 and not is_worker():
+        get_pool(num_workers)
+
+
+def map_items(func, items, num_workers=None):
+    """
+    Maps func over items on the shared pool, in order. Runs in this process if there's only one
+    worker or item to use, or if called from inside a worker. Away from the main thread, only a
+    pool that's already running is used (see start()), rather than forking a new one.
+    """
+    items = list(items)
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+    num_workers = min(num_workers, len(items))
+
+    if num_workers <= 1 or is_worker():
+        return [func(item) for item in items]
+    if threading.current_thread() is not threading.main_thread():
+        if __POOL__ is None or __POOL_PID__ != os.getpid():
+            return [func(item) for item in items]
+        return __POOL__.map(func, items)
+    return get_pool(num_workers).map(func, items)
+
+
+def is_worker():
+    return multiprocessing.current_process().name != "MainProcess"
+
+
+def shutdown():
+    global __POOL__, __POOL_SIZE__, __POOL_PID__
+    if __POOL__ is not None and __POOL_PID__ == os.getpid():
+        __POOL__.close()
+        __POOL__.join()
+    __POOL__ = None
+    __POOL_SIZE__ = 0
+    __POOL_PID__ = None
+
+
+atexit.register(shutdown)
@@ -2,6 +2,7 @@
 import os
 import glob
 from sciimg.isis3 import info
+from sciimg.isis3 import detect
 from sciimg.isis3 import cassini
 from sciimg.isis3._core import printProgress
 from sciimg.isis3 import cameras
@@ -9,6 +10,8 @@ from sciimg.isis3 import filters
 from sciimg.isis3 import mathandstats
 from sciimg.isis3 import trimandmask
 from sciimg.isis3 import importexport
+from sciimg.isis3 import scratch
+from sciimg.isis3.checkpoint import open_checkpoint
 from sciimg.isis3.metadata import load_pvl
 
 from datetime import datetime
@@ -32,22 +35,10 @@ def output_filename(file_name):
 
 
 def is_supported_file(file_name):
-
-    try:
-        if file_name[-3:].upper() in ("LBL", "BEL"):
-            p = load_pvl(file_name)
-            if "INSTRUMENT_HOST_NAME" in p:
-                instument_host_name = p["INSTRUMENT_HOST_NAME"]
-                return instument_host_name == "CASSINI ORBITER"
-            else:
-                return False
-        elif file_name[-3:].upper() == "CUB":
-            value = info.get_field_value(file_name, "SpacecraftName", grpname="Instrument")
-            return value == "Cassini-Huygens"
-        else:
-            return False
-    except:
-        return False
+    """
+    file_name can also be a sciimg.isis3.detect.FileDescriptor
+    """
+    return detect.describe(file_name).mission == detect.Mission.CASSINI
 
 
 def process_pds_data_file(lbl_file_name, is_verbose=False, skip_if_cub_exists=False, init_spice=True, nocleanup=False, additional_options={}):
@@ -69,101 +60,121 @@ def process_pds_data_file(lbl_file_name, is_verbose=False, skip_if_cub_exists=Fa
     if source_dirname == "":
         source_dirname = "."
 
-    work_dir = "%s/work"%source_dirname
-    if not os.path.exists(work_dir):
-        os.mkdir(work_dir)
+    with scratch.work_dir(source_dirname, product_id, lbl_file_name, keep=nocleanup) as work:
+        work_dir = work.path
+        work_file_cub = work.file(os.path.basename(out_file_cub))
+        work_file_tiff = work.file(os.path.basename(out_file_tiff))
+        checkpoint = open_checkpoint(work, lbl_file_name, {"pipeline": "cassini_iss", "init_spice": init_spice, "additional_options": additional_options})
 
 
-    if is_verbose:
-        print("Importing to cube...")
-    else:
-        printProgress(0, 9, prefix="%s: "%lbl_file_name)
-    s = cassini.ciss2isis(lbl_file_name, "%s/__%s_raw.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
+        if not checkpoint.is_done("ciss2isis"):
+            if is_verbose:
+                print("Importing to cube...")
+            else:
+                printProgress(0, 9, prefix="%s: "%lbl_file_name)
+            s = cassini.ciss2isis(lbl_file_name, "%s/__%s_raw.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("ciss2isis", ["%s/__%s_raw.cub"%(work_dir, product_id)])
 
 
-    if is_verbose:
-        print("Filling in Gaps...")
-    else:
-        printProgress(1, 9, prefix="%s: "%lbl_file_name)
-    s = mathandstats.fillgap("%s/__%s_raw.cub"%(work_dir, product_id),
-                        "%s/__%s_fill0.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
+        if not checkpoint.is_done("fillgap"):
+            if is_verbose:
+                print("Filling in Gaps...")
+            else:
+                printProgress(1, 9, prefix="%s: "%lbl_file_name)
+            s = mathandstats.fillgap("%s/__%s_raw.cub"%(work_dir, product_id),
+                                "%s/__%s_fill0.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("fillgap", ["%s/__%s_fill0.cub"%(work_dir, product_id)])
 
 
-    if init_spice is True:
-        if is_verbose:
-            print("Initializing Spice...")
-        else:
-            printProgress(2, 9, prefix="%s: "%lbl_file_name)
-        s = cameras.spiceinit("%s/__%s_fill0.cub"%(work_dir, product_id), is_ringplane)
-        if is_verbose:
-            print(s)
+        if init_spice is True and not checkpoint.is_done("spiceinit"):
+            if is_verbose:
+                print("Initializing Spice...")
+            else:
+                printProgress(2, 9, prefix="%s: "%lbl_file_name)
+            s = cameras.spiceinit("%s/__%s_fill0.cub"%(work_dir, product_id), is_ringplane)
+            if is_verbose:
+                print(s)
+            checkpoint.done("spiceinit", ["%s/__%s_fill0.cub"%(work_dir, product_id)])
 
 
-    if is_verbose:
-        print("Calibrating cube...")
-    else:
-        printProgress(3, 9, prefix="%s: "%lbl_file_name)
-    s = cassini.cisscal("%s/__%s_fill0.cub"%(work_dir, product_id),
-                            "%s/__%s_cal.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
+        if not checkpoint.is_done("cisscal"):
+            if is_verbose:
+                print("Calibrating cube...")
+            else:
+                printProgress(3, 9, prefix="%s: "%lbl_file_name)
+            s = cassini.cisscal("%s/__%s_fill0.cub"%(work_dir, product_id),
+                                    "%s/__%s_cal.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("cisscal", ["%s/__%s_cal.cub"%(work_dir, product_id)])
 
 
-    if is_verbose:
-        print("Running Noise Filter...")
-    else:
-        printProgress(4, 9, prefix="%s: "%lbl_file_name)
-    s = filters.noisefilter("%s/__%s_cal.cub"%(work_dir, product_id),
-                            "%s/__%s_stdz.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Filling in Nulls...")
-    else:
-        printProgress(5, 9, prefix="%s: "%lbl_file_name)
-    s = filters.lowpass("%s/__%s_stdz.cub"%(work_dir, product_id),
-                        "%s/__%s_fill.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
+        if not checkpoint.is_done("noisefilter"):
+            if is_verbose:
+                print("Running Noise Filter...")
+            else:
+                printProgress(4, 9, prefix="%s: "%lbl_file_name)
+            s = filters.noisefilter("%s/__%s_cal.cub"%(work_dir, product_id),
+                                    "%s/__%s_stdz.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("noisefilter", ["%s/__%s_stdz.cub"%(work_dir, product_id)])
+
+        if not checkpoint.is_done("lowpass"):
+            if is_verbose:
+                print("Filling in Nulls...")
+            else:
+                printProgress(5, 9, prefix="%s: "%lbl_file_name)
+            s = filters.lowpass("%s/__%s_stdz.cub"%(work_dir, product_id),
+                                "%s/__%s_fill.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("lowpass", ["%s/__%s_fill.cub"%(work_dir, product_id)])
 
 
-    if is_verbose:
-        print("Removing Frame-Edge Noise...")
-    else:
-        printProgress(6, 9, prefix="%s: "%lbl_file_name)
-    s = trimandmask.trim("%s/__%s_fill.cub"%(work_dir, product_id),
-                        "%s"%(out_file_cub))
-    if is_verbose:
-        print(s)
+        if not checkpoint.is_done("trim"):
+            if is_verbose:
+                print("Removing Frame-Edge Noise...")
+            else:
+                printProgress(6, 9, prefix="%s: "%lbl_file_name)
+            s = trimandmask.trim("%s/__%s_fill.cub"%(work_dir, product_id),
+                                work_file_cub)
+            if is_verbose:
+                print(s)
+            checkpoint.done("trim", [work_file_cub])
 
 
-    if is_verbose:
-        print("Exporting TIFF...")
-    else:
-        printProgress(7, 9, prefix="%s: "%lbl_file_name)
-    s = importexport.isis2std_grayscale("%s"%(out_file_cub),
-                                    "%s"%(out_file_tiff))
-    if is_verbose:
-        print(s)
-
-    if nocleanup is False:
-        if is_verbose:
-            print("Cleaning up...")
-        else:
-            printProgress(8, 9, prefix="%s: "%lbl_file_name)
-        map(os.unlink, glob.glob('%s/__%s*.cub'%(work_dir, product_id)))
-    else:
-        if is_verbose:
-            print("Skipping clean up...")
+        if not checkpoint.is_done("export"):
+            if is_verbose:
+                print("Exporting TIFF...")
+            else:
+                printProgress(7, 9, prefix="%s: "%lbl_file_name)
+            s = importexport.isis2std_grayscale(work_file_cub,
+                                            work_file_tiff)
+            if is_verbose:
+                print(s)
+            checkpoint.done("export", [work_file_cub, work_file_tiff])
+
+        work.promote(work_file_cub, out_file_cub)
+        work.promote(work_file_tiff, out_file_tiff)
+
+        if nocleanup is False:
+            if is_verbose:
+                print("Cleaning up...")
+            else:
+                printProgress(8, 9, prefix="%s: "%lbl_file_name)
+            work.cleanup()
         else:
-            printProgress(8, 9, prefix="%s: "%lbl_file_name)
+            if is_verbose:
+                print("Skipping clean up...")
+            else:
+                printProgress(8, 9, prefix="%s: "%lbl_file_name)
 
-    if not is_verbose:
-        printProgress(9, 9, prefix="%s: "%lbl_file_name)
+        if not is_verbose:
+            printProgress(9, 9, prefix="%s: "%lbl_file_name)
 
-    return out_file_cub
\ No newline at end of file
+        return out_file_cub
\ No newline at end of file
@@ -2,11 +2,14 @@
 import os
 import glob
 from sciimg.isis3 import info
+from sciimg.isis3 import detect
 from sciimg.isis3 import galileo
 from sciimg.isis3 import cameras
 from sciimg.isis3 import filters
 from sciimg.isis3 import trimandmask
 from sciimg.isis3 import importexport
+from sciimg.isis3 import scratch
+from sciimg.isis3.checkpoint import open_checkpoint
 from sciimg.isis3._core import printProgress
 from traceback import print_exc
 
@@ -30,17 +33,10 @@ def output_filename(file_name):
     return out_file
 
 def is_supported_file(file_name):
-    try:
-        if file_name[-3:].upper() in ("CUB",):
-            value = info.get_field_value(file_name,  "SpacecraftName", grpname="Instrument")
-            return value == "Galileo Orbiter"
-        elif file_name[-3:].upper() in ("LBL", ):
-            value = info.get_field_value(file_name, "SPACECRAFT_NAME")
-            return value == "GALILEO ORBITER"
-        else:
-            return False
-    except:
-        return False
+    """
+    file_name can also be a sciimg.isis3.detect.FileDescriptor
+    """
+    return detect.describe(file_name).mission == detect.Mission.GALILEO
 
 def process_pds_data_file(from_file_name, is_verbose=False, skip_if_cub_exists=False, init_spice=True, nocleanup=False, additional_options={}):
     product_id = str(info.get_product_id(from_file_name)).replace("+", "_")
@@ -61,86 +57,104 @@ def process_pds_data_file(from_file_name, is_verbose=False, skip_if_cub_exists=F
     if source_dirname == "":
         source_dirname = "."
 
-    work_dir = "%s/work" % source_dirname
-    if not os.path.exists(work_dir):
-        os.mkdir(work_dir)
-
-    if is_verbose:
-        print("Importing to cube...")
-    else:
-        printProgress(0, 9, prefix="%s: "%from_file_name)
-    s = galileo.gllssi2isis(from_file_name, "%s/__%s_raw.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if init_spice is True:
-        if is_verbose:
-            print("Initializing Spice...")
-        else:
-            printProgress(1, 9, prefix="%s: " % from_file_name)
-        s = cameras.spiceinit("%s/__%s_raw.cub" % (work_dir, product_id), is_ringplane)
-        if is_verbose:
-            print(s)
-
-    if is_verbose:
-        print("Calibrating cube...")
-    else:
-        printProgress(2, 9, prefix="%s: " % from_file_name)
-    s = galileo.gllssical("%s/__%s_raw.cub" % (work_dir, product_id),
-                       "%s/__%s_cal.cub" % (work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Running Noise Filter...")
-    else:
-        printProgress(3, 9, prefix="%s: "%from_file_name)
-    s = filters.noisefilter("%s/__%s_cal.cub"%(work_dir, product_id),
-                            "%s/__%s_stdz.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Filling in Nulls...")
-    else:
-        printProgress(4, 9, prefix="%s: "%from_file_name)
-    s = filters.lowpass("%s/__%s_stdz.cub"%(work_dir, product_id),
-                        "%s/__%s_fill0.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Removing Frame-Edge Noise...")
-    else:
-        printProgress(5, 9, prefix="%s: "%from_file_name)
-    s = trimandmask.trim("%s/__%s_fill0.cub"%(work_dir, product_id),
-                        "%s"%(out_file_cub))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Exporting TIFF...")
-    else:
-        printProgress(6, 9, prefix="%s: "%from_file_name)
-    s = importexport.isis2std_grayscale("%s"%(out_file_cub),
-                                    "%s"%(out_file_tiff))
-    if is_verbose:
-        print(s)
-
-    if nocleanup is False:
-        if is_verbose:
-            print("Cleaning up...")
-        else:
-            printProgress(7, 9, prefix="%s: "%from_file_name)
-        map(os.unlink, glob.glob('%s/__%s*.cub'%(work_dir, product_id)))
-    else:
-        if is_verbose:
-            print("Skipping clean up...")
+    with scratch.work_dir(source_dirname, product_id, from_file_name, keep=nocleanup) as work:
+        work_dir = work.path
+        work_file_cub = work.file(os.path.basename(out_file_cub))
+        work_file_tiff = work.file(os.path.basename(out_file_tiff))
+        checkpoint = open_checkpoint(work, from_file_name, {"pipeline": "galileo_iss", "init_spice": init_spice, "additional_options": additional_options})
+
+        if not checkpoint.is_done("gllssi2isis"):
+            if is_verbose:
+                print("Importing to cube...")
+            else:
+                printProgress(0, 9, prefix="%s: "%from_file_name)
+            s = galileo.gllssi2isis(from_file_name, "%s/__%s_raw.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("gllssi2isis", ["%s/__%s_raw.cub"%(work_dir, product_id)])
+
+        if init_spice is True and not checkpoint.is_done("spiceinit"):
+            if is_verbose:
+                print("Initializing Spice...")
+            else:
+                printProgress(1, 9, prefix="%s: " % from_file_name)
+            s = cameras.spiceinit("%s/__%s_raw.cub" % (work_dir, product_id), is_ringplane)
+            if is_verbose:
+                print(s)
+            checkpoint.done("spiceinit", ["%s/__%s_raw.cub"%(work_dir, product_id)])
+
+        if not checkpoint.is_done("gllssical"):
+            if is_verbose:
+                print("Calibrating cube...")
+            else:
+                printProgress(2, 9, prefix="%s: " % from_file_name)
+            s = galileo.gllssical("%s/__%s_raw.cub" % (work_dir, product_id),
+                               "%s/__%s_cal.cub" % (work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("gllssical", ["%s/__%s_cal.cub"%(work_dir, product_id)])
+
+        if not checkpoint.is_done("noisefilter"):
+            if is_verbose:
+                print("Running Noise Filter...")
+            else:
+                printProgress(3, 9, prefix="%s: "%from_file_name)
+            s = filters.noisefilter("%s/__%s_cal.cub"%(work_dir, product_id),
+                                    "%s/__%s_stdz.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("noisefilter", ["%s/__%s_stdz.cub"%(work_dir, product_id)])
+
+        if not checkpoint.is_done("lowpass"):
+            if is_verbose:
+                print("Filling in Nulls...")
+            else:
+                printProgress(4, 9, prefix="%s: "%from_file_name)
+            s = filters.lowpass("%s/__%s_stdz.cub"%(work_dir, product_id),
+                                "%s/__%s_fill0.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("lowpass", ["%s/__%s_fill0.cub"%(work_dir, product_id)])
+
+        if not checkpoint.is_done("trim"):
+            if is_verbose:
+                print("Removing Frame-Edge Noise...")
+            else:
+                printProgress(5, 9, prefix="%s: "%from_file_name)
+            s = trimandmask.trim("%s/__%s_fill0.cub"%(work_dir, product_id),
+                                work_file_cub)
+            if is_verbose:
+                print(s)
+            checkpoint.done("trim", [work_file_cub])
+
+        if not checkpoint.is_done("export"):
+            if is_verbose:
+                print("Exporting TIFF...")
+            else:
+                printProgress(6, 9, prefix="%s: "%from_file_name)
+            s = importexport.isis2std_grayscale(work_file_cub,
+                                            work_file_tiff)
+            if is_verbose:
+                print(s)
+            checkpoint.done("export", [work_file_cub, work_file_tiff])
+
+        work.promote(work_file_cub, out_file_cub)
+        work.promote(work_file_tiff, out_file_tiff)
+
+        if nocleanup is False:
+            if is_verbose:
+                print("Cleaning up...")
+            else:
+                printProgress(7, 9, prefix="%s: "%from_file_name)
+            work.cleanup()
         else:
-            printProgress(7, 9, prefix="%s: "%from_file_name)
+            if is_verbose:
+                print("Skipping clean up...")
+            else:
+                printProgress(7, 9, prefix="%s: "%from_file_name)
 
-    if not is_verbose:
-        printProgress(9, 9, prefix="%s: "%from_file_name)
+        if not is_verbose:
+            printProgress(9, 9, prefix="%s: "%from_file_name)
 
-    return out_file_cub
+        return out_file_cub
 
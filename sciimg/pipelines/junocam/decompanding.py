@@ -105,20 +105,40 @@ LIN16 = np.array((0, 16, 32, 48, 64, 80, 96, 112, 128, 144, 160, 176, 192,
                   3952, 3968, 3984, 4000, 4016, 4032, 4048, 4064, 4080), dtype=np.float32)
 
 
-def decompand(img_data, table=CompandingTableEnum.SQROOT, verbose=False):
+def companding_table(table=CompandingTableEnum.SQROOT):
     if table == CompandingTableEnum.SQROOT:
-        ctable = SQROOT
+        return SQROOT
     elif table == CompandingTableEnum.LIN1:
-        ctable = LIN1
+        return LIN1
     elif table == CompandingTableEnum.LIN8:
-        ctable = LIN8
+        return LIN8
     elif table == CompandingTableEnum.LIN16:
-        ctable = LIN16
+        return LIN16
     else:
         raise Exception("Invalid companding table specified")
 
-    for a in range(0, len(img_data)):
-        for b in range(0, len(img_data[a])):
-            img_data[a][b] = ctable[int(round(img_data[a][b]))]
 
-    return img_data
\ No newline at end of file
+def __table_indexes(img_data):
+    if img_data.dtype == np.uint8:
+        return img_data
+    return np.rint(img_data).astype(np.intp)
+
+
+def decompanded(img_data, table=CompandingTableEnum.SQROOT):
+    """
+    Decompanded values of img_data (8 bit companded values, either uint8 or rounded to the
+    nearest integer) as a new float32 array
+    """
+    ctable = companding_table(table)
+    return ctable[__table_indexes(np.asarray(img_data))]
+
+
+def decompand(img_data, table=CompandingTableEnum.SQROOT, verbose=False):
+    """
+    Decompands img_data in place, so it needs a floating point array. Returns img_data.
+    """
+    ctable = companding_table(table)
+    if not np.issubdtype(img_data.dtype, np.floating):
+        raise Exception("Cannot decompand %s data in place"%img_data.dtype)
+    img_data[...] = ctable[__table_indexes(img_data)]
+    return img_data
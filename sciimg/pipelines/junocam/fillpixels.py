@@ -20,44 +20,89 @@ def open_image(img_path):
 
     return data
 
-def fill_dead_pixel(data, band_num, band_id, band_height=BAND_HEIGHT):
-
-    width = data.shape[0]
-    height = data.shape[1]
+"""
+Each dead pixel is filled over the square around it, from the column just right of the square and
+the line just below it, working through the square line by line as the original per-pixel loop
+did. A pixel takes the mean of a horizontal interpolation, between the square's first (already
+filled) pixel on its line and the column to the right, and a vertical one, between the square's
+first (already filled) line and the line below.
+
+Those steps only depend on the dead pixel's position and radius, so they're worked out once per
+color band (dead_pixel_stencils) and then applied to every triplet of an image at once: the
+square's first pixel, then its first line and column, then the rest, as array operations. Dead
+pixels in a band are filled in map order, as their squares can overlap. The arithmetic follows the
+loop's (float64 for integer images, the image's own type for floating point ones) so the results
+are the same.
+"""
+
+__STENCILS__ = {}
+
+
+class DeadPixelStencil:
+
+    def __init__(self, x, y, radius):
+        self.x = x
+        self.y = y
+        self.radius = radius
+        # Interpolation weights for offsets -radius to radius - 1
+        self.weights = np.array([(i + radius) / (radius * 2.0) for i in range(-radius, radius)])
+        self.inverse_weights = 1.0 - self.weights
+
+
+def dead_pixel_stencils(band_id):
+    if band_id not in __STENCILS__:
+        __STENCILS__[band_id] = [DeadPixelStencil(p[0], p[1], p[2]) for p in DEAD_PIXEL_MAP[band_id]]
+    return __STENCILS__[band_id]
+
+
+def __mean(ix, iy):
+    return (ix + iy) / 2
+
+
+def __fill_with_stencil(bands, stencil):
+    """
+    bands: (n, band height, samples), the same color band from n triplets
+    """
+    r = stencil.radius
+    top = stencil.y - r
+    bottom = stencil.y + r
+    left = stencil.x - r
+    right = stencil.x + r
+    if top < 0 or left < 0 or bottom >= bands.shape[1] or right >= bands.shape[2]:
+        return
+
+    work_type = np.result_type(bands.dtype, 1.0)
+    f = stencil.weights.astype(work_type)
+    g = stencil.inverse_weights.astype(work_type)
+    x1 = bands[:, top:bottom, right].astype(work_type)
+    y1 = bands[:, bottom, left:right].astype(work_type)
+
+    # First pixel
+    x0 = bands[:, top, left].astype(work_type)
+    bands[:, top, left] = __mean(x0 * f[0] + x1[:, 0] * g[0], x0 * f[0] + y1[:, 0] * g[0])
+    corner = bands[:, top, left].astype(work_type)[:, None]
+
+    # First line
+    y0 = bands[:, top, left + 1:right].astype(work_type)
+    bands[:, top, left + 1:right] = __mean(corner * f[1:] + x1[:, 0:1] * g[1:], y0 * f[0] + y1[:, 1:] * g[0])
+
+    # First column
+    x0 = bands[:, top + 1:bottom, left].astype(work_type)
+    bands[:, top + 1:bottom, left] = __mean(x0 * f[0] + x1[:, 1:] * g[0], corner * f[1:] + y1[:, 0:1] * g[1:])
+
+    # The rest, from the filled first line and column
+    x0 = bands[:, top + 1:bottom, left].astype(work_type)[:, :, None]
+    y0 = bands[:, top, left + 1:right].astype(work_type)[:, None, :]
+    ix = x0 * f[1:] + x1[:, 1:, None] * g[1:]
+    iy = y0 * f[1:, None] + y1[:, None, 1:] * g[1:, None]
+    bands[:, top + 1:bottom, left + 1:right] = __mean(ix, iy)
 
-    dead_pixels = DEAD_PIXEL_MAP[band_id]
 
+def fill_dead_pixel(data, band_num, band_id, band_height=BAND_HEIGHT):
     top = band_num * band_height
-    bottom = top + band_height
-
-    for dead_pixel in dead_pixels:
-        cx = dead_pixel[0]
-        cy = dead_pixel[1] + top
-        radius = dead_pixel[2]
-
-        for y in range(-radius, radius):
-            for x in range(-radius, radius):
-
-                if cy + y >= len(data) or cx + radius > len(data[cy + y]):
-                    continue
-
-                try:
-                    x0 = data[cy + y][cx - radius]
-                    x1 = data[cy + y][cx + radius]
-                    y0 = data[cy - radius][cx + x]
-                    y1 = data[cy + radius][cx + x]
-
-                    fx = ((x + radius) / (radius*2.0))
-                    fy = ((y + radius) / (radius*2.0))
-
-                    ix = linear_interpolate(x0, x1, fx)
-                    iy = linear_interpolate(y0, y1, fy)
-
-                    v = np.mean([ix, iy])
-
-                    data[cy + y][cx + x] = v
-                except:
-                    pass
+    bands = data[top:top + band_height][np.newaxis]
+    for stencil in dead_pixel_stencils(band_id):
+        __fill_with_stencil(bands, stencil)
 
 
 def fillpixels(img_data, verbose=False):
@@ -66,17 +111,18 @@ def fillpixels(img_data, verbose=False):
     if verbose:
         print("Image height: %s"%img_height)
 
-    bands_per_image = (img_height / BAND_HEIGHT / 3)
+    bands_per_image = int(img_height / BAND_HEIGHT / 3)
 
     if verbose:
         print("Detected %s RGB bands"%bands_per_image)
 
-    for band in range(0, int(bands_per_image)):
-        if verbose:
-            print("Filling pixels for RGB band triplet #%s "%band)
-        fill_dead_pixel(img_data, band * 3 + 0, 0, band_height=BAND_HEIGHT)
-        fill_dead_pixel(img_data, band * 3 + 1, 1, band_height=BAND_HEIGHT)
-        fill_dead_pixel(img_data, band * 3 + 2, 2, band_height=BAND_HEIGHT)
+    triplet_lines = bands_per_image * BAND_HEIGHT * 3
+    triplets = img_data[:triplet_lines].reshape(bands_per_image, 3, BAND_HEIGHT, img_data.shape[1])
+    for band_id in range(0, 3):
+        for stencil in dead_pixel_stencils(band_id):
+            __fill_with_stencil(triplets[:, band_id], stencil)
+    if not np.shares_memory(triplets, img_data):
+        img_data[:triplet_lines] = triplets.reshape(triplet_lines, img_data.shape[1])
 
 
 
@@ -1,22 +1,104 @@
-import numpy as np
-import itertools as it
-from scipy import signal
-from scipy.interpolate import interp1d
-
-def fix_flipped_bits(image_data):
-
-    print("Creating median filter...")
-    md = signal.medfilt2d(image_data, kernel_size=3)
-
-    print("Testing pixels for variance...")
-    for a, b in it.product(range(1, image_data.shape[0] - 1), range(1, image_data.shape[1] - 1)):
-        if abs(image_data[a][b] - md[a][b]) > 10.0:
-            image_data[a][b] = np.nan
-
-    print("Filling identified pixels...")
-    for a in range(1, image_data.shape[0] - 1):
-        x = image_data[a]
-        not_nan = np.logical_not(np.isnan(x))
-        indices = np.arange(len(x))
-        interp = interp1d(indices[not_nan], x[not_nan])
-        image_data[a] = np.interp(indices, indices[not_nan], x[not_nan])
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy import signal
+
+
+"""
+Flipped bits show up as lone pixels far off their neighbourhood's median. A pixel is flagged when
+it differs from the median filtered image by more than a threshold, and is replaced by linear
+interpolation along its line between the nearest unflagged pixels either side. The outermost
+lines and columns are never flagged, so every flagged pixel has a neighbour to interpolate from.
+
+The median filter runs on strips of lines (a triplet each by default) in a pool of threads, as
+medfilt2d releases the GIL. Strips take kernel_size // 2 lines of their neighbours with them so
+the result is the same as filtering the whole image at once. Flagging is one comparison over the
+image and the interpolation is worked out for every flagged pixel at once, with the same
+arithmetic as np.interp.
+"""
+
+DEFAULT_THRESHOLD = 10.0
+DEFAULT_KERNEL_SIZE = 3
+DEFAULT_STRIP_LINES = 384
+
+
+def median_filter(image_data, kernel_size=DEFAULT_KERNEL_SIZE, strip_lines=DEFAULT_STRIP_LINES, num_threads=multiprocessing.cpu_count()):
+    """
+    signal.medfilt2d(image_data, kernel_size), strip by strip. kernel_size is odd.
+    """
+    lines = image_data.shape[0]
+    halo = kernel_size // 2
+
+    def filter_strip(first_line):
+        last_line = min(lines, first_line + strip_lines)
+        top = max(0, first_line - halo)
+        bottom = min(lines, last_line + halo)
+        filtered = signal.medfilt2d(image_data[top:bottom], kernel_size=kernel_size)
+        return first_line, filtered[first_line - top:last_line - top]
+
+    md = np.empty(image_data.shape, dtype=image_data.dtype)
+    with ThreadPoolExecutor(max_workers=max(1, num_threads)) as pool:
+        for first_line, filtered in pool.map(filter_strip, range(0, lines, strip_lines)):
+            md[first_line:first_line + filtered.shape[0]] = filtered
+    return md
+
+
+def flipped_bits_mask(image_data, threshold=DEFAULT_THRESHOLD, kernel_size=DEFAULT_KERNEL_SIZE, strip_lines=DEFAULT_STRIP_LINES, num_threads=multiprocessing.cpu_count()):
+    """
+    Boolean mask of the pixels that differ from the median by more than threshold
+    """
+    mask = np.zeros(image_data.shape, dtype=bool)
+    if image_data.shape[0] < 3 or image_data.shape[1] < 3:
+        return mask
+    md = median_filter(image_data, kernel_size, strip_lines, num_threads)
+    mask[1:-1, 1:-1] = np.abs(image_data[1:-1, 1:-1] - md[1:-1, 1:-1]) > threshold
+    return mask
+
+
+def interpolate_lines(image_data, mask):
+    """
+    Replaces the masked pixels of each line by linear interpolation between the nearest unmasked,
+    non-NaN pixels on either side, or the nearest one past the end of the line, as np.interp does.
+    Lines with nothing to interpolate from are left alone.
+    """
+    rows = np.nonzero(mask.any(axis=1))[0]
+    if len(rows) == 0:
+        return
+    values = image_data[rows].astype(np.float64)
+    invalid = mask[rows] | np.isnan(values)
+    samples = values.shape[1]
+    columns = np.arange(samples)
+
+    previous = np.maximum.accumulate(np.where(invalid, -1, columns), axis=1)
+    following = np.minimum.accumulate(np.where(invalid, samples, columns)[:, ::-1], axis=1)[:, ::-1]
+
+    r, c = np.nonzero(mask[rows])
+    p = previous[r, c]
+    f = following[r, c]
+    has_previous = p >= 0
+    has_following = f < samples
+    v0 = values[r, np.where(has_previous, p, f % samples)]
+    v1 = values[r, np.where(has_following, f, np.maximum(p, 0))]
+
+    both = has_previous & has_following
+    filled = np.where(has_previous, v0, v1)
+    slope = (v1[both] - v0[both]) / (f[both] - p[both])
+    filled[both] = slope * (c[both] - p[both]) + v0[both]
+
+    fillable = has_previous | has_following
+    image_data[rows[r[fillable]], c[fillable]] = filled[fillable]
+
+
+def fix_flipped_bits(image_data, threshold=DEFAULT_THRESHOLD, kernel_size=DEFAULT_KERNEL_SIZE, strip_lines=DEFAULT_STRIP_LINES, num_threads=multiprocessing.cpu_count(), verbose=False):
+    """
+    Fixes image_data (floating point) in place. Returns the mask of the pixels that were replaced.
+    """
+    if verbose:
+        print("Testing pixels against median filter...")
+    mask = flipped_bits_mask(image_data, threshold, kernel_size, strip_lines, num_threads)
+    if image_data.shape[0] > 2:
+        mask[1:-1] |= np.isnan(image_data[1:-1])
+    if verbose:
+        print("Filling %d identified pixels..."%np.count_nonzero(mask))
+    interpolate_lines(image_data, mask)
+    return mask
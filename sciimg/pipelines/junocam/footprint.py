@@ -0,0 +1,132 @@
+import spiceypy as spice
+from sciimg.isis3 import scripting
+from sciimg.pipelines.junocam import junocam
+
+
+"""
+Predicts where JunoCam framelets land on a target body from the SPICE geometry, without running
+ISIS. Each framelet is tested at its centre, corners and edge midpoints: a point hits if its
+look vector intersects the target's ellipsoid at the framelet's time. A framelet's footprint is
+the latitude/longitude box around a finer grid of such points, which says whether it can reach a
+region of interest. Coordinates are planetocentric degrees, positive east, as in the JunoCam map
+files. Needs the Juno kernels loaded (sciimg.pipelines.junocam.jcspice.load_kernels).
+"""
+
+# Same timing corrections as the ISIS JunoCam camera model
+START_TIME_BIAS = 0.06188
+INTERFRAME_DELAY_BIAS = 0.001
+
+FRAMELET_SAMPLE_POINTS = [(x, y) for y in (0, junocam.JUNOCAM_STRIP_HEIGHT / 2.0, junocam.JUNOCAM_STRIP_HEIGHT - 1)
+                                 for x in (0, junocam.JUNOCAM_STRIP_WIDTH / 2.0, junocam.JUNOCAM_STRIP_WIDTH - 1)]
+
+# Nine across and three down
+FOOTPRINT_SAMPLE_POINTS = [(x * (junocam.JUNOCAM_STRIP_WIDTH - 1) / 8.0, y * (junocam.JUNOCAM_STRIP_HEIGHT - 1) / 2.0)
+                           for y in range(0, 3) for x in range(0, 9)]
+
+# A footprint is widened by this fraction of its size (and at least FOOTPRINT_MIN_MARGIN degrees)
+# on each side, for what falls between the sample points
+FOOTPRINT_MARGIN = 0.25
+FOOTPRINT_MIN_MARGIN = 0.5
+
+COLOR_CAMERAS = {
+    "RED": junocam.JUNO_JUNOCAM_RED,
+    "GREEN": junocam.JUNO_JUNOCAM_GREEN,
+    "BLUE": junocam.JUNO_JUNOCAM_BLUE,
+    "METHANE": junocam.JUNO_JUNOCAM_METHANE
+}
+
+
+def framelet_time(cub_file):
+    """
+    Ephemeris time of a framelet cube from junocam2isis, from its Instrument group
+    """
+    start_time = scripting.getkey(cub_file, "StartTime", grpname="Instrument")
+    interframe_delay = float(scripting.getkey(cub_file, "InterFrameDelay", grpname="Instrument"))
+    frame_number = int(scripting.getkey(cub_file, "FrameNumber", grpname="Instrument"))
+    return spice.str2et(start_time) + START_TIME_BIAS + (frame_number - 1) * (interframe_delay + INTERFRAME_DELAY_BIAS)
+
+
+def framelet_coverage(camera, et, target="JUPITER", points=FRAMELET_SAMPLE_POINTS):
+    """
+    Number of the sample points that hit the target
+    """
+    hits = 0
+    for x, y in points:
+        try:
+            camera.sincpt_for_sensor_xy(et, x, y, target)
+            hits += 1
+        except junocam.SurfaceNotFoundException:
+            pass
+    return hits
+
+
+def rank_framelets(cub_files, color, target="JUPITER"):
+    """
+    The framelets of one color that hit the target, best covered first (and nearest the middle
+    of the image among equals), with the number of sample points that hit
+    """
+    if spice.ktotal("ALL") == 0:
+        raise Exception("No SPICE kernels loaded")
+    camera = junocam.Camera.get_camera(COLOR_CAMERAS[color])
+    middle = (len(cub_files) - 1) / 2.0
+    ranked = []
+    for i, cub_file in enumerate(cub_files):
+        hits = framelet_coverage(camera, framelet_time(cub_file), target)
+        if hits > 0:
+            ranked.append((-hits, abs(i - middle), cub_file))
+    return [(cub_file, -hits) for hits, distance, cub_file in sorted(ranked)]
+
+
+def framelet_footprint(camera, et, target="JUPITER", points=FOOTPRINT_SAMPLE_POINTS):
+    """
+    (min_lat, max_lat, min_lon, max_lon) of the sample points that hit the target, or None if
+    none do
+    """
+    lats = []
+    lons = []
+    for x, y in points:
+        try:
+            radius, lon, lat = camera.surface_coords_for_sensor_xy(et, x, y, target)
+        except junocam.SurfaceNotFoundException:
+            continue
+        lats.append(lat)
+        lons.append(lon)
+    if len(lats) == 0:
+        return None
+    return min(lats), max(lats), min(lons), max(lons)
+
+
+def __overlaps(min_a, max_a, min_b, max_b):
+    return min_a <= max_b and min_b <= max_a
+
+
+def intersects_roi(footprint, roi):
+    """
+    Whether a footprint, with its margin, can reach roi (min_lat, max_lat, min_lon, max_lon).
+    Longitudes are compared across the 0/360 and -180/180 seams.
+    """
+    min_lat, max_lat, min_lon, max_lon = footprint
+    lat_margin = max((max_lat - min_lat) * FOOTPRINT_MARGIN, FOOTPRINT_MIN_MARGIN)
+    lon_margin = max((max_lon - min_lon) * FOOTPRINT_MARGIN, FOOTPRINT_MIN_MARGIN)
+    if not __overlaps(min_lat - lat_margin, max_lat + lat_margin, roi[0], roi[1]):
+        return False
+    for wrap in (-360.0, 0.0, 360.0):
+        if __overlaps(min_lon - lon_margin + wrap, max_lon + lon_margin + wrap, roi[2], roi[3]):
+            return True
+    return False
+
+
+def select_for_roi(framelets, roi, target="JUPITER"):
+    """
+    framelets: (cube file, color) pairs. Returns the cube files whose footprint can reach roi,
+    in order.
+    """
+    if spice.ktotal("ALL") == 0:
+        raise Exception("No SPICE kernels loaded")
+    selected = []
+    for cub_file, color in framelets:
+        camera = junocam.Camera.get_camera(COLOR_CAMERAS[color])
+        footprint = framelet_footprint(camera, framelet_time(cub_file), target)
+        if footprint is not None and intersects_roi(footprint, roi):
+            selected.append(cub_file)
+    return selected
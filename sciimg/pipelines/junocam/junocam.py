@@ -196,21 +196,21 @@ class Camera:
         shape, obsref, bsight, n, bounds = spice.getfov(self.id, 4, 32, 32)
         return shape, obsref, bsight, n, bounds
 
-    def sincpt_for_sensor_xy(self, et, x, y):
+    def sincpt_for_sensor_xy(self, et, x, y, target="JUPITER"):
         dvec = self.strip_xy_to_sensor_vector(x, y)
         try:
-            spoint, etemit, srfvec = spice.sincpt("Ellipsoid", 'JUPITER', et, 'IAU_JUPITER', 'LT+S', 'JUNO', self.obsref, dvec)
+            spoint, etemit, srfvec = spice.sincpt("Ellipsoid", target, et, 'IAU_%s'%target, 'LT+S', 'JUNO', self.obsref, dvec)
         except:
             raise SurfaceNotFoundException()
         return spoint, etemit, srfvec
 
-    def illumf(self, et, spoint):
-        trgepc, srfvec, phase, solar, emissn, visibl, lit = spice.illumf("Ellipsoid", 'JUPITER', 'SUN', et, 'IAU_JUPITER', 'LT+S', 'JUNO', spoint)
+    def illumf(self, et, spoint, target="JUPITER"):
+        trgepc, srfvec, phase, solar, emissn, visibl, lit = spice.illumf("Ellipsoid", target, 'SUN', et, 'IAU_%s'%target, 'LT+S', 'JUNO', spoint)
         return trgepc, srfvec, phase, solar, emissn, visibl, lit
 
-    def illumf_for_sensor_xy(self, et, x, y):
-        spoint, etemit, srfvec = self.sincpt_for_sensor_xy(et, x, y)
-        trgepc, srfvec, phase, solar, emissn, visibl, lit = self.illumf(et, spoint)
+    def illumf_for_sensor_xy(self, et, x, y, target="JUPITER"):
+        spoint, etemit, srfvec = self.sincpt_for_sensor_xy(et, x, y, target)
+        trgepc, srfvec, phase, solar, emissn, visibl, lit = self.illumf(et, spoint, target)
         return trgepc, srfvec, phase, solar, emissn, visibl, lit
 
     def surface_coords_for_surface_point(self, spoint):
@@ -220,6 +220,6 @@ class Camera:
 
         return radius, lon, lat
 
-    def surface_coords_for_sensor_xy(self, et, x, y):
-        spoint, etemit, srfvec = self.sincpt_for_sensor_xy(et, x, y)
+    def surface_coords_for_sensor_xy(self, et, x, y, target="JUPITER"):
+        spoint, etemit, srfvec = self.sincpt_for_sensor_xy(et, x, y, target)
         return self.surface_coords_for_surface_point(spoint)
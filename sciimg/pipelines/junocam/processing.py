@@ -3,21 +3,41 @@ import shutil
 import sys
 import glob
 from sciimg.isis3 import info
+from sciimg.isis3 import detect
 from sciimg.isis3 import juno
 from sciimg.isis3 import cameras
 from sciimg.isis3 import mathandstats
 from sciimg.isis3 import trimandmask
 from sciimg.isis3 import importexport
 from sciimg.isis3 import mosaicking
+from sciimg.isis3 import mapmosaic
 from sciimg.isis3._core import printProgress
 from sciimg.isis3 import utility
 from sciimg.isis3 import scripting
 from sciimg.isis3 import mapprojection
+from sciimg.isis3 import telemetry
+from sciimg.isis3 import scratch
+from sciimg.isis3 import taskgraph
+from sciimg.isis3 import workers
+from sciimg.isis3.checkpoint import open_checkpoint
 import multiprocessing
+import asyncio
 import numpy as np
 import traceback
 import subprocess
 
+# Framelet cubes are 32-bit and get trimmed, map projected and mosaicked: far more than the usual
+# intermediates for the size of the IMG
+JUNOCAM_SIZE_FACTOR = 64
+
+# Framelets predicted to see the target that are tried for the base map, best covered first
+MAX_BASE_MAP_CANDIDATES = 3
+
+# A preview projects every Nth triplet (and the last), consecutive framelets overlapping enough
+# that the gaps are small at preview resolution
+PREVIEW_TRIPLET_STRIDE = 2
+
+
 def print_r(*args):
     s = ' '.join(map(str, args))
     print(s)
@@ -30,23 +50,25 @@ def output_filename(file_name):
 
 
 def is_supported_file(file_name):
-    if file_name is None:
-        return False
+    """
+    file_name can also be a sciimg.isis3.detect.FileDescriptor
+    """
+    return detect.describe(file_name).mission == detect.Mission.JUNO
+
+
+def __mapped_framelets(mapped_dir, product_id, color):
+    return sorted(glob.glob('%s/__%s_raw_%s_*.cub' % (mapped_dir, product_id, color.upper())))
 
-    if file_name[-3:].upper() in ("CUB",):
-        value = info.get_field_value(file_name,  "SpacecraftName", grpname="Instrument")
-        return value is not None and value.decode('UTF-8') == "JUNO"
-    elif file_name[-3:].upper() in ("LBL", ):
-        value = info.get_field_value(file_name, "SPACECRAFT_NAME")
-        return value is not None and value.decode('UTF-8') == "JUNO"
-    else:
-        return False
 
+def __mosaic_file(source_dirname, product_id, color):
+    return "%s/%s_%s_Mosaic.cub" % (source_dirname, product_id, color.upper())
 
-def assemble_mosaic(color, source_dirname, product_id, min_lat, max_lat, min_lon, max_lon, is_verbose=False):
-    mapped_dir = "%s/work/mapped" % source_dirname
-    list_file = "%s/work/mapped/cubs_%s.lis" % (source_dirname, product_id)
-    cub_files = glob.glob('%s/__%s_raw_%s_*.cub' % (mapped_dir, product_id, color.upper()))
+
+async def assemble_mosaic_async(color, source_dirname, product_id, min_lat, max_lat, min_lon, max_lon, is_verbose=False, mapped_dir=None):
+    if mapped_dir is None:
+        mapped_dir = "%s/work/mapped" % source_dirname
+    list_file = "%s/cubs_%s_%s.lis" % (mapped_dir, product_id, color.upper())
+    cub_files = __mapped_framelets(mapped_dir, product_id, color)
 
     f = open(list_file, "w")
     for cub_file in cub_files:
@@ -54,21 +76,46 @@ def assemble_mosaic(color, source_dirname, product_id, min_lat, max_lat, min_lon
         f.write("\n")
     f.close()
 
-    mosaic_out = "%s/%s_%s_Mosaic.cub" % (source_dirname, product_id, color.upper())
-    s = mosaicking.automos(list_file,
-                           mosaic_out,
-                           priority=mosaicking.Priority.AVERAGE,
-                           grange=mosaicking.Grange.USER,
-                           minlat=min_lat,
-                           maxlat=max_lat,
-                           minlon=min_lon,
-                           maxlon=max_lon)
+    mosaic_out = __mosaic_file(source_dirname, product_id, color)
+    s = await mosaicking.automos_async(list_file,
+                                       mosaic_out,
+                                       priority=mosaicking.Priority.AVERAGE,
+                                       grange=mosaicking.Grange.USER,
+                                       minlat=min_lat,
+                                       maxlat=max_lat,
+                                       minlon=min_lon,
+                                       maxlon=max_lon)
     if is_verbose:
         print(s)
 
     return mosaic_out
 
 
+"""
+    Assembles the mosaics for each color. Returns the mosaic files in the order of colors.
+
+    With native, every color is mosaicked in one pass over the projected framelets
+    (sciimg.isis3.mapmosaic), covering the area they were projected to. If that can't be done, or
+    without native, each color goes through automos over the given range, concurrently.
+"""
+async def assemble_mosaics_async(colors, source_dirname, product_id, min_lat, max_lat, min_lon, max_lon, is_verbose=False, mapped_dir=None, native=True, num_threads=multiprocessing.cpu_count()):
+    if mapped_dir is None:
+        mapped_dir = "%s/work/mapped" % source_dirname
+
+    if native is True:
+        inputs = dict([(color, __mapped_framelets(mapped_dir, product_id, color)) for color in colors])
+        outputs = dict([(color, __mosaic_file(source_dirname, product_id, color)) for color in colors])
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, mapmosaic.mosaic, inputs, outputs, mapmosaic.DEFAULT_BLOCK_LINES, num_threads)
+            return [outputs[color] for color in colors]
+        except:
+            if is_verbose:
+                traceback.print_exc(file=sys.stdout)
+            print_r("Native mosaicking failed, falling back to automos")
+
+    return await asyncio.gather(*[assemble_mosaic_async(color, source_dirname, product_id, min_lat, max_lat, min_lon, max_lon, is_verbose, mapped_dir) for color in colors])
+
+
 def export(out_file_cub, is_verbose=False):
     out_file_tiff = "%s.tif"%out_file_cub[:-4]
     s = importexport.isis2std_grayscale("%s" % (out_file_cub),
@@ -83,25 +130,6 @@ def clean_dir(dir, product_id):
         os.unlink(file)
 
 
-def trim_vertical(cub_file, trim_pixels=2):
-    trim_file = "%s_trim.cub"%cub_file[:-4]
-    trimandmask.trim(cub_file, trim_file, top=trim_pixels, bottom=trim_pixels, left=0, right=0)
-    os.unlink(cub_file)
-    os.rename(trim_file, cub_file)
-
-def trim_cube(args):
-    cub_file = args["cub_file"]
-    trim_pixels = args["trim_pixels"]
-    trim_vertical(cub_file, trim_pixels)
-
-def trim_cubes(work_dir, product_id, trim_pixels=2, num_threads=multiprocessing.cpu_count()):
-    cub_files = glob.glob('%s/__%s_raw_*.cub' % (work_dir, product_id))
-
-    params = [{"cub_file":cub_file, "trim_pixels": trim_pixels} for cub_file in cub_files]
-    p = multiprocessing.Pool(num_threads)
-    xs = p.map(trim_cube, params)
-
-
 def histeq_cube(cub_file, work_dir, product_id):
     hist_file = "%s/__%s_hist.cub" % (work_dir, product_id)
     mathandstats.histeq("%s+1"%cub_file, hist_file, minper=0.0, maxper=100.0)
@@ -110,65 +138,294 @@ def histeq_cube(cub_file, work_dir, product_id):
 
 
 
-def initspice_for_cube(args):
-    cub_file = args["cub_file"]
-    if "verbose" in args:
-        verbose = args["verbose"]
-    else:
-        verbose = False
+def get_coord_range_from_cube(cub_file):
+    min_lat = float(scripting.getkey(cub_file, "MinimumLatitude", grpname="Mapping"))
+    max_lat = float(scripting.getkey(cub_file, "MaximumLatitude", grpname="Mapping"))
+    min_lon = float(scripting.getkey(cub_file, "MinimumLongitude", grpname="Mapping"))
+    max_lon = float(scripting.getkey(cub_file, "MaximumLongitude", grpname="Mapping"))
+    return (min_lat, max_lat, min_lon, max_lon)
 
-    if verbose is True:
-        print_r("Initializing spice on cube file:", cub_file)
+def __framelet_color(cub_file):
+    return os.path.basename(cub_file).split("_")[-2]
 
-    s = cameras.spiceinit(cub_file)#, spk="/home/kevinmgill/anaconda3/envs/isis3/data/juno/kernels/spk/spk_pre_201231_210720_210407_otm33_f.bsp")
 
-    if verbose is True:
-        print_r(s)
+def __select_framelets(cub_files, skip_triplets=None):
+    """
+    The framelets to map project: all of them, or each color without its first and last
+    skip_triplets framelets
+    """
+    if skip_triplets is None:
+        return list(cub_files)
+    selected = []
+    for color in ("BLUE", "GREEN", "RED"):
+        color_files = sorted([f for f in cub_files if __framelet_color(f) == color])
+        selected += color_files[skip_triplets:-skip_triplets]
+    return selected
 
-    return s
 
+def __framelet_triplet(cub_file):
+    return int(os.path.basename(cub_file)[:-4].split("_")[-1])
 
 
+def __thin_framelets(cub_files, stride):
+    """
+    The framelets of every stride'th triplet, counting from the first, and of the last triplet so
+    that the coverage is the same
+    """
+    triplets = sorted(set([__framelet_triplet(f) for f in cub_files]))
+    if stride <= 1 or len(triplets) == 0:
+        return list(cub_files)
+    kept = set(triplets[::stride]) | set([triplets[-1]])
+    return [f for f in cub_files if __framelet_triplet(f) in kept]
 
-def get_coord_range_from_cube(cub_file):
-    min_lat = float(scripting.getkey(cub_file, "MinimumLatitude", grpname="Mapping"))
-    max_lat = float(scripting.getkey(cub_file, "MaximumLatitude", grpname="Mapping"))
-    min_lon = float(scripting.getkey(cub_file, "MinimumLongitude", grpname="Mapping"))
-    max_lon = float(scripting.getkey(cub_file, "MaximumLongitude", grpname="Mapping"))
-    return (min_lat, max_lat, min_lon, max_lon)
 
-def map_project_cube(args):
-    cub_file = args["cub_file"]
-    out_file = args["out_file"]
-    map_file = args["map"]
-    if "verbose" in args:
-        verbose = args["verbose"]
-    else:
-        verbose = False
+async def __trim_framelet(cub_file, trim_pixels):
+    trim_file = "%s_trim.cub"%cub_file[:-4]
+    try:
+        await trimandmask.trim_async(cub_file, trim_file, top=trim_pixels, bottom=trim_pixels, left=0, right=0)
+        os.unlink(cub_file)
+        os.rename(trim_file, cub_file)
+    except subprocess.CalledProcessError:
+        print_r("Failed to trim cube file", cub_file)
+    return cub_file
 
-    if verbose is True:
-        print_r("Map projecting cube file", cub_file)
 
+async def __spiceinit_framelet(cub_file, verbose=False):
     try:
-        s = cameras.cam2map(cub_file, out_file, map=map_file, resolution="MAP")
+        s = await cameras.spiceinit_async(cub_file)
         if verbose is True:
             print_r(s)
-        r = get_coord_range_from_cube(out_file)
-        return r
+    except subprocess.CalledProcessError:
+        print_r("Failed to initialize spice on cube file", cub_file)
+    return cub_file
+
+
+async def __map_framelet(cub_file, out_file, map_file, verbose=False, roi=None, resolution="MAP"):
+    try:
+        if roi is not None:
+            s = await cameras.cam2map_async(cub_file, out_file, map=map_file, resolution=resolution, minlat=roi[0], maxlat=roi[1], minlon=roi[2], maxlon=roi[3])
+        else:
+            s = await cameras.cam2map_async(cub_file, out_file, map=map_file, resolution=resolution)
+        if verbose is True:
+            print_r(s)
+        return get_coord_range_from_cube(out_file)
     except subprocess.CalledProcessError as ex:
-        print(ex.output)
-        return None
+        print_r("Failed to map project cube file", cub_file)
+        if verbose is True:
+            print_r(ex.output)
+    except:
+        pass
+    return None
+
+
+def __predict_base_map_candidates(cub_files, target, is_verbose=False):
+    """
+    The framelets best covering the target according to the SPICE geometry, or None if that
+    can't be worked out (no kernels loaded, say) or no framelet sees the target
+    """
+    try:
+        # Only JunoCam needs spiceypy
+        from sciimg.pipelines.junocam import footprint
+        ranked = footprint.rank_framelets(cub_files, "GREEN", target)
     except:
+        if is_verbose:
+            traceback.print_exc(file=sys.stdout)
         return None
 
+    if len(ranked) == 0:
+        print_r("No framelet is predicted to see %s, trying each in turn"%target)
+        return None
+    if is_verbose:
+        for cub_file, hits in ranked[:MAX_BASE_MAP_CANDIDATES]:
+            print_r("Framelet %s covers %s at %d of %d points"%(cub_file, target, hits, len(footprint.FRAMELET_SAMPLE_POINTS)))
+    return [cub_file for cub_file, hits in ranked[:MAX_BASE_MAP_CANDIDATES]]
+
+
+def __select_framelets_for_roi(cub_files, roi, target, is_verbose=False):
+    """
+    The framelets whose predicted footprint can reach the region of interest, or all of them if
+    the footprints can't be predicted
+    """
+    try:
+        # Only JunoCam needs spiceypy
+        from sciimg.pipelines.junocam import footprint
+        selected = footprint.select_for_roi([(f, __framelet_color(f)) for f in cub_files], roi, target)
+    except:
+        if is_verbose:
+            traceback.print_exc(file=sys.stdout)
+        print_r("Cannot predict framelet footprints, projecting every framelet")
+        return list(cub_files)
+
+    if len(selected) == 0:
+        raise Exception("No framelet reaches the region of interest")
+    if is_verbose:
+        print_r("%d of %d framelets can reach the region of interest"%(len(selected), len(cub_files)))
+    return selected
+
+
+async def __create_base_map(candidates, map_file, projection, verbose=False):
+    """
+    Projects the first candidate framelet that can be projected, which becomes the map the
+    other framelets are projected onto
+    """
+    last_error = None
+    for mid_file in candidates:
+        try:
+            s = await cameras.cam2map_async(mid_file, map_file, projection=projection)
+            if verbose is True:
+                print_r("File %s will be used for mapping..."%mid_file)
+                print_r(s)
+            return map_file
+        except subprocess.CalledProcessError as ex:
+            print_r("File %s is not good for mapping..."%mid_file)
+            last_error = ex
+    if len(candidates) == 1 and last_error is not None:
+        print_r(last_error.output)
+        raise last_error
+    raise Exception("No framelet could be used for the base map")
+
+
+def __coverage(*ranges):
+    ranges = [r for r in ranges if r is not None]
+    if len(ranges) == 0:
+        return 0, 0, 0, 0
+    return (np.min([r[0] for r in ranges]),
+            np.max([r[1] for r in ranges]),
+            np.min([r[2] for r in ranges]),
+            np.max([r[3] for r in ranges]))
+
+
+"""
+    Builds the framelet task graph: per framelet trim -> spiceinit -> cam2map, with the base map
+    (made from the middle GREEN framelet on Jupiter, otherwise from the GREEN framelet that best
+    covers the target) needed only by the cam2map tasks, and a mosaic per color.
+    The mosaics all use the coverage of every projected framelet so that they line up for cubeit,
+    which makes them depend on every cam2map task.
+
+    With a region of interest (min_lat, max_lat, min_lon, max_lon), only the framelets predicted
+    to reach it are trimmed, spiceinit'ed and projected, onto just that region, and the mosaics
+    cover the region.
+
+    With a preview factor, framelets are projected that many times coarser than the base map (which
+    has the camera's resolution), for a quick look, and only every preview_stride'th triplet is
+    trimmed, spiceinit'ed and projected.
+
+    The colors are mosaicked together once every framelet is projected (see assemble_mosaics_async).
+"""
+def build_framelet_graph(work_dir, mapped_dir, product_id, target, projection, trim_pixels=None, init_spice=True, skip_triplets=None, base_map_triplet=None, colors=("RED", "GREEN", "BLUE"), is_verbose=False, roi=None, preview=None, native_mosaic=True, num_threads=multiprocessing.cpu_count(), preview_stride=PREVIEW_TRIPLET_STRIDE):
+    graph = taskgraph.TaskGraph()
+
+    cub_files = sorted(glob.glob('%s/__%s_raw_*.cub' % (work_dir, product_id)))
+    selected = __select_framelets(cub_files, skip_triplets)
+    if preview is not None:
+        selected = __thin_framelets(selected, preview_stride)
+    if roi is not None:
+        selected = __select_framelets_for_roi(selected, roi, target, is_verbose)
+
+    green_file = lambda num: "%s/__%s_raw_GREEN_%04d.cub"%(work_dir, product_id, num)
+    if base_map_triplet is not None:
+        candidates = [green_file(base_map_triplet)]
+    elif target == "JUPITER":
+        candidates = [green_file(int(round(len(cub_files) / 3.0 / 2.0)))]
+    else:
+        green_files = [f for f in cub_files if __framelet_color(f) == "GREEN"]
+        candidates = __predict_base_map_candidates(green_files, target, is_verbose)
+        if candidates is None:
+            # Trying every framelet in turn, only those being processed anyway are initialized
+            candidates = [f for f in selected if __framelet_color(f) == "GREEN"]
+            if len(candidates) == 0:
+                middle = (len(green_files) - 1) / 2.0
+                candidates = sorted(green_files, key=lambda f: abs(green_files.index(f) - middle))[:MAX_BASE_MAP_CANDIDATES]
+
+    needed = set(selected) | set(candidates)
+    ready = {}
+    for cub_file in cub_files:
+        if cub_file not in needed:
+            continue
+        name = os.path.basename(cub_file)[:-4]
+        deps = ()
+        if trim_pixels is not None:
+            deps = (graph.add("trim:%s"%name, lambda f=cub_file: __trim_framelet(f, trim_pixels)),)
+        if init_spice is True:
+            deps = (graph.add("spiceinit:%s"%name, lambda *r, f=cub_file: __spiceinit_framelet(f, is_verbose), deps),)
+        ready[cub_file] = deps
+
+    map_file = "%s/__%s_map.cub"%(work_dir, product_id)
+    base_deps = [dep for f in candidates if f in ready for dep in ready[f]]
+    graph.add("basemap", lambda *r: __create_base_map(candidates, map_file, projection, is_verbose), base_deps)
+
+    async def resolution(map_file):
+        if preview is None:
+            return "MAP"
+        return float(scripting.getkey(map_file, "PixelResolution", grpname="Mapping")) * preview
+    graph.add("resolution", resolution, ("basemap",))
+
+    mapped = []
+    for cub_file in selected:
+        out_file = "%s/%s"%(mapped_dir, os.path.basename(cub_file))
+        mapped.append(graph.add("cam2map:%s"%os.path.basename(cub_file)[:-4],
+                                lambda res, *r, f=cub_file, o=out_file: __map_framelet(f, o, map_file, is_verbose, roi, res),
+                                ("resolution",) + ready[cub_file]))
+
+    async def coverage(*ranges):
+        if roi is not None:
+            return tuple(roi)
+        return __coverage(*ranges)
+    graph.add("coverage", coverage, mapped)
+
+    graph.add("mosaics",
+              lambda r: assemble_mosaics_async(colors, work_dir, product_id, r[0], r[1], r[2], r[3], is_verbose, mapped_dir, native_mosaic, num_threads),
+              ("coverage",))
+    return graph
+
+
+def __in_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+"""
+    Runs the framelet task graph. Returns the mosaic file for each color, in order, and the
+    coverage (min_lat, max_lat, min_lon, max_lon) of the projected framelets.
+
+    This runs its own event loop, so it can't be called from a coroutine (or a thread with a loop
+    running); there, await build_framelet_graph(...).run() instead.
+"""
+def process_framelets(work_dir, mapped_dir, product_id, target, projection, trim_pixels=None, init_spice=True, skip_triplets=None, base_map_triplet=None, colors=("RED", "GREEN", "BLUE"), is_verbose=False, roi=None, preview=None, native_mosaic=True, num_threads=multiprocessing.cpu_count(), preview_stride=PREVIEW_TRIPLET_STRIDE):
+    if __in_event_loop():
+        raise Exception("process_framelets cannot run inside an event loop, await build_framelet_graph(...).run() instead")
+    graph = build_framelet_graph(work_dir, mapped_dir, product_id, target, projection, trim_pixels, init_spice, skip_triplets, base_map_triplet, colors, is_verbose, roi, preview, native_mosaic, num_threads, preview_stride)
+    if is_verbose:
+        print_r("Running %d framelet tasks..."%len(graph))
+
+    # The native mosaic maps over the worker pool from an executor thread, so it's started here
+    if native_mosaic is True:
+        workers.start(num_threads)
+    results = asyncio.run(graph.run(max_procs=num_threads))
+    for name in ("basemap", "resolution", "coverage", "mosaics"):
+        if isinstance(results[name], BaseException):
+            raise results[name]
+    return list(results["mosaics"]), results["coverage"]
+
 
 """
     JunoCam additional options:
     projection=<projection>
     vt=<number>
     histeq=true|false
+    mosaic=native|automos
+    pt=<number> (preview: project every Nth triplet, default PREVIEW_TRIPLET_STRIDE)
+
+    roi: (min_lat, max_lat, min_lon, max_lon) to process just that region, in planetocentric,
+    positive east degrees
+
+    preview: map project this many times coarser than the camera resolution, for a quick look. The
+    outputs are named *_Mosaic_RGB_Preview.cub/.tif so they don't replace a full product.
 """
-def process_pds_data_file(from_file_name, is_verbose=False, skip_if_cub_exists=False, init_spice=True, nocleanup=False, additional_options={}, num_threads=multiprocessing.cpu_count(), max_value=None, limit_longitude=False):
+def process_pds_data_file(from_file_name, is_verbose=False, skip_if_cub_exists=False, init_spice=True, nocleanup=False, additional_options={}, num_threads=multiprocessing.cpu_count(), max_value=None, limit_longitude=False, roi=None, preview=None):
     #out_file = output_filename(from_file_name)
     #out_file_tiff = "%s.tif" % out_file
     #out_file_cub = "%s.cub" % out_file
@@ -187,6 +444,10 @@ def process_pds_data_file(from_file_name, is_verbose=False, skip_if_cub_exists=F
     else:
         skip_triplets = None
 
+    preview_stride = int(additional_options["pt"]) if "pt" in additional_options else PREVIEW_TRIPLET_STRIDE
+
+    native_mosaic = not ("mosaic" in additional_options and additional_options["mosaic"].lower() == "automos")
+
     if "tgt_trip" in additional_options:
         base_map_triplet = int(additional_options["tgt_trip"])
         if is_verbose:
@@ -198,10 +459,6 @@ def process_pds_data_file(from_file_name, is_verbose=False, skip_if_cub_exists=F
     if source_dirname == "":
         source_dirname = "."
 
-    work_dir = "%s/work" % source_dirname
-    if not os.path.exists(work_dir):
-        os.mkdir(work_dir)
-
     target = info.get_property(from_file_name, "TARGET_NAME")
     if target != "JUPITER" and projection == "jupiterequirectangular":
         fallbackto = "europaequirectangular" if target == "EUROPA" else "equirectangular"
@@ -222,258 +479,186 @@ def process_pds_data_file(from_file_name, is_verbose=False, skip_if_cub_exists=F
         trueColor = False
 
 
-    mapped_dir = "%s/work/mapped" % source_dirname
-    if not os.path.exists(mapped_dir):
-        os.mkdir(mapped_dir)
-
-
-    if is_verbose:
-        print("Importing to cube...")
-    else:
-        printProgress(0, num_steps, prefix="%s: "%from_file_name)
+    output_suffix = "_Preview" if preview is not None else ""
 
-    s = juno.junocam2isis(from_file_name, "%s/__%s_raw.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
+    with scratch.work_dir(source_dirname, product_id + output_suffix, from_file_name, size_factor=JUNOCAM_SIZE_FACTOR, keep=nocleanup) as work:
+        work_dir = work.path
+        mapped_dir = work.subdir("mapped")
+        checkpoint = open_checkpoint(work, from_file_name, {"pipeline": "junocam",
+                                                            "init_spice": init_spice,
+                                                            "additional_options": additional_options,
+                                                            "max_value": max_value,
+                                                            "limit_longitude": limit_longitude,
+                                                            "roi": roi,
+                                                            "preview": preview})
 
 
-    if "vt" in additional_options:
-        trim_pixels = int(additional_options["vt"])
-        if is_verbose:
-            print("Trimming Framelets...")
-            print("Vertical trimming: %d pixels"%trim_pixels)
-        else:
-            printProgress(1, num_steps, prefix="%s: "%from_file_name)
+        if not checkpoint.is_done("junocam2isis"):
+            telemetry.set_stage("junocam2isis")
+            if is_verbose:
+                print("Importing to cube...")
+            else:
+                printProgress(0, num_steps, prefix="%s: "%from_file_name)
 
-        trim_cubes(work_dir, product_id, trim_pixels=trim_pixels, num_threads=num_threads)
+            s = juno.junocam2isis(from_file_name, "%s/__%s_raw.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("junocam2isis", glob.glob('%s/__%s_raw_*.cub' % (work_dir, product_id)))
 
 
-    if init_spice is True:
-        if is_verbose:
-            print("Initializing Spice...")
+        if "vt" in additional_options:
+            trim_pixels = int(additional_options["vt"])
+            if is_verbose:
+                print("Vertical trimming: %d pixels"%trim_pixels)
         else:
-            printProgress(2, num_steps, prefix="%s: "%from_file_name)
-        cub_files = glob.glob('%s/__%s_raw_*.cub'%(work_dir, product_id))
-
-        init_spice_params = [{"cub_file": cub_file, "verbose": is_verbose} for cub_file in cub_files]
-        p = multiprocessing.Pool(num_threads)
-        xs = p.map(initspice_for_cube, init_spice_params)
-
-    mid_file = None
-
-    if target == "JUPITER" and base_map_triplet is None:
-        mid_num = int(round(len(glob.glob('%s/__%s_raw_*.cub' % (work_dir, product_id))) / 3.0 / 2.0))
-    elif target != "JUPITER" and base_map_triplet is None:
-        framelets = glob.glob('%s/__%s_raw_*.cub' % (work_dir, product_id))
-        for i in range(0, len(framelets)):
-            f = framelets[i]
-            test_mid_file = "%s/__%s_raw_GREEN_%04d.cub"%(work_dir, product_id, i)
-            test_map_file = "%s/__%s_map.cub"%(work_dir, product_id)
-            try:
-                s = cameras.cam2map(test_mid_file, test_map_file, projection=projection)
-                mid_file = test_mid_file
-                print("File %s will be used for mapping..."%mid_file)
-                break
-            except subprocess.CalledProcessError as ex:
-                print("File %s is not good for mapping..."%test_mid_file)
-    else:
-        mid_num = base_map_triplet
-
-    if mid_file is None:
-        mid_file = "%s/__%s_raw_GREEN_%04d.cub"%(work_dir, product_id, mid_num)
-    map_file = "%s/__%s_map.cub"%(work_dir, product_id)
-
-
-    if is_verbose:
-        print("Starting Map...")
-    else:
-        printProgress(3, num_steps, prefix="%s: " % from_file_name)
-
-    try:
-        s = cameras.cam2map(mid_file, map_file, projection=projection)
-    except subprocess.CalledProcessError as ex:
-        print(ex.output)
-        raise ex
-
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Map Projecting Stripes...")
-    else:
-        printProgress(4, num_steps, prefix="%s: " % from_file_name)
-
-    cub_files_blue = glob.glob('%s/__%s_raw_BLUE_*.cub' % (work_dir, product_id))
-    cub_files_green = glob.glob('%s/__%s_raw_GREEN_*.cub' % (work_dir, product_id))
-    cub_files_red = glob.glob('%s/__%s_raw_RED_*.cub' % (work_dir, product_id))
-
-    if skip_triplets is not None:
-        cub_files_blue.sort()
-        cub_files_blue = cub_files_blue[skip_triplets:-skip_triplets]
-        cub_files_green.sort()
-        cub_files_green = cub_files_green[skip_triplets:-skip_triplets]
-        cub_files_red.sort()
-        cub_files_red = cub_files_red[skip_triplets:-skip_triplets]
-    cub_files = cub_files_blue + cub_files_green + cub_files_red
-
-
-    params = [{"cub_file": cub_file, "out_file": "%s/%s"%(mapped_dir, os.path.basename(cub_file)), "map": map_file, "verbose": is_verbose} for cub_file in cub_files]
-    p = multiprocessing.Pool(num_threads)
-    xs = p.map(map_project_cube, params)
-
-    if len(xs) > 0:
-        min_lat = np.min([l[0] for l in xs if l is not None])
-        max_lat = np.max([l[1] for l in xs if l is not None])
-        min_lon = np.min([l[2] for l in xs if l is not None])
-        max_lon = np.max([l[3] for l in xs if l is not None])
-    else:
-        min_lat = 0
-        max_lat = 0
-        min_lon = 0
-        max_lon = 0
-
-
-    if is_verbose:
-        print("Assembling Red Mosaic...")
-    else:
-        printProgress(5, num_steps, prefix="%s: " % from_file_name)
+            trim_pixels = None
 
-    out_file_red = assemble_mosaic("RED", source_dirname, product_id, min_lat, max_lat, min_lon, max_lon, is_verbose)
+        if not checkpoint.is_done("framelets"):
+            telemetry.set_stage("framelets")
+            if is_verbose:
+                print("Trimming, Initializing Spice, Map Projecting and Mosaicking Framelets...")
+            else:
+                printProgress(1, num_steps, prefix="%s: "%from_file_name)
+
+            mosaics, coverage = process_framelets(work_dir, mapped_dir, product_id, target, projection,
+                                                  trim_pixels=trim_pixels,
+                                                  init_spice=init_spice,
+                                                  skip_triplets=skip_triplets,
+                                                  base_map_triplet=base_map_triplet,
+                                                  is_verbose=is_verbose,
+                                                  roi=roi,
+                                                  preview=preview,
+                                                  native_mosaic=native_mosaic,
+                                                  num_threads=num_threads,
+                                                  preview_stride=preview_stride)
+            checkpoint.done("framelets", mosaics, {"mosaics": mosaics, "coverage": [float(c) for c in coverage]})
+        else:
+            mosaics = checkpoint.value("framelets")["mosaics"]
+            coverage = checkpoint.value("framelets")["coverage"]
+        out_file_red, out_file_green, out_file_blue = mosaics
+        min_lat, max_lat, min_lon, max_lon = coverage
 
-    if is_verbose:
-        print("Assembling Green Mosaic...")
-    else:
-        printProgress(6, num_steps, prefix="%s: " % from_file_name)
+        if not is_verbose:
+            printProgress(7, num_steps, prefix="%s: " % from_file_name)
 
-    out_file_green = assemble_mosaic("GREEN", source_dirname, product_id, min_lat, max_lat, min_lon, max_lon, is_verbose)
-
-    if is_verbose:
-        print("Assembling Blue Mosaic...")
-    else:
-        printProgress(7, num_steps, prefix="%s: " % from_file_name)
-
-    out_file_blue = assemble_mosaic("BLUE", source_dirname, product_id, min_lat, max_lat, min_lon, max_lon, is_verbose)
 
+        if "histeq" in additional_options and additional_options["histeq"].upper() in ("TRUE", "YES") and not checkpoint.is_done("histeq"):
+            telemetry.set_stage("histeq")
+            if is_verbose:
+                print("Running histogram equalization on map projected cubes...")
+            else:
+                printProgress(8, num_steps, prefix="%s: " % from_file_name)
+            histeq_cube(out_file_red, work_dir, product_id)
+            histeq_cube(out_file_green, work_dir, product_id)
+            histeq_cube(out_file_blue, work_dir, product_id)
+            checkpoint.done("histeq", mosaics)
 
-    if "histeq" in additional_options and additional_options["histeq"].upper() in ("TRUE", "YES"):
         if is_verbose:
-            print("Running histogram equalization on map projected cubes...")
+            print("Exporting Map Projected Tiffs...")
         else:
-            printProgress(8, num_steps, prefix="%s: " % from_file_name)
-        histeq_cube(out_file_red, work_dir, product_id)
-        histeq_cube(out_file_green, work_dir, product_id)
-        histeq_cube(out_file_blue, work_dir, product_id)
-
-    if is_verbose:
-        print("Exporting Map Projected Tiffs...")
-    else:
-        printProgress(9, num_steps, prefix="%s: " % from_file_name)
-
-
-    if is_verbose:
-        print("Exporting Color Map Projected Cube...")
-    else:
-        printProgress(10, num_steps, prefix="%s: " % from_file_name)
+            printProgress(9, num_steps, prefix="%s: " % from_file_name)
 
-    out_file_map_rgb_cube_inputs = "%s/%s_Mosaic_RGB.txt" % (source_dirname, product_id)
-    out_file_map_rgb_cube = "%s/%s_Mosaic_RGB.cub" % (source_dirname, product_id)
 
-    f = open(out_file_map_rgb_cube_inputs, "w")
-    f.write("%s\n"%out_file_red)
-    f.write("%s\n" % out_file_green)
-    f.write("%s\n" % out_file_blue)
-    f.close()
+        out_file_map_rgb_cube_inputs = work.file("%s_Mosaic_RGB.txt" % product_id)
+        out_file_map_rgb_cube = "%s/%s_Mosaic_RGB%s.cub" % (source_dirname, product_id, output_suffix)
+        work_file_map_rgb_cube = work.file(os.path.basename(out_file_map_rgb_cube))
+        full_map_cube = work.file("trim_tmp.cub")
 
-    full_map_cube = "trim_tmp.cub"
-    
-    s = utility.cubeit(out_file_map_rgb_cube_inputs, full_map_cube)
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Limiting global coordinates...")
-    else:
-        printProgress(11, num_steps, prefix="%s: " % from_file_name)
+        if not checkpoint.is_done("cubeit"):
+            telemetry.set_stage("cubeit")
+            if is_verbose:
+                print("Exporting Color Map Projected Cube...")
+            else:
+                printProgress(10, num_steps, prefix="%s: " % from_file_name)
 
-    if limit_longitude is True and max_lon - min_lon > 360:
-        max_lon = min_lon + 360.0
+            f = open(out_file_map_rgb_cube_inputs, "w")
+            f.write("%s\n"%out_file_red)
+            f.write("%s\n" % out_file_green)
+            f.write("%s\n" % out_file_blue)
+            f.close()
 
-        print("Trimming longitudes....")
-        print("Maximum Longitude: ", max_lon)
-        print("Minimum Longitude: ", min_lon)
-        # This is prone to failure (see JNCE_2021245_36C00053_V01)
-        try:
-            s = mapprojection.maptrim(full_map_cube, out_file_map_rgb_cube, "both", minlon=min_lon, maxlon=max_lon)
+            s = utility.cubeit(out_file_map_rgb_cube_inputs, full_map_cube)
             if is_verbose:
                 print(s)
-        except:
+            checkpoint.done("cubeit", [full_map_cube])
+
+        if not checkpoint.is_done("maptrim"):
+            telemetry.set_stage("maptrim")
             if is_verbose:
-                traceback.print_exc(file=sys.stdout)
-            print("Failed to trim cube. Trying second method...")
-            s = mapprojection.map2map(from_cube=full_map_cube, map=full_map_cube, to_cube=out_file_map_rgb_cube, minlon=min_lon, maxlon=max_lon)
+                print("Limiting global coordinates...")
+            else:
+                printProgress(11, num_steps, prefix="%s: " % from_file_name)
+
+            if limit_longitude is True and max_lon - min_lon > 360:
+                max_lon = min_lon + 360.0
+
+                print("Trimming longitudes....")
+                print("Maximum Longitude: ", max_lon)
+                print("Minimum Longitude: ", min_lon)
+                # This is prone to failure (see JNCE_2021245_36C00053_V01)
+                try:
+                    s = mapprojection.maptrim(full_map_cube, work_file_map_rgb_cube, "both", minlon=min_lon, maxlon=max_lon)
+                    if is_verbose:
+                        print(s)
+                except:
+                    if is_verbose:
+                        traceback.print_exc(file=sys.stdout)
+                    print("Failed to trim cube. Trying second method...")
+                    s = mapprojection.map2map(from_cube=full_map_cube, map=full_map_cube, to_cube=work_file_map_rgb_cube, minlon=min_lon, maxlon=max_lon)
+                    if is_verbose:
+                        print(s)
+                    #shutil.copyfile(full_map_cube, work_file_map_rgb_cube)
+            else:
+                os.rename(full_map_cube, work_file_map_rgb_cube)
+            checkpoint.done("maptrim", [work_file_map_rgb_cube])
+
+        out_file_map_rgb_tiff = "%s/%s_Mosaic_RGB%s.tif" % (source_dirname, product_id, output_suffix)
+        work_file_map_rgb_tiff = work.file(os.path.basename(out_file_map_rgb_tiff))
+
+        if not checkpoint.is_done("export"):
+            telemetry.set_stage("export")
+            if is_verbose:
+                print("Exporting Color Map Projected Tiff...")
+            else:
+                printProgress(12, num_steps, prefix="%s: " % from_file_name)
+
+            if trueColor is True:
+                s = importexport.isis2std_rgb(from_cube_red="%s+1"%work_file_map_rgb_cube,
+                                              from_cube_green="%s+3"%work_file_map_rgb_cube,
+                                              from_cube_blue="%s+5"%work_file_map_rgb_cube,
+                                              to_tiff=work_file_map_rgb_tiff,
+                                              match_stretch=True,
+                                              minimum=0,
+                                              maximum=max_value)
+            else:
+                s = importexport.isis2std_rgb(from_cube_red="%s+1"%work_file_map_rgb_cube,
+                                              from_cube_green="%s+3"%work_file_map_rgb_cube,
+                                              from_cube_blue="%s+5"%work_file_map_rgb_cube,
+                                              to_tiff=work_file_map_rgb_tiff)
             if is_verbose:
                 print(s)
-            #shutil.copyfile(full_map_cube, out_file_map_rgb_cube)
-    else:
-        shutil.move(full_map_cube, out_file_map_rgb_cube)
+            checkpoint.done("export", [work_file_map_rgb_cube, work_file_map_rgb_tiff])
 
-    if is_verbose:
-        print("Exporting Color Map Projected Tiff...")
-    else:
-        printProgress(12, num_steps, prefix="%s: " % from_file_name)
-
-    out_file_map_rgb_tiff = "%s/%s_Mosaic_RGB.tif" % (source_dirname, product_id)
-
-    if trueColor is True:
-        s = importexport.isis2std_rgb(from_cube_red="%s+1"%out_file_map_rgb_cube,
-                                      from_cube_green="%s+3"%out_file_map_rgb_cube,
-                                      from_cube_blue="%s+5"%out_file_map_rgb_cube,
-                                      to_tiff=out_file_map_rgb_tiff,
-                                      match_stretch=True,
-                                      minimum=0,
-                                      maximum=max_value)
-    else:
-        s = importexport.isis2std_rgb(from_cube_red="%s+1"%out_file_map_rgb_cube,
-                                      from_cube_green="%s+3"%out_file_map_rgb_cube,
-                                      from_cube_blue="%s+5"%out_file_map_rgb_cube,
-                                      to_tiff=out_file_map_rgb_tiff)
-    if is_verbose:
-        print(s)
+        work.promote(work_file_map_rgb_cube, out_file_map_rgb_cube)
+        work.promote(work_file_map_rgb_tiff, out_file_map_rgb_tiff)
 
-    if nocleanup is False:
-        if is_verbose:
-            print("Cleaning up...")
-        else:
-            printProgress(13, num_steps, prefix="%s: " % from_file_name)
-
-        clean_dir(work_dir, product_id)
-        clean_dir(mapped_dir, product_id)
-
-        if os.path.exists(out_file_red):
-            os.unlink(out_file_red)
-        if os.path.exists(out_file_green):
-            os.unlink(out_file_green)
-        if os.path.exists(out_file_blue):
-            os.unlink(out_file_blue)
-        if os.path.exists(out_file_map_rgb_cube_inputs):
-            os.unlink(out_file_map_rgb_cube_inputs)
-        if os.path.exists(full_map_cube):
-            os.unlink(full_map_cube)
-
-        dirname = os.path.dirname(out_file_red)
-        if len(dirname) > 0:
-            dirname += "/"
-        print ("%sprint.prt"%dirname)
-        if os.path.exists("%sprint.prt"%dirname):
-            os.unlink("%sprint.prt"%dirname)
+        if nocleanup is False:
+            if is_verbose:
+                print("Cleaning up...")
+            else:
+                printProgress(13, num_steps, prefix="%s: " % from_file_name)
+
+            work.cleanup()
 
-    else:
-        if is_verbose:
-            print("Skipping clean up...")
         else:
-            printProgress(14, num_steps, prefix="%s: " % from_file_name)
+            if is_verbose:
+                print("Skipping clean up...")
+            else:
+                printProgress(14, num_steps, prefix="%s: " % from_file_name)
+
+        telemetry.set_stage(None)
 
-    if not is_verbose:
-        printProgress(17, num_steps, prefix="%s: "%from_file_name)
+        if not is_verbose:
+            printProgress(17, num_steps, prefix="%s: "%from_file_name)
 
-    return out_file_map_rgb_tiff
+        return out_file_map_rgb_tiff
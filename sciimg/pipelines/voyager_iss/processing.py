@@ -4,6 +4,7 @@ import os
 import traceback
 import sys
 from sciimg.isis3 import info
+from sciimg.isis3 import detect
 from sciimg.isis3 import voyager
 from sciimg.isis3 import cameras
 from sciimg.isis3 import filters
@@ -12,11 +13,10 @@ from sciimg.isis3 import trimandmask
 from sciimg.isis3 import utility
 from sciimg.isis3 import geometry
 from sciimg.isis3 import importexport
+from sciimg.isis3 import scratch
+from sciimg.isis3.checkpoint import open_checkpoint
 from sciimg.isis3._core import printProgress
 
-__VOYAGER_1__ = "VOYAGER 1"
-__VOYAGER_2__ = "VOYAGER 2"
-
 
 def output_filename(file_name):
     dirname = os.path.dirname(file_name)
@@ -47,18 +47,10 @@ def output_filename(file_name):
 
 
 def is_supported_file(file_name):
-    if file_name[-3:].upper() in ("CUB", "IMQ"):
-        value = info.get_field_value(file_name,  "SpacecraftName", grpname="Instrument")
-        print("Value: ", value)
-        return (value in (__VOYAGER_1__, __VOYAGER_2__))
-    elif file_name[-3:].upper() in ("IMG", "LBL"):
-        value = info.get_field_value(file_name, "SpacecraftName")
-        if value is None:
-            value = info.get_field_value(file_name, "INSTRUMENT_HOST_NAME")
-        print("Value: ", value, file_name)
-        return (value in (__VOYAGER_1__,  __VOYAGER_2__))
-    else:
-        return False
+    """
+    file_name can also be a sciimg.isis3.detect.FileDescriptor
+    """
+    return detect.describe(file_name).mission == detect.Mission.VOYAGER
 
 
 def process_pds_data_file(from_file_name, is_verbose=False, skip_if_cub_exists=False, init_spice=True,  nocleanup=False, additional_options={}):
@@ -80,162 +72,185 @@ def process_pds_data_file(from_file_name, is_verbose=False, skip_if_cub_exists=F
     if source_dirname == "":
         source_dirname = "."
 
-    work_dir = "%s/work" % source_dirname
-    if not os.path.exists(work_dir):
-        os.mkdir(work_dir)
-
-    if is_verbose:
-        print("Importing to cube...")
-    else:
-        printProgress(0, 11, prefix="%s: "%from_file_name)
-    s = voyager.voy2isis(from_file_name, "%s/__%s_raw.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Finding Reseaus...")
-    else:
-        printProgress(1, 11, prefix="%s: "%from_file_name)
-    s = geometry.findrx("%s/__%s_raw.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
+    with scratch.work_dir(source_dirname, product_id, from_file_name, keep=nocleanup) as work:
+        work_dir = work.path
+        work_file_cub = work.file(os.path.basename(out_file_cub))
+        work_file_tiff = work.file(os.path.basename(out_file_tiff))
+        checkpoint = open_checkpoint(work, from_file_name, {"pipeline": "voyager_iss", "init_spice": init_spice, "additional_options": additional_options})
 
-    if is_verbose:
-        print("Removing Reseaus...")
-    else:
-        printProgress(2, 11, prefix="%s: "%from_file_name)
-    s = geometry.remrx("%s/__%s_raw.cub"%(work_dir, product_id),
-                       "%s/__%s_remrx.cub" % (work_dir, product_id),
-                       action="BILINEAR")
-    if is_verbose:
-        print(s)
+        if not checkpoint.is_done("voy2isis"):
+            if is_verbose:
+                print("Importing to cube...")
+            else:
+                printProgress(0, 11, prefix="%s: "%from_file_name)
+            s = voyager.voy2isis(from_file_name, "%s/__%s_raw.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("voy2isis", ["%s/__%s_raw.cub"%(work_dir, product_id)])
 
-    try:
-        if init_spice is True:
+        if not checkpoint.is_done("findrx"):
             if is_verbose:
-                print("Initializing Spice...")
+                print("Finding Reseaus...")
             else:
-                printProgress(3, 11, prefix="%s: "%from_file_name)
-            s = cameras.spiceinit("%s/__%s_remrx.cub" % (work_dir, product_id), is_ringplane)
+                printProgress(1, 11, prefix="%s: "%from_file_name)
+            s = geometry.findrx("%s/__%s_raw.cub"%(work_dir, product_id))
             if is_verbose:
                 print(s)
+            checkpoint.done("findrx", ["%s/__%s_raw.cub"%(work_dir, product_id)])
 
-        if is_verbose:
-            print("Calibrating cube...")
+        if not checkpoint.is_done("remrx"):
+            if is_verbose:
+                print("Removing Reseaus...")
+            else:
+                printProgress(2, 11, prefix="%s: "%from_file_name)
+            s = geometry.remrx("%s/__%s_raw.cub"%(work_dir, product_id),
+                               "%s/__%s_remrx.cub" % (work_dir, product_id),
+                               action="BILINEAR")
+            if is_verbose:
+                print(s)
+            # voycal works from the raw cube
+            checkpoint.done("remrx", ["%s/__%s_raw.cub"%(work_dir, product_id), "%s/__%s_remrx.cub"%(work_dir, product_id)])
+
+        if not checkpoint.is_done("calibrate"):
+            try:
+                if init_spice is True:
+                    if is_verbose:
+                        print("Initializing Spice...")
+                    else:
+                        printProgress(3, 11, prefix="%s: "%from_file_name)
+                    s = cameras.spiceinit("%s/__%s_remrx.cub" % (work_dir, product_id), is_ringplane)
+                    if is_verbose:
+                        print(s)
+
+                if is_verbose:
+                    print("Calibrating cube...")
+                else:
+                    printProgress(4, 11, prefix="%s: "%from_file_name)
+                s = voyager.voycal("%s/__%s_raw.cub"%(work_dir, product_id),
+                                        "%s/__%s_cal.cub"%(work_dir, product_id))
+                if is_verbose:
+                    print(s)
+
+                # TODO: Determine when to run this (on Io approach) and do so
+                #if is_verbose:
+                #    print "Plasma torus irradiation correction..."
+                #else:
+                #    printProgress(4, 11, prefix="%s: "%from_file_name)
+                #s = voyager.voycal("%s/__%s_cal.cub"%(work_dir, product_id),
+                #                        "%s/__%s_ramp.cub"%(work_dir, product_id))
+
+                #if is_verbose:
+                #    print s
+
+                last_cube = "%s/__%s_cal.cub"%(work_dir, product_id)
+            except:
+                if is_verbose:
+                    traceback.print_exc(file=sys.stdout)
+                last_cube = "%s/__%s_remrx.cub" % (work_dir, product_id)
+            checkpoint.done("calibrate", [last_cube], last_cube)
         else:
-            printProgress(4, 11, prefix="%s: "%from_file_name)
-        s = voyager.voycal("%s/__%s_raw.cub"%(work_dir, product_id),
-                                "%s/__%s_cal.cub"%(work_dir, product_id))
-        if is_verbose:
-            print(s)
-
-        # TODO: Determine when to run this (on Io approach) and do so
-        #if is_verbose:
-        #    print "Plasma torus irradiation correction..."
-        #else:
-        #    printProgress(4, 11, prefix="%s: "%from_file_name)
-        #s = voyager.voycal("%s/__%s_cal.cub"%(work_dir, product_id),
-        #                        "%s/__%s_ramp.cub"%(work_dir, product_id))
+            last_cube = checkpoint.value("calibrate")
 
-        #if is_verbose:
-        #    print s
+        if not checkpoint.is_done("fillgap"):
+            if is_verbose:
+                print("Filling in Gaps...")
+            else:
+                printProgress(5, 11, prefix="%s: "%from_file_name)
+            s = mathandstats.fillgap(last_cube,
+                               "%s/__%s_fill.cub" % (work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("fillgap", ["%s/__%s_fill.cub"%(work_dir, product_id)])
 
-        last_cube = "%s/__%s_cal.cub"%(work_dir, product_id)
-    except:
-        if is_verbose:
-            traceback.print_exc(file=sys.stdout)
-        last_cube = "%s/__%s_remrx.cub" % (work_dir, product_id)
+        if not checkpoint.is_done("stretch"):
+            if is_verbose:
+                print("Stretch Fix...")
+            else:
+                printProgress(5, 11, prefix="%s: "%from_file_name)
+            s = utility.stretch("%s/__%s_fill.cub" % (work_dir, product_id),
+                               "%s/__%s_stretch.cub" % (work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("stretch", ["%s/__%s_stretch.cub"%(work_dir, product_id)])
 
-    if is_verbose:
-        print("Filling in Gaps...")
-    else:
-        printProgress(5, 11, prefix="%s: "%from_file_name)
-    s = mathandstats.fillgap(last_cube,
-                       "%s/__%s_fill.cub" % (work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Stretch Fix...")
-    else:
-        printProgress(5, 11, prefix="%s: "%from_file_name)
-    s = utility.stretch("%s/__%s_fill.cub" % (work_dir, product_id),
-                       "%s/__%s_stretch.cub" % (work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Running Noise Filter...")
-    else:
-        printProgress(6, 11, prefix="%s: "%from_file_name)
-    s = filters.noisefilter("%s/__%s_stretch.cub"%(work_dir, product_id),
-                            "%s/__%s_stdz.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Filling in Nulls...")
-    else:
-        printProgress(7, 11, prefix="%s: "%from_file_name)
-    s = filters.lowpass("%s/__%s_stdz.cub"%(work_dir, product_id),
-                        "%s/__%s_fill0.cub"%(work_dir, product_id))
-    if is_verbose:
-        print(s)
-
-    if is_verbose:
-        print("Removing Frame-Edge Noise...")
-    else:
-        printProgress(8, 11, prefix="%s: "%from_file_name)
-    s = trimandmask.trim("%s/__%s_fill0.cub"%(work_dir, product_id),
-                         out_file_cub,
-                         top=2,
-                         right=2,
-                         bottom=2,
-                         left=2)
-    if is_verbose:
-        print(s)
+        if not checkpoint.is_done("noisefilter"):
+            if is_verbose:
+                print("Running Noise Filter...")
+            else:
+                printProgress(6, 11, prefix="%s: "%from_file_name)
+            s = filters.noisefilter("%s/__%s_stretch.cub"%(work_dir, product_id),
+                                    "%s/__%s_stdz.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("noisefilter", ["%s/__%s_stdz.cub"%(work_dir, product_id)])
 
-    """
-    if is_verbose:
-        print "Trimming Corners..."
-    else:
-        printProgress(9, 11, prefix="%s: "%from_file_name)
-    s = trimandmask.circle("%s/__%s_noise.cub" % (work_dir, product_id),
-                        out_file_cub,
-                        rad=500)
-    if is_verbose:
-        print s
-    """
+        if not checkpoint.is_done("lowpass"):
+            if is_verbose:
+                print("Filling in Nulls...")
+            else:
+                printProgress(7, 11, prefix="%s: "%from_file_name)
+            s = filters.lowpass("%s/__%s_stdz.cub"%(work_dir, product_id),
+                                "%s/__%s_fill0.cub"%(work_dir, product_id))
+            if is_verbose:
+                print(s)
+            checkpoint.done("lowpass", ["%s/__%s_fill0.cub"%(work_dir, product_id)])
 
-    if is_verbose:
-        print("Exporting TIFF...")
-    else:
-        printProgress(9, 11, prefix="%s: "%from_file_name)
-    s = importexport.isis2std_grayscale("%s"%(out_file_cub),
-                                    "%s"%(out_file_tiff))
-    if is_verbose:
-        print(s)
+        if not checkpoint.is_done("trim"):
+            if is_verbose:
+                print("Removing Frame-Edge Noise...")
+            else:
+                printProgress(8, 11, prefix="%s: "%from_file_name)
+            s = trimandmask.trim("%s/__%s_fill0.cub"%(work_dir, product_id),
+                                 work_file_cub,
+                                 top=2,
+                                 right=2,
+                                 bottom=2,
+                                 left=2)
+            if is_verbose:
+                print(s)
+            checkpoint.done("trim", [work_file_cub])
 
-    if nocleanup is False:
+        """
         if is_verbose:
-            print("Cleaning up...")
+            print "Trimming Corners..."
         else:
-            printProgress(10, 11, prefix="%s: "%from_file_name)
-        map(os.unlink, glob.glob('%s/__%s*.cub'%(work_dir, product_id)))
-    else:
+            printProgress(9, 11, prefix="%s: "%from_file_name)
+        s = trimandmask.circle("%s/__%s_noise.cub" % (work_dir, product_id),
+                            work_file_cub,
+                            rad=500)
         if is_verbose:
-            print("Skipping clean up...")
+            print s
+        """
+
+        if not checkpoint.is_done("export"):
+            if is_verbose:
+                print("Exporting TIFF...")
+            else:
+                printProgress(9, 11, prefix="%s: "%from_file_name)
+            s = importexport.isis2std_grayscale(work_file_cub,
+                                            work_file_tiff)
+            if is_verbose:
+                print(s)
+            checkpoint.done("export", [work_file_cub, work_file_tiff])
+
+        work.promote(work_file_cub, out_file_cub)
+        work.promote(work_file_tiff, out_file_tiff)
+
+        if nocleanup is False:
+            if is_verbose:
+                print("Cleaning up...")
+            else:
+                printProgress(10, 11, prefix="%s: "%from_file_name)
+            work.cleanup()
         else:
-            printProgress(10, 11, prefix="%s: "%from_file_name)
+            if is_verbose:
+                print("Skipping clean up...")
+            else:
+                printProgress(10, 11, prefix="%s: "%from_file_name)
 
-    dirname = os.path.dirname(out_file_tiff)
-    if len(dirname) > 0:
-        dirname += "/"
-    if os.path.exists("%sprint.prt"%dirname):
-        os.unlink("%sprint.prt"%dirname)
 
 
-    if not is_verbose:
-        printProgress(11, 11, prefix="%s: "%from_file_name)
+        if not is_verbose:
+            printProgress(11, 11, prefix="%s: "%from_file_name)
 
-    return out_file_cub
\ No newline at end of file
+        return out_file_cub
\ No newline at end of file
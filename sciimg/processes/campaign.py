@@ -0,0 +1,247 @@
+import os
+import sys
+import math
+import time
+import json
+import glob
+import shutil
+import subprocess
+import multiprocessing
+from sciimg.isis3 import _core
+from sciimg.isis3 import scratch
+
+
+"""
+Runs many JunoCam products (process_junocam.py, one product directory each) at once under a
+global CPU, memory and disk budget.
+
+A product only uses every core while its framelets are being projected; mosaicking, cubeit and
+export are mostly serial. Rather than a fixed number of products at a time, a new product is
+started whenever the load average is under the CPU budget and there's memory and disk for another
+one, so the serial stages of some products overlap the parallel stages of others. Each product's
+ISIS concurrency is capped so that a handful of products in their parallel stage can't swamp
+the machine.
+
+Products that already have a mosaic are skipped (with skip_existing), failed products are retried
+and a JSON summary of every product is written at the end.
+"""
+
+PRODUCT_OUTPUT_GLOB = "*_Mosaic_RGB.cub"
+LOG_FILE = "process_junocam.log"
+
+# Rough peak footprint of one product
+DEFAULT_PRODUCT_MEMORY = 4 * 1024 * 1024 * 1024
+DEFAULT_PRODUCT_DISK = 20 * 1024 * 1024 * 1024
+
+# Seconds between scheduling passes, and the least time between two product starts (the load
+# average needs time to see the last one)
+POLL_INTERVAL = 1.0
+START_INTERVAL = 10.0
+
+
+class Product:
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(self.path)
+        self.status = "pending"
+        self.attempts = 0
+        self.returncode = None
+        self.wall = 0.0
+        self.log_file = os.path.join(self.path, LOG_FILE)
+        self.proc = None
+        self.started = None
+
+    def has_output(self):
+        return len(glob.glob(os.path.join(self.path, PRODUCT_OUTPUT_GLOB))) > 0
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "path": self.path,
+            "status": self.status,
+            "attempts": self.attempts,
+            "returncode": self.returncode,
+            "wall": self.wall,
+            "log": self.log_file
+        }
+
+
+def product_dir_for_zip(zip_file):
+    """
+    The directory a product's zips are unpacked in: <zip dir>/<product id>, with every zip of that
+    product (ImageSet, Data) linked into it.
+    """
+    zip_file = os.path.abspath(zip_file)
+    zip_dir = os.path.dirname(zip_file)
+    product_id = os.path.basename(zip_file).split("-")[0]
+    product_dir = os.path.join(zip_dir, product_id)
+    if not os.path.exists(product_dir):
+        os.mkdir(product_dir)
+    for f in glob.glob(os.path.join(zip_dir, "%s-*.zip"%product_id)):
+        link = os.path.join(product_dir, os.path.basename(f))
+        if not os.path.exists(link):
+            os.symlink(f, link)
+    return product_dir
+
+
+def find_products(sources):
+    products = []
+    seen = set()
+    for source in sources:
+        if os.path.isdir(source):
+            product_dir = source
+        elif source[-4:].lower() == ".zip" and os.path.exists(source):
+            product_dir = product_dir_for_zip(source)
+        else:
+            print("Not a product directory or zip file. Skipping '%s'"%source)
+            continue
+        product_dir = os.path.abspath(product_dir)
+        if product_dir not in seen:
+            seen.add(product_dir)
+            products.append(Product(product_dir))
+    return products
+
+
+class Budget:
+
+    def __init__(self, cpus=None, memory=None, disk=None, max_jobs=None, product_memory=DEFAULT_PRODUCT_MEMORY, product_disk=DEFAULT_PRODUCT_DISK):
+        self.cpus = cpus if cpus is not None else multiprocessing.cpu_count()
+        self.memory = memory
+        self.disk = disk
+        self.max_jobs = max_jobs if max_jobs is not None else self.cpus
+        self.product_memory = product_memory
+        self.product_disk = product_disk
+
+    def isis_procs_per_product(self):
+        # Twice a fair share, so a product in its parallel stage can use cores others leave idle
+        return max(1, int(math.ceil(2.0 * self.cpus / self.max_jobs)))
+
+    def __memory_free(self, running):
+        available = _core.available_memory()
+        if self.memory is not None:
+            committed = running * self.product_memory
+            available = min(available, self.memory - committed) if available is not None else self.memory - committed
+        return available is None or available >= self.product_memory
+
+    def __disk_free(self, product, running):
+        disk_dir = scratch.get_scratch_dir() or product.path
+        try:
+            free = shutil.disk_usage(disk_dir).free
+        except OSError:
+            return True
+        if self.disk is not None:
+            free = min(free, self.disk - running * self.product_disk)
+        return free >= self.product_disk
+
+    def can_start(self, product, running):
+        if running == 0:
+            return True
+        if running >= self.max_jobs:
+            return False
+        if os.getloadavg()[0] >= self.cpus:
+            return False
+        return self.__memory_free(running) and self.__disk_free(product, running)
+
+    def to_dict(self):
+        return {
+            "cpus": self.cpus,
+            "memory": self.memory,
+            "disk": self.disk,
+            "max_jobs": self.max_jobs,
+            "product_memory": self.product_memory,
+            "product_disk": self.product_disk
+        }
+
+
+def __start(product, command, budget, verbose=False):
+    env = dict(os.environ)
+    env[_core.MAX_ISIS_PROCS_ENV] = str(budget.isis_procs_per_product())
+    if verbose:
+        print("Starting %s (attempt %d)"%(product.name, product.attempts + 1))
+    log = open(product.log_file, "a")
+    try:
+        product.proc = subprocess.Popen(command, cwd=product.path, env=env, stdout=log, stderr=subprocess.STDOUT)
+    finally:
+        log.close()
+    product.attempts += 1
+    product.status = "running"
+    product.started = time.time()
+
+
+def __finish(product, retries, verbose=False):
+    product.returncode = product.proc.returncode
+    product.wall += time.time() - product.started
+    product.proc = None
+    if product.returncode == 0:
+        product.status = "ok"
+    elif product.attempts <= retries:
+        product.status = "pending"
+    else:
+        product.status = "failed"
+    if verbose:
+        print("%s: %s (exit code %s)"%(product.name, product.status if product.status != "pending" else "retrying", product.returncode))
+
+
+def run_campaign(products, command, budget=None, retries=1, skip_existing=False, summary_file=None, verbose=False):
+    """
+    Runs command (e.g. ["process_junocam.py", ...]) in each product directory. Returns the
+    products, each with its status: ok, failed or skipped.
+    """
+    if budget is None:
+        budget = Budget()
+
+    started = time.time()
+    for product in products:
+        if skip_existing and product.has_output():
+            product.status = "skipped"
+            if verbose:
+                print("Skipping %s"%product.name)
+
+    last_start = 0
+    try:
+        while True:
+            running = [p for p in products if p.status == "running"]
+            for product in running:
+                if product.proc.poll() is not None:
+                    __finish(product, retries, verbose)
+
+            running = [p for p in products if p.status == "running"]
+            pending = [p for p in products if p.status == "pending"]
+            if len(running) == 0 and len(pending) == 0:
+                break
+
+            if len(pending) > 0 and (len(running) == 0 or time.time() - last_start >= START_INTERVAL):
+                if budget.can_start(pending[0], len(running)):
+                    __start(pending[0], command, budget, verbose)
+                    last_start = time.time()
+
+            time.sleep(POLL_INTERVAL)
+    finally:
+        for product in products:
+            if product.proc is not None:
+                product.proc.terminate()
+                product.proc.wait()
+                product.status = "failed"
+                product.proc = None
+
+        if summary_file is not None:
+            write_summary(summary_file, products, budget, started, time.time())
+
+    return products
+
+
+def write_summary(summary_file, products, budget, started, finished):
+    counts = {}
+    for product in products:
+        counts[product.status] = counts.get(product.status, 0) + 1
+    summary = {
+        "started": started,
+        "finished": finished,
+        "wall": finished - started,
+        "budget": budget.to_dict(),
+        "counts": counts,
+        "products": [p.to_dict() for p in products]
+    }
+    with open(summary_file, "w") as f:
+        json.dump(summary, f, indent=4)
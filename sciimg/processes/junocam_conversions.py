@@ -39,6 +39,7 @@ def create_pds(output_base, img_file, samples, lines):
 
 
 BAND_HEIGHT = 128
+TRIPLET_HEIGHT = BAND_HEIGHT * 3
 
 def open_image(img_path):
     img = Image.open(img_path)
@@ -85,40 +86,86 @@ def apply_weights(img_data, r, g, b, verbose=False):
 
 
 def round_ints(img_data):
-    for a in range(0, len(img_data)):
-        for b in range(0, len(img_data[a])):
-            img_data[a][b] = round(img_data[a][b])
-
-
-def convert_to_srgb(img_data):
-    for a in range(0, len(img_data)):
-        for b in range(0, len(img_data[a])):
-            c = img_data[a][b]
-            if c < 0.0031308:
-                c = c * 12.92
-            else:
-                c = c ** (1.0 / 2.4) * 1.055 - 0.055
-            img_data[a][b] = c
-
-
-
-
-def png_to_img(img_file, metadata, fill_dead_pixels=True, do_decompand=True, do_flat_fields=False, verbose=False, doSRGB=True, fix_bit_error=True, use_red_weight=0.902, use_green_weight=1.0, use_blue_weight=1.8879):
-    image_data = open_image(img_file)
-
-    if fill_dead_pixels:
-        if verbose:
-            print("User requested to fill dead pixels. So that's what I'll do...")
-        img_data = process_inpaint_fill(image_data, verbose=verbose)
-        ##fillpixels(image_data, verbose=verbose)
-
-    image_data = np.copy(np.asarray(image_data, dtype=np.float32))
-
-    if fix_bit_error:
-        if verbose:
-            print("User requested to fix flipped bits...")
-        fix_flipped_bits(image_data)
-
+    # Half to even, as round()
+    np.rint(img_data, out=img_data)
+
+
+def __srgb_block(block):
+    linear = block < 0.0031308
+    low = block[linear] * 12.92
+    with np.errstate(invalid="ignore"):
+        np.power(block, 1.0 / 2.4, out=block)
+    block *= 1.055
+    block -= 0.055
+    block[linear] = low
+
+
+"""
+    Encodes linear values (0-1) as sRGB, in place and in the array's own type (float32 stays
+    float32). With chunk_lines (TRIPLET_HEIGHT, say), it goes that many lines at a time so the
+    temporaries stay small on very long images.
+"""
+def convert_to_srgb(img_data, chunk_lines=None):
+    if chunk_lines is None or img_data.ndim < 2:
+        __srgb_block(img_data)
+        return
+    for top in range(0, img_data.shape[0], chunk_lines):
+        __srgb_block(img_data[top:top + chunk_lines])
+
+
+
+
+"""
+    Lookup tables taking an 8 bit raw value through decompanding, the filter weight and the sRGB
+    conversion in one go, the same steps as png_to_img's general path. One table per band of a
+    triplet (blue, green, red), and a fourth, unweighted, for lines after the last full triplet,
+    as (4, 256) float32.
+"""
+def radiometric_luts(do_decompand, use_red_weight, use_green_weight, use_blue_weight, max_value, doSRGB=True):
+    luts = np.tile(np.arange(256, dtype=np.float32), (4, 1))
+    if do_decompand:
+        decompand(luts)
+    for band, weight in enumerate((use_blue_weight, use_green_weight, use_red_weight)):
+        luts[band] *= weight
+    if doSRGB is True:
+        luts /= max_value
+        convert_to_srgb(luts)
+        luts *= max_value
+    return luts
+
+
+def apply_radiometric_luts(indexes, luts, band_height=BAND_HEIGHT):
+    """
+    Looks up 8 bit raw values (uint8) a framelet at a time. Returns float32.
+    """
+    img_height = indexes.shape[0]
+    full_triplets = int(img_height / band_height / 3)
+    out = np.empty(indexes.shape, dtype=np.float32)
+    for top in range(0, img_height, band_height):
+        band = int(top / band_height)
+        lut = luts[band % 3] if band < full_triplets * 3 else luts[3]
+        out[top:top + band_height] = lut[indexes[top:top + band_height]]
+    if full_triplets > 0:
+        out[:, 0:8] = 0.0 # As apply_weights
+    return out
+
+
+def __lut_indexes(image_data, do_decompand):
+    """
+    image_data as uint8 table indexes, or None if it has values the tables can't take. Decompanding
+    rounds values anyway, but without it they have to be whole already.
+    """
+    indexes = np.rint(image_data)
+    if not np.isfinite(indexes).all():
+        return None
+    if not do_decompand and not np.array_equal(indexes, image_data):
+        return None
+    if indexes.min() < 0 or indexes.max() > 255:
+        return None
+    return indexes.astype(np.uint8)
+
+
+def __apply_radiometry(image_data, fill_dead_pixels, do_decompand, do_flat_fields, verbose, doSRGB, use_red_weight, use_green_weight, use_blue_weight, max_value):
     if do_decompand:
         if verbose:
             print("Decompanding pixel values...")
@@ -133,16 +180,51 @@ def png_to_img(img_file, metadata, fill_dead_pixels=True, do_decompand=True, do_
         print("Applying filter weights...")
     apply_weights(image_data, use_red_weight, use_green_weight, use_blue_weight, verbose=verbose)
 
-
-    # 5436
-    max_value = (float(SQROOT[-1]) * np.array([use_red_weight, use_green_weight, use_blue_weight]).max())
-
     if doSRGB is True:
         if verbose:
             print("Applying sRGB Conversion...")
         image_data /= max_value
-        convert_to_srgb(image_data)
+        convert_to_srgb(image_data, chunk_lines=TRIPLET_HEIGHT)
         image_data *= max_value
+    return image_data
+
+
+"""
+    With use_luts, everything from decompanding to the sRGB conversion is a lookup on the 8 bit raw
+    values (see radiometric_luts). That's not possible with flat fields, or if fixing flipped bits
+    leaves values that aren't whole, and then each step is run over the image in turn.
+"""
+def png_to_img(img_file, metadata, fill_dead_pixels=True, do_decompand=True, do_flat_fields=False, verbose=False, doSRGB=True, fix_bit_error=True, use_red_weight=0.902, use_green_weight=1.0, use_blue_weight=1.8879, use_luts=True):
+    image_data = open_image(img_file)
+
+    if fill_dead_pixels:
+        if verbose:
+            print("User requested to fill dead pixels. So that's what I'll do...")
+        img_data = process_inpaint_fill(image_data, verbose=verbose)
+        ##fillpixels(image_data, verbose=verbose)
+
+    # 5436
+    max_value = (float(SQROOT[-1]) * np.array([use_red_weight, use_green_weight, use_blue_weight]).max())
+
+    indexes = image_data if use_luts is True and not do_flat_fields else None
+
+    if fix_bit_error or indexes is None:
+        image_data = np.copy(np.asarray(image_data, dtype=np.float32))
+
+    if fix_bit_error:
+        if verbose:
+            print("User requested to fix flipped bits...")
+        fix_flipped_bits(image_data, verbose=verbose)
+        if indexes is not None:
+            indexes = __lut_indexes(image_data, do_decompand)
+
+    if indexes is not None:
+        if verbose:
+            print("Decompanding, applying filter weights%s through lookup tables..."%(" and sRGB conversion" if doSRGB is True else ""))
+        luts = radiometric_luts(do_decompand, use_red_weight, use_green_weight, use_blue_weight, max_value, doSRGB)
+        image_data = apply_radiometric_luts(indexes, luts)
+    else:
+        image_data = __apply_radiometry(image_data, fill_dead_pixels, do_decompand, do_flat_fields, verbose, doSRGB, use_red_weight, use_green_weight, use_blue_weight, max_value)
 
     output_base = img_file[:-4]
     output_base = "%s-adjusted" % output_base
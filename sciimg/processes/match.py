@@ -4,6 +4,8 @@ import os
 from sciimg.isis3 import info
 import sciimg.isis3.importexport as importexport
 import sciimg.isis3.mathandstats as mathandstats
+from sciimg.isis3 import cubestats
+from sciimg.isis3 import workers
 from sciimg.isis3 import utils
 
 
@@ -14,30 +16,49 @@ def get_file_min_max_values(cub_file, is_verbose=False):
     return min_value, max_value
 
 
-def get_files_min_max_values(file_names, is_verbose=False):
-    data_limits = []
+def __native_file_stats(args):
+    file_name, bands = args
+    try:
+        return cubestats.cube_stats(file_name, bands=bands)
+    except:
+        return None
 
-    for file_name in file_names:
-        min_value, max_value = get_file_min_max_values(file_name, is_verbose=is_verbose)
-        data_limits += [min_value, max_value]
 
-    files_min = float(np.array(data_limits).min())
-    files_max = float(np.array(data_limits).max())
+def get_files_min_max_values(file_names, is_verbose=False, bands=None, num_threads=1):
+    per_file = workers.map_items(__native_file_stats, [(file_name, bands) for file_name in file_names], num_threads)
 
-    return files_min, files_max
+    merged = {}
+    data_limits = []
+    for file_name, results in zip(file_names, per_file):
+        if results is None:
+            # Not something the native reader handles (i.e. a detached label or file+band). Let ISIS do it.
+            for band in (bands if bands is not None else [-1]):
+                min_value, max_value = mathandstats.get_data_min_max(file_name, band)
+                if is_verbose is True:
+                    print("File %s min/max: %s, %s"%(file_name, min_value, max_value))
+                data_limits += [min_value, max_value]
+            continue
+        for band, stats in results.items():
+            if band in merged:
+                merged[band].merge(stats)
+            else:
+                merged[band] = stats
 
+    if is_verbose is True:
+        for band in sorted(merged.keys()):
+            print("Band %s min/max: %s, %s"%(band, merged[band].minimum, merged[band].maximum))
+
+    stats = cubestats.merge_bands(merged)
+    if stats is not None and stats.count > 0:
+        data_limits += [stats.minimum, stats.maximum]
+    if len(data_limits) == 0:
+        return 0.0, 0.0
+    return float(np.min(data_limits)), float(np.max(data_limits))
 
 
-def match(files, band=1):
-    values = []
-    for f in files:
-        _min, _max = mathandstats.get_data_min_max(f, band)
-        values.append(_min)
-        values.append(_max)
-        print(_min, _max)
 
-    minimum = np.min(values)
-    maximum = np.max(values)
+def match(files, band=1):
+    minimum, maximum = get_files_min_max_values(files, bands=[band])
 
     print("Minimun:", minimum, "Maximum:", maximum)
     # maximum -= ((maximum - minimum) * 0.45)
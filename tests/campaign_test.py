@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from sciimg.processes import campaign
+
+
+# Fails on its first run in a directory named *_FLAKY, then writes the product's mosaic
+FAKE_PROCESS = """
+import os, sys
+name = os.path.basename(os.getcwd())
+if name.endswith("_FLAKY") and not os.path.exists("attempted"):
+    open("attempted", "w").close()
+    sys.exit(3)
+if name.endswith("_BROKEN"):
+    sys.exit(2)
+open("%s_Mosaic_RGB.cub" % name, "w").close()
+"""
+
+
+class TestCampaign(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.poll_interval = campaign.POLL_INTERVAL
+        self.start_interval = campaign.START_INTERVAL
+        campaign.POLL_INTERVAL = 0.01
+        campaign.START_INTERVAL = 0.0
+
+    def tearDown(self):
+        campaign.POLL_INTERVAL = self.poll_interval
+        campaign.START_INTERVAL = self.start_interval
+        shutil.rmtree(self.base_dir)
+
+    def __product(self, name):
+        path = os.path.join(self.base_dir, name)
+        os.mkdir(path)
+        return path
+
+    def test_run(self):
+        dirs = [self.__product(n) for n in ("JNCE_A", "JNCE_B_FLAKY", "JNCE_C_BROKEN", "JNCE_D")]
+        open(os.path.join(dirs[3], "JNCE_D_Mosaic_RGB.cub"), "w").close()
+        summary_file = os.path.join(self.base_dir, "summary.json")
+
+        products = campaign.find_products(dirs)
+        campaign.run_campaign(products, [sys.executable, "-c", FAKE_PROCESS], campaign.Budget(cpus=2),
+                              retries=1, skip_existing=True, summary_file=summary_file)
+
+        assert [p.status for p in products] == ["ok", "ok", "failed", "skipped"]
+        assert [p.attempts for p in products] == [1, 2, 2, 0]
+        assert products[2].returncode == 2
+
+        with open(summary_file, "r") as f:
+            summary = json.load(f)
+        assert summary["counts"] == {"ok": 2, "failed": 1, "skipped": 1}
+        assert summary["products"][1]["name"] == "JNCE_B_FLAKY"
+
+    def test_zip_products(self):
+        for suffix in ("ImageSet.zip", "Data.zip"):
+            open(os.path.join(self.base_dir, "JNCE_2019202_21C00020_V01-%s"%suffix), "w").close()
+        products = campaign.find_products([os.path.join(self.base_dir, "JNCE_2019202_21C00020_V01-ImageSet.zip"),
+                                           os.path.join(self.base_dir, "JNCE_2019202_21C00020_V01-Data.zip")])
+        assert len(products) == 1
+        assert sorted(os.listdir(products[0].path)) == ["JNCE_2019202_21C00020_V01-Data.zip", "JNCE_2019202_21C00020_V01-ImageSet.zip"]
+
+
+if __name__ == "__main__":
+    unittest.main()
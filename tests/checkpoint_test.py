@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+from sciimg.isis3 import scratch
+from sciimg.isis3 import checkpoint
+
+
+class TestIsis3Checkpoint(unittest.TestCase):
+
+    CASSINI_LBL_FILE = "tests/data/N1489034146_2.LBL"
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        scratch.set_resume(True)
+
+    def tearDown(self):
+        scratch.set_resume(False)
+        shutil.rmtree(self.base_dir)
+
+    def __run(self, fail_at=None, options={}):
+        """
+        Three steps, each writing a file; returns the steps that ran
+        """
+        ran = []
+        try:
+            with scratch.work_dir(self.base_dir, "N1489034146") as work:
+                cp = checkpoint.open_checkpoint(work, TestIsis3Checkpoint.CASSINI_LBL_FILE, options)
+                for step in ("import", "calibrate", "export"):
+                    if not cp.is_done(step):
+                        ran.append(step)
+                        if step == fail_at:
+                            raise Exception("%s failed"%step)
+                        with open(work.file("%s.cub"%step), "w") as f:
+                            f.write(step)
+                        cp.done(step, [work.file("%s.cub"%step)], len(ran))
+                self.values = [cp.value(step) for step in ("import", "calibrate", "export")]
+        except Exception:
+            pass
+        return ran
+
+    def test_resume(self):
+        assert self.__run(fail_at="export") == ["import", "calibrate", "export"]
+        work_path = scratch.find_resumable(self.base_dir, "N1489034146")
+        assert work_path is not None
+        assert self.__run() == ["export"]
+        assert self.values == [1, 2, 1]
+        assert scratch.find_resumable(self.base_dir, "N1489034146") is None
+
+    def test_resume_at_intact_step(self):
+        self.__run(fail_at="export")
+        os.unlink(os.path.join(scratch.find_resumable(self.base_dir, "N1489034146"), "calibrate.cub"))
+        assert self.__run() == ["calibrate", "export"]
+
+    def test_options_changed(self):
+        self.__run(fail_at="export", options={"ringplane": "false"})
+        assert self.__run(options={"ringplane": "true"}) == ["import", "calibrate", "export"]
+
+    def test_disabled(self):
+        scratch.set_resume(False)
+        self.__run(fail_at="export")
+        assert os.listdir(os.path.join(self.base_dir, "work")) == []
+        assert self.__run() == ["import", "calibrate", "export"]
+
+
+if __name__ == "__main__":
+    unittest.main()
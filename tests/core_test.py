@@ -0,0 +1,49 @@
+import os
+import sys
+import stat
+import shutil
+import asyncio
+import tempfile
+import unittest
+from sciimg.isis3 import _core
+from sciimg.isis3 import telemetry
+
+
+class TestIsis3AsyncCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.trace_file = os.path.join(self.tmp_dir, "trace.jsonl")
+        # Stands in for an ISIS application: burns a little CPU and memory and echoes its arguments
+        self.app = os.path.join(self.tmp_dir, "fakeapp")
+        with open(self.app, "w") as f:
+            f.write("#!%s\n"%sys.executable)
+            f.write("import sys\n")
+            f.write("data = bytearray(16 * 1024 * 1024)\n")
+            f.write("total = sum(range(200000))\n")
+            f.write("print(' '.join(sys.argv[1:]))\n")
+        os.chmod(self.app, os.stat(self.app).st_mode | stat.S_IXUSR)
+        telemetry.set_trace_file(self.trace_file)
+
+    def tearDown(self):
+        telemetry.set_trace_file(None)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_async_trace_has_rusage(self):
+        output = asyncio.run(_core.isis_command_async(self.app, {"from": "in.cub", "to": "out.cub"}))
+        self.assertIn("from=in.cub", output)
+
+        records = telemetry.load_trace(self.trace_file)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["returncode"], 0)
+        self.assertIsNotNone(records[0]["cpu_user"])
+        self.assertIsNotNone(records[0]["cpu_system"])
+        self.assertGreater(records[0]["max_rss_kb"], 0)
+
+    def test_async_failure(self):
+        with self.assertRaises(Exception):
+            asyncio.run(_core.isis_command_async(os.path.join(self.tmp_dir, "missing"), {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from sciimg.isis3 import cube
+from sciimg.isis3 import labels
+
+
+class TestIsis3Cube(unittest.TestCase):
+
+    GALILEO_CUB_FILE = "tests/data/6300R_IO_GREEN_1999-11-26.cub"
+    VOYAGER_CUB_FILE = "tests/data/c4400436.cub"
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_read_tile_unsigned_byte(self):
+        with cube.Cube(TestIsis3Cube.VOYAGER_CUB_FILE) as c:
+            assert c.format == cube.FORMAT_TILE
+            data = c.read(1)
+            assert data.shape == (800, 800)
+            assert data.dtype == np.float32
+            assert np.nanmin(data) >= 1.0 and np.nanmax(data) <= 254.0
+            assert np.isnan(data).sum() == (~c.valid_mask(c.dn(1))).sum()
+
+    def test_read_tile_real(self):
+        with cube.Cube(TestIsis3Cube.GALILEO_CUB_FILE) as c:
+            assert c.pixel_type == "Real"
+            data = c.read()
+            assert data.shape == (1, 800, 800)
+            assert np.isnan(data).sum() > 0
+            assert np.nanmax(data) < 1.0
+
+    def test_read_tile_lines(self):
+        with cube.Cube(TestIsis3Cube.VOYAGER_CUB_FILE) as c:
+            assert c.format == cube.FORMAT_TILE
+            whole = c.read(1)
+            for lines in (slice(0, 1), slice(100, 300), slice(c.tile_lines - 1, c.tile_lines + 1),
+                          slice(700, 800), slice(790, 900), slice(10, 200, 7), slice(300, 300)):
+                np.testing.assert_array_equal(c.read(1, lines=lines), whole[lines])
+            np.testing.assert_array_equal(c.read(lines=slice(5, 9)), c.read()[:, 5:9])
+
+    def test_tile_write(self):
+        to_file = os.path.join(self.work_dir, "tile.cub")
+        shutil.copyfile(TestIsis3Cube.GALILEO_CUB_FILE, to_file)
+        values = np.arange(800 * 800, dtype=np.float32).reshape(800, 800)
+        values[0, 0] = np.nan
+        with cube.Cube(to_file, mode="r+") as c:
+            c.write(1, values)
+        with cube.Cube(to_file) as c:
+            np.testing.assert_array_equal(c.read(1), values)
+
+    def test_create_from_template(self):
+        to_file = os.path.join(self.work_dir, "new.cub")
+        with cube.Cube(TestIsis3Cube.VOYAGER_CUB_FILE) as template:
+            data = template.read(1)
+
+        with cube.create(to_file, 800, 800, bands=2, pixel_type="SignedWord", template=TestIsis3Cube.VOYAGER_CUB_FILE, multiplier=0.5) as c:
+            c.write(1, data)
+
+        with cube.Cube(to_file) as c:
+            assert c.format == cube.FORMAT_BANDSEQUENTIAL
+            assert c.bands == 2
+            np.testing.assert_array_equal(c.read(1), data)
+            assert np.isnan(c.read(2)).all()
+
+        assert labels.getkey(to_file, "SpacecraftName", grpname="Instrument") == "VOYAGER_2"
+        history = labels.load_label(to_file).find_object("History")
+        with open(to_file, "rb") as f:
+            f.seek(int(history["StartByte"]) - 1)
+            assert f.read(int(history["Bytes"])).startswith(b"Object = voy2isis")
+
+
+if __name__ == "__main__":
+    unittest.main()
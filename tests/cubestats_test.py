@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from sciimg.isis3 import cube
+from sciimg.isis3 import cubestats
+from sciimg.isis3 import mathandstats
+
+
+class TestIsis3CubeStats(unittest.TestCase):
+
+    GALILEO_CUB_FILE = "tests/data/6300R_IO_GREEN_1999-11-26.cub"
+    VOYAGER_CUB_FILE = "tests/data/c4400436.cub"
+
+    def __valid_values(self, file_name):
+        with cube.Cube(file_name) as c:
+            data = c.read(1)
+        return data[~np.isnan(data)]
+
+    def test_matches_numpy(self):
+        values = self.__valid_values(TestIsis3CubeStats.GALILEO_CUB_FILE)
+        stats = cubestats.cube_stats(TestIsis3CubeStats.GALILEO_CUB_FILE, block_lines=100)[1]
+        assert stats.count == values.size
+        assert stats.minimum == float(values.min())
+        assert stats.maximum == float(values.max())
+        self.assertAlmostEqual(stats.mean, float(values.mean(dtype=np.float64)), places=6)
+        self.assertAlmostEqual(stats.std(), float(values.std(ddof=1, dtype=np.float64)), places=6)
+
+    def test_histogram_integer_cube(self):
+        stats = cubestats.cube_stats(TestIsis3CubeStats.VOYAGER_CUB_FILE)[1]
+        assert stats.histogram is not None
+        assert stats.histogram.sum() == stats.count
+
+    def test_merge_across_files(self):
+        files = [TestIsis3CubeStats.VOYAGER_CUB_FILE, TestIsis3CubeStats.GALILEO_CUB_FILE]
+        values = np.concatenate([self.__valid_values(f).astype(np.float64) for f in files])
+        stats = cubestats.merge_bands(cubestats.files_stats(files, num_threads=2))
+        assert stats.count == values.size
+        self.assertAlmostEqual(stats.mean, values.mean(), places=6)
+        self.assertAlmostEqual(stats.std(), values.std(ddof=1), places=6)
+        assert cubestats.files_min_max(files) == (float(values.min()), float(values.max()))
+
+    def test_get_data_min_max(self):
+        values = self.__valid_values(TestIsis3CubeStats.VOYAGER_CUB_FILE)
+        assert mathandstats.get_data_min_max(TestIsis3CubeStats.VOYAGER_CUB_FILE, 1) == (values.min(), values.max())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+from sciimg.pipelines.junocam import decompanding
+
+
+class TestJunoCamDecompanding(unittest.TestCase):
+
+    TABLES = (decompanding.CompandingTableEnum.SQROOT,
+              decompanding.CompandingTableEnum.LIN1,
+              decompanding.CompandingTableEnum.LIN8,
+              decompanding.CompandingTableEnum.LIN16)
+
+    def __reference(self, img_data, table):
+        ctable = decompanding.companding_table(table)
+        out = np.copy(img_data)
+        for a in range(0, len(out)):
+            for b in range(0, len(out[a])):
+                out[a][b] = ctable[int(round(out[a][b]))]
+        return out
+
+    def test_matches_loop(self):
+        rng = np.random.RandomState(1)
+        img = rng.uniform(0, 255, (40, 60)).astype(np.float32)
+        img[0, :4] = (0.5, 1.5, 2.5, 254.5) # Ties round to even, as with round()
+        for table in TestJunoCamDecompanding.TABLES:
+            expected = self.__reference(img, table)
+            in_place = np.copy(img)
+            assert decompanding.decompand(in_place, table) is in_place
+            np.testing.assert_array_equal(in_place, expected)
+            np.testing.assert_array_equal(decompanding.decompanded(img, table), expected)
+
+    def test_uint8(self):
+        img = np.arange(256, dtype=np.uint8).reshape(16, 16)
+        out = decompanding.decompanded(img)
+        assert out.dtype == np.float32
+        np.testing.assert_array_equal(out.ravel(), decompanding.SQROOT)
+        assert img[15, 15] == 255
+
+    def test_in_place_needs_float(self):
+        with self.assertRaises(Exception):
+            decompanding.decompand(np.zeros((2, 2), dtype=np.uint8))
+
+    def test_invalid_table(self):
+        with self.assertRaises(Exception):
+            decompanding.decompanded(np.zeros((2, 2)), "LIN2")
+
+
+if __name__ == '__main__':
+    unittest.main()
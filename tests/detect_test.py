@@ -0,0 +1,37 @@
+import unittest
+from sciimg.isis3 import detect
+import sciimg.pipelines.cassini_iss.processing as cassproc
+import sciimg.pipelines.galileo_iss.processing as galproc
+import sciimg.pipelines.voyager_iss.processing as voyproc
+
+
+class TestIsis3Detect(unittest.TestCase):
+
+    CASSINI_LBL_FILE = "tests/data/N1489034146_2.LBL"
+    GALILEO_LBL_FILE = "tests/data/6300r.lbl"
+    GALILEO_CUB_FILE = "tests/data/6300R_IO_GREEN_1999-11-26.cub"
+    VOYAGER_CUB_FILE = "tests/data/c4400436.cub"
+
+    def test_describe(self):
+        assert detect.describe(TestIsis3Detect.CASSINI_LBL_FILE).mission == detect.Mission.CASSINI
+        assert detect.describe(TestIsis3Detect.GALILEO_LBL_FILE).mission == detect.Mission.GALILEO
+        assert detect.describe(TestIsis3Detect.GALILEO_CUB_FILE).mission == detect.Mission.GALILEO
+        assert detect.describe(TestIsis3Detect.VOYAGER_CUB_FILE).mission == detect.Mission.VOYAGER
+
+    def test_unsupported(self):
+        assert detect.describe("tests/data/N1489034146_2.IMG").mission is None
+        assert detect.describe("tests/data/does_not_exist.LBL").mission is None
+        assert detect.describe(None).is_supported() is False
+
+    def test_descriptor_cached(self):
+        assert detect.describe(TestIsis3Detect.GALILEO_CUB_FILE) is detect.describe(TestIsis3Detect.GALILEO_CUB_FILE)
+
+    def test_pipelines_accept_descriptor(self):
+        descriptor = detect.describe(TestIsis3Detect.VOYAGER_CUB_FILE)
+        assert voyproc.is_supported_file(descriptor) is True
+        assert cassproc.is_supported_file(descriptor) is False
+        assert galproc.is_supported_file(descriptor) is False
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import numpy as np
+from sciimg.pipelines.junocam import fillpixels
+from sciimg.pipelines.junocam.corrections import DEAD_PIXEL_MAP
+
+
+def reference_fill_dead_pixel(data, band_num, band_id, band_height=128):
+    """
+    The per-pixel loop fill_dead_pixel used to be
+    """
+    top = band_num * band_height
+    for dead_pixel in DEAD_PIXEL_MAP[band_id]:
+        cx = dead_pixel[0]
+        cy = dead_pixel[1] + top
+        radius = dead_pixel[2]
+        for y in range(-radius, radius):
+            for x in range(-radius, radius):
+                if cy + y >= len(data) or cx + radius > len(data[cy + y]):
+                    continue
+                try:
+                    x0 = data[cy + y][cx - radius]
+                    x1 = data[cy + y][cx + radius]
+                    y0 = data[cy - radius][cx + x]
+                    y1 = data[cy + radius][cx + x]
+                    fx = ((x + radius) / (radius * 2.0))
+                    fy = ((y + radius) / (radius * 2.0))
+                    ix = fillpixels.linear_interpolate(x0, x1, fx)
+                    iy = fillpixels.linear_interpolate(y0, y1, fy)
+                    data[cy + y][cx + x] = np.mean([ix, iy])
+                except:
+                    pass
+
+
+def reference_fillpixels(img_data):
+    for band in range(0, int(img_data.shape[0] / 128 / 3)):
+        reference_fill_dead_pixel(img_data, band * 3 + 0, 0)
+        reference_fill_dead_pixel(img_data, band * 3 + 1, 1)
+        reference_fill_dead_pixel(img_data, band * 3 + 2, 2)
+
+
+class TestJunoCamFillPixels(unittest.TestCase):
+
+    def __image(self, dtype, lines=2 * 384 + 100):
+        rng = np.random.RandomState(3)
+        return rng.uniform(0, 255, (lines, 1648)).astype(dtype)
+
+    def test_matches_loop_uint8(self):
+        img = self.__image(np.uint8)
+        expected = np.copy(img)
+        reference_fillpixels(expected)
+        fillpixels.fillpixels(img)
+        assert (img != self.__image(np.uint8)).any()
+        np.testing.assert_array_equal(img, expected)
+
+    def test_matches_loop_float32(self):
+        img = self.__image(np.float32)
+        expected = np.copy(img)
+        reference_fillpixels(expected)
+        fillpixels.fillpixels(img)
+        np.testing.assert_array_equal(img, expected)
+
+    def test_single_band(self):
+        img = self.__image(np.uint8, lines=384)
+        expected = np.copy(img)
+        reference_fill_dead_pixel(expected, 1, 1)
+        fillpixels.fill_dead_pixel(img, 1, 1)
+        np.testing.assert_array_equal(img, expected)
+
+    def test_non_contiguous(self):
+        img = self.__image(np.float32, lines=384)
+        expected = np.copy(img)
+        reference_fillpixels(expected)
+        wide = np.zeros((384, 1648 * 2), dtype=np.float32)
+        wide[:, ::2] = img
+        view = wide[:, ::2]
+        fillpixels.fillpixels(view)
+        np.testing.assert_array_equal(view, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+import itertools as it
+from scipy import signal
+from sciimg.pipelines.junocam import flippedbits
+
+
+class TestJunoCamFlippedBits(unittest.TestCase):
+
+    def __reference(self, image_data):
+        image_data = np.copy(image_data)
+        md = signal.medfilt2d(image_data, kernel_size=3)
+        for a, b in it.product(range(1, image_data.shape[0] - 1), range(1, image_data.shape[1] - 1)):
+            if abs(image_data[a][b] - md[a][b]) > 10.0:
+                image_data[a][b] = np.nan
+        for a in range(1, image_data.shape[0] - 1):
+            x = image_data[a]
+            not_nan = np.logical_not(np.isnan(x))
+            indices = np.arange(len(x))
+            image_data[a] = np.interp(indices, indices[not_nan], x[not_nan])
+        return image_data
+
+    def __image(self, lines, samples, seed=0):
+        rng = np.random.RandomState(seed)
+        img = np.rint(rng.normal(60.0, 4.0, (lines, samples)))
+        flipped = rng.uniform(0, 1, img.shape) < 0.02
+        img[flipped] += rng.choice([-32.0, 16.0, 64.0, 128.0], np.count_nonzero(flipped))
+        return np.clip(img, 0, 255).astype(np.float32)
+
+    def test_matches_loop(self):
+        img = self.__image(100, 90)
+        expected = self.__reference(img)
+        fixed = np.copy(img)
+        mask = flippedbits.fix_flipped_bits(fixed, strip_lines=24, num_threads=3)
+        np.testing.assert_array_equal(fixed, expected)
+        np.testing.assert_array_equal(mask, fixed != img)
+        assert np.count_nonzero(mask) > 0
+
+    def test_strips_match_whole_image(self):
+        img = self.__image(70, 50, seed=2)
+        expected = signal.medfilt2d(img, kernel_size=5)
+        for strip_lines in (1, 7, 35, 70, 200):
+            np.testing.assert_array_equal(flippedbits.median_filter(img, 5, strip_lines, 2), expected)
+
+    def test_edges_untouched(self):
+        img = np.full((10, 12), 50.0, dtype=np.float32)
+        img[0, 5] = img[9, 5] = img[4, 0] = img[4, 11] = 250.0
+        img[4, 6] = 250.0
+        fixed = np.copy(img)
+        mask = flippedbits.fix_flipped_bits(fixed)
+        assert mask.sum() == 1 and mask[4, 6]
+        assert fixed[4, 6] == 50.0
+        assert fixed[0, 5] == fixed[9, 5] == fixed[4, 0] == fixed[4, 11] == 250.0
+
+    def test_threshold(self):
+        img = np.full((5, 5), 50.0, dtype=np.float32)
+        img[2, 2] = 70.0
+        assert flippedbits.flipped_bits_mask(img, threshold=30.0).sum() == 0
+        assert flippedbits.flipped_bits_mask(img, threshold=10.0)[2, 2]
+
+    def test_unmasked_nan(self):
+        img = np.full((3, 6), 10.0, dtype=np.float32)
+        img[1] = (0.0, np.nan, 2.0, 3.0, 4.0, 5.0)
+        mask = np.zeros(img.shape, dtype=bool)
+        mask[1, 2] = True
+        flippedbits.interpolate_lines(img, mask)
+        assert np.isnan(img[1, 1])
+        assert img[1, 2] == 2.0
+
+    def test_nan_run(self):
+        img = np.full((3, 8), 10.0, dtype=np.float32)
+        img[1] = (0.0, 1.0, np.nan, np.nan, np.nan, 5.0, np.nan, 7.0)
+        flippedbits.interpolate_lines(img, np.isnan(img))
+        np.testing.assert_array_equal(img[1], np.arange(8, dtype=np.float32))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from sciimg.pipelines.junocam import junocam
+from sciimg.pipelines.junocam import footprint
+
+
+class EdgeOfDiskCamera:
+    """
+    Sees the target only on the left half of the strip
+    """
+
+    def sincpt_for_sensor_xy(self, et, x, y, target="JUPITER"):
+        if x > junocam.JUNOCAM_STRIP_WIDTH / 2.0:
+            raise junocam.SurfaceNotFoundException()
+        return (0, 0, 0), et, (0, 0, 0)
+
+    def surface_coords_for_sensor_xy(self, et, x, y, target="JUPITER"):
+        self.sincpt_for_sensor_xy(et, x, y, target)
+        return 71492.0, x / 100.0, y / 10.0
+
+
+class TestJunoCamFootprint(unittest.TestCase):
+
+    def test_sample_points(self):
+        assert len(footprint.FRAMELET_SAMPLE_POINTS) == 9
+        assert (0, 0) in footprint.FRAMELET_SAMPLE_POINTS
+        assert (junocam.JUNOCAM_STRIP_WIDTH - 1, junocam.JUNOCAM_STRIP_HEIGHT - 1) in footprint.FRAMELET_SAMPLE_POINTS
+
+    def test_coverage(self):
+        assert footprint.framelet_coverage(EdgeOfDiskCamera(), 0.0, "EUROPA") == 6
+
+    def test_footprint(self):
+        min_lat, max_lat, min_lon, max_lon = footprint.framelet_footprint(EdgeOfDiskCamera(), 0.0)
+        assert (min_lat, max_lat, min_lon) == (0.0, 12.7, 0.0)
+        assert max_lon < junocam.JUNOCAM_STRIP_WIDTH / 200.0
+
+    def test_intersects_roi(self):
+        assert footprint.intersects_roi((10.0, 20.0, 100.0, 120.0), (15.0, 30.0, 110.0, 130.0))
+        assert not footprint.intersects_roi((10.0, 20.0, 100.0, 120.0), (40.0, 50.0, 100.0, 120.0))
+        # Within the margin
+        assert footprint.intersects_roi((10.0, 20.0, 100.0, 120.0), (21.0, 30.0, 100.0, 120.0))
+        # Across the longitude seam
+        assert footprint.intersects_roi((10.0, 20.0, 170.0, 179.0), (10.0, 20.0, -185.0, -175.0))
+        assert footprint.intersects_roi((10.0, 20.0, -60.0, -50.0), (10.0, 20.0, 295.0, 305.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
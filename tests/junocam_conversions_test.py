@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+from sciimg.processes import junocam_conversions
+
+
+class TestJunoCamConversions(unittest.TestCase):
+
+    WEIGHTS = (0.902, 1.0, 1.8879)
+
+    def __general(self, raw, do_decompand, doSRGB, max_value):
+        image_data = raw.astype(np.float32)
+        if do_decompand:
+            junocam_conversions.decompand(image_data)
+        junocam_conversions.apply_weights(image_data, *TestJunoCamConversions.WEIGHTS)
+        if doSRGB:
+            image_data /= max_value
+            junocam_conversions.convert_to_srgb(image_data)
+            image_data *= max_value
+        return image_data
+
+    def test_luts_match_general_path(self):
+        rng = np.random.RandomState(0)
+        max_value = float(junocam_conversions.SQROOT[-1]) * max(TestJunoCamConversions.WEIGHTS)
+        # Two full triplets and part of a third
+        raw = rng.randint(0, 256, (2 * 384 + 200, 64)).astype(np.uint8)
+        for do_decompand in (True, False):
+            for doSRGB in (True, False):
+                luts = junocam_conversions.radiometric_luts(do_decompand, *TestJunoCamConversions.WEIGHTS, max_value=max_value, doSRGB=doSRGB)
+                assert luts.shape == (4, 256)
+                fused = junocam_conversions.apply_radiometric_luts(raw, luts)
+                np.testing.assert_array_equal(fused, self.__general(raw, do_decompand, doSRGB, max_value))
+
+    def test_srgb_matches_loop(self):
+        rng = np.random.RandomState(1)
+        img = rng.uniform(-0.01, 1.0, (2 * 384 + 50, 40)).astype(np.float32)
+        img[0, :4] = (0.0, 0.0031308, 0.003, 1.0)
+
+        expected = np.copy(img)
+        for a in range(0, len(expected)):
+            for b in range(0, len(expected[a])):
+                c = expected[a][b]
+                expected[a][b] = c * 12.92 if c < 0.0031308 else c ** (1.0 / 2.4) * 1.055 - 0.055
+
+        converted = np.copy(img)
+        junocam_conversions.convert_to_srgb(converted)
+        assert converted.dtype == np.float32
+        np.testing.assert_allclose(converted, expected, rtol=1e-6, atol=1e-7)
+
+        chunked = np.copy(img)
+        junocam_conversions.convert_to_srgb(chunked, chunk_lines=junocam_conversions.TRIPLET_HEIGHT)
+        np.testing.assert_array_equal(chunked, converted)
+
+    def test_round_ints(self):
+        img = np.array([[0.5, 1.5, 2.5, -0.5], [2.4, 2.6, -1.6, 7.0]], dtype=np.float32)
+        junocam_conversions.round_ints(img)
+        np.testing.assert_array_equal(img, [[0.0, 2.0, 2.0, 0.0], [2.0, 3.0, -2.0, 7.0]])
+        assert img.dtype == np.float32
+
+
+if __name__ == '__main__':
+    unittest.main()
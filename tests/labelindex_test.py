@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pvl
+from sciimg.isis3.labelindex import LabelIndex
+from sciimg.isis3 import labelindex
+
+
+class TestIsis3LabelIndex(unittest.TestCase):
+
+    LBL_FILE = "tests/data/N1489034146_2.LBL"
+    CUB_FILE = "tests/data/6300R_IO_GREEN_1999-11-26.cub"
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, "labels.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_shared_between_instances(self):
+        label = pvl.load(TestIsis3LabelIndex.CUB_FILE)
+        LabelIndex(self.db_path).put(TestIsis3LabelIndex.CUB_FILE, label)
+
+        other = LabelIndex(self.db_path)
+        loaded = other.get(TestIsis3LabelIndex.CUB_FILE)
+        assert loaded is not None
+        assert loaded["IsisCube"]["Instrument"]["TargetName"] == "IO"
+        assert loaded["IsisCube"]["Instrument"]["ExposureDuration"] == label["IsisCube"]["Instrument"]["ExposureDuration"]
+        assert type(loaded["IsisCube"]["Instrument"]) == type(label["IsisCube"]["Instrument"])
+
+    def test_invalidated_when_file_changes(self):
+        lbl_file = os.path.join(self.tmp_dir, "test.LBL")
+        shutil.copyfile(TestIsis3LabelIndex.LBL_FILE, lbl_file)
+
+        index = LabelIndex(self.db_path)
+        index.put(lbl_file, pvl.load(lbl_file))
+        assert index.get(lbl_file) is not None
+
+        with open(lbl_file, "a") as f:
+            f.write("\n")
+        assert index.get(lbl_file) is None
+        assert LabelIndex(self.db_path).get(lbl_file) is None
+
+    def test_memory_entries_bounded(self):
+        index = LabelIndex(None, max_entries=1)
+        index.put(TestIsis3LabelIndex.LBL_FILE, pvl.load(TestIsis3LabelIndex.LBL_FILE))
+        index.put(TestIsis3LabelIndex.CUB_FILE, pvl.load(TestIsis3LabelIndex.CUB_FILE))
+        assert len(index) == 1
+        assert index.get(TestIsis3LabelIndex.LBL_FILE) is None
+        assert index.get(TestIsis3LabelIndex.CUB_FILE) is not None
+
+    def test_json_round_trip(self):
+        for file_name in (TestIsis3LabelIndex.LBL_FILE, TestIsis3LabelIndex.CUB_FILE, "tests/data/6300r.lbl", "tests/data/c4400436.cub"):
+            label = pvl.load(file_name)
+            data = labelindex.serialize_label(label)
+            assert type(data) == str
+            loaded = labelindex.deserialize_label(data)
+            assert loaded == label
+            assert repr(loaded) == repr(label)
+
+    def test_stored_entries_bounded(self):
+        index = LabelIndex(self.db_path, max_stored=2)
+        files = []
+        for i in range(3):
+            lbl_file = os.path.join(self.tmp_dir, "test%d.LBL"%i)
+            shutil.copyfile(TestIsis3LabelIndex.LBL_FILE, lbl_file)
+            index.put(lbl_file, pvl.load(lbl_file))
+            files.append(lbl_file)
+
+        other = LabelIndex(self.db_path)
+        assert other.get(files[0]) is None
+        assert other.get(files[1]) is not None
+        assert other.get(files[2]) is not None
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import struct
+import shutil
+import tempfile
+import unittest
+from sciimg.isis3 import labels
+from sciimg.isis3 import scripting
+
+
+class TestIsis3Labels(unittest.TestCase):
+
+    CASSINI_LBL_FILE = "tests/data/N1489034146_2.LBL"
+    GALILEO_LBL_FILE = "tests/data/6300r.lbl"
+    GALILEO_CUB_FILE = "tests/data/6300R_IO_GREEN_1999-11-26.cub"
+    VOYAGER_CUB_FILE = "tests/data/c4400436.cub"
+    VOYAGER_IMQ_FILE = "tests/data/c4400436.imq"
+
+    def test_getkey_cub_group(self):
+        assert labels.getkey(TestIsis3Labels.VOYAGER_CUB_FILE, "SpacecraftName", grpname="Instrument") == "VOYAGER_2"
+        assert labels.getkey(TestIsis3Labels.GALILEO_CUB_FILE, "SpacecraftName", grpname="Instrument") == "Galileo Orbiter"
+
+    def test_getkey_cub_object_and_group(self):
+        assert labels.getkey(TestIsis3Labels.GALILEO_CUB_FILE, "Lines", objname="Core", grpname="Dimensions") == "800"
+
+    def test_getkey_lbl_root(self):
+        assert labels.getkey(TestIsis3Labels.CASSINI_LBL_FILE, "INSTRUMENT_HOST_NAME") == "CASSINI ORBITER"
+        assert labels.getkey(TestIsis3Labels.GALILEO_LBL_FILE, "SPACECRAFT_NAME") == "GALILEO ORBITER"
+
+    def test_getkey_lbl_object(self):
+        assert labels.getkey(TestIsis3Labels.GALILEO_LBL_FILE, "LINES", objname="IMAGE") == "800"
+
+    def test_getkey_units_stripped(self):
+        assert labels.getkey(TestIsis3Labels.CASSINI_LBL_FILE, "DETECTOR_TEMPERATURE") == "-89.243546"
+
+    def test_getkey_array(self):
+        assert labels.getkey(TestIsis3Labels.CASSINI_LBL_FILE, "FILTER_NAME") == "(CL1, IR3)"
+
+    def test_getkey_missing(self):
+        assert labels.getkey(TestIsis3Labels.CASSINI_LBL_FILE, "SpacecraftName") is None
+        assert labels.getkey(TestIsis3Labels.VOYAGER_CUB_FILE, "SpacecraftName", grpname="Mapping") is None
+
+    def test_scripting_getkey_returns_str(self):
+        value = scripting.getkey(TestIsis3Labels.GALILEO_CUB_FILE, "TargetName", grpname="Instrument")
+        assert type(value) == str
+        assert value == "IO"
+
+    def test_imq_label(self):
+        text = labels.read_imq_label_text(TestIsis3Labels.VOYAGER_IMQ_FILE)
+        assert text.startswith("CCSD3ZF0000100000001NJPL3IF0PDS200000001 = SFDU_LABEL\n")
+        assert text.endswith("END\n")
+        assert labels.getkey(TestIsis3Labels.VOYAGER_IMQ_FILE, "SPACECRAFT_NAME") == "VOYAGER_2"
+        assert labels.getkey(TestIsis3Labels.VOYAGER_IMQ_FILE, "ENCODING_TYPE", objname="IMAGE") == "HUFFMAN_FIRST_DIFFERENCE"
+
+    def test_scripting_getkey_imq(self):
+        assert scripting.getkey(TestIsis3Labels.VOYAGER_IMQ_FILE, "SpacecraftName", grpname="Instrument") == "VOYAGER_2"
+        assert scripting.getkey(TestIsis3Labels.VOYAGER_IMQ_FILE, "IMAGE_ID") == "1739S2-001"
+
+    def test_scripting_getkey_imq_array(self):
+        work_dir = tempfile.mkdtemp()
+        try:
+            imq_file = os.path.join(work_dir, "array.imq")
+            with open(imq_file, "wb") as f:
+                for line in ("SPACECRAFT_NAME = VOYAGER_2", "FILTER_NAME = (CLEAR, ORANGE)", "END"):
+                    record = line.encode("latin-1")
+                    f.write(struct.pack("<H", len(record)) + record + (b"\x00" if len(record) & 1 else b""))
+            value = scripting.getkey(imq_file, "FILTER_NAME")
+            assert type(value) == str
+            assert value == "(CLEAR, ORANGE)"
+        finally:
+            shutil.rmtree(work_dir)
+
+    def test_malformed_label(self):
+        with self.assertRaises(labels.LabelParseException):
+            labels.parse_label("Object = IsisCube\n  = 5\nEnd_Object\nEnd\n")
+        with self.assertRaises(labels.LabelParseException):
+            labels.parse_label("SAMPLES = 5\n\x1c=\x00\x01")
+
+    def test_label_cache_bounded(self):
+        cache = vars(labels)["__LABEL_CACHE__"]
+        cache.clear()
+        saved = labels.MAX_CACHED_LABELS
+        labels.MAX_CACHED_LABELS = 2
+        try:
+            for file_name in (TestIsis3Labels.CASSINI_LBL_FILE, TestIsis3Labels.GALILEO_LBL_FILE, TestIsis3Labels.GALILEO_CUB_FILE):
+                labels.load_label(file_name)
+            assert labels.getkey(TestIsis3Labels.CASSINI_LBL_FILE, "INSTRUMENT_HOST_NAME") == "CASSINI ORBITER"
+            assert len(cache) == 2
+        finally:
+            labels.MAX_CACHED_LABELS = saved
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from sciimg.isis3 import cube
+from sciimg.isis3 import labels
+from sciimg.isis3 import mapmosaic
+
+
+class TestIsis3MapMosaic(unittest.TestCase):
+
+    RESOLUTION = 1000.0
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def __projected(self, name, sample, line, values, filter_name="RED", resolution=RESOLUTION):
+        """
+        A map projected cube whose upper left pixel is at (sample, line) of the grid
+        """
+        lines, samples = values.shape
+        mapping = labels.parse_label("\n".join([
+            "Group = Mapping",
+            "  ProjectionName = Equirectangular",
+            "  TargetName = Jupiter",
+            "  PixelResolution = %s <meters/pixel>"%resolution,
+            "  UpperLeftCornerX = %s <meters>"%(sample * resolution),
+            "  UpperLeftCornerY = %s <meters>"%(-line * resolution),
+            "  MinimumLatitude = %s"%(-line - lines),
+            "  MaximumLatitude = %s"%(-line),
+            "  MinimumLongitude = %s"%sample,
+            "  MaximumLongitude = %s"%(sample + samples),
+            "End_Group",
+            "Group = BandBin",
+            "  FilterName = %s"%filter_name,
+            "End_Group",
+            "End"
+        ]))
+        file_name = os.path.join(self.work_dir, "%s.cub"%name)
+        groups = [labels.format_group(mapping.find_group("Mapping")), labels.format_group(mapping.find_group("BandBin"))]
+        with cube.create(file_name, samples, lines, groups=groups) as c:
+            c.write(1, values)
+        return file_name
+
+    def test_average(self):
+        a = np.full((4, 6), 2.0, dtype=np.float32)
+        a[0, 0] = np.nan
+        b = np.full((5, 3), 4.0, dtype=np.float32)
+        red = [self.__projected("a", 10, 20, a), self.__projected("b", 14, 22, b)]
+        out_file = os.path.join(self.work_dir, "red_mosaic.cub")
+
+        mapmosaic.mosaic({"RED": red}, {"RED": out_file}, block_lines=2)
+
+        expected = np.full((7, 7), np.nan, dtype=np.float32)
+        expected[0:4, 0:6] = a
+        expected[2:7, 4:7] = np.where(np.isnan(expected[2:7, 4:7]), b, (expected[2:7, 4:7] + b) / 2.0)
+        count = np.zeros((7, 7), dtype=np.float32)
+        count[0:4, 0:6] += 1
+        count[0, 0] = 0
+        count[2:7, 4:7] += 1
+
+        with cube.Cube(out_file) as c:
+            assert c.bands == 2
+            np.testing.assert_array_equal(c.read(1), expected)
+            np.testing.assert_array_equal(c.read(2), count)
+            mapping = c.label.find_group("Mapping")
+            assert float(mapping["UpperLeftCornerX"]) == 10 * TestIsis3MapMosaic.RESOLUTION
+            assert float(mapping["UpperLeftCornerY"]) == -20 * TestIsis3MapMosaic.RESOLUTION
+            assert float(mapping["MinimumLatitude"]) == -27.0
+            assert float(mapping["MaximumLongitude"]) == 17.0
+            assert mapping["ProjectionName"] == "Equirectangular"
+            assert c.label.find_group("BandBin")["FilterName"] == "RED"
+
+    def test_colors_share_area(self):
+        red = [self.__projected("r", 0, 0, np.ones((3, 3), dtype=np.float32))]
+        green = [self.__projected("g", 5, 1, np.ones((2, 2), dtype=np.float32), "GREEN")]
+        outputs = {
+            "RED": os.path.join(self.work_dir, "red_mosaic.cub"),
+            "GREEN": os.path.join(self.work_dir, "green_mosaic.cub")
+        }
+        mapmosaic.mosaic({"RED": red, "GREEN": green}, outputs, num_threads=2)
+
+        with cube.Cube(outputs["RED"]) as r, cube.Cube(outputs["GREEN"]) as g:
+            assert (r.samples, r.lines) == (g.samples, g.lines) == (7, 3)
+            assert np.nansum(r.read(1)) == 9
+            assert np.nansum(g.read(1)) == 4
+            assert np.isnan(g.read(1)[0, 5])
+            assert g.read(1)[1, 5] == 1.0
+
+    def test_off_grid(self):
+        a = self.__projected("a", 0, 0, np.ones((2, 2), dtype=np.float32))
+        b = self.__projected("b", 3.5, 0, np.ones((2, 2), dtype=np.float32))
+        with self.assertRaises(mapmosaic.MapMosaicException):
+            mapmosaic.mosaic({"RED": [a, b]}, {"RED": os.path.join(self.work_dir, "out.cub")})
+
+    def test_mismatched_resolution(self):
+        a = self.__projected("a", 0, 0, np.ones((2, 2), dtype=np.float32))
+        b = self.__projected("b", 0, 0, np.ones((2, 2), dtype=np.float32), resolution=2000.0)
+        with self.assertRaises(mapmosaic.MapMosaicException):
+            mapmosaic.mosaic({"RED": [a, b]}, {"RED": os.path.join(self.work_dir, "out.cub")})
+
+
+if __name__ == '__main__':
+    unittest.main()
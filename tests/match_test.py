@@ -0,0 +1,69 @@
+import os
+import sys
+import stat
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from sciimg.isis3 import cube
+from sciimg.processes import match
+
+
+class TestMatchMinMax(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        # Stands in for ISIS stats, which files the native reader can't open go to
+        self.calls_file = os.path.join(self.work_dir, "stats_calls")
+        stats_app = os.path.join(self.work_dir, "stats")
+        with open(stats_app, "w") as f:
+            f.write("#!%s\n"%sys.executable)
+            f.write("import sys\n")
+            f.write("open(%r, 'a').write(' '.join(sys.argv[1:]) + '\\n')\n"%self.calls_file)
+            f.write("print('Group = Results')\n")
+            f.write("print('  Minimum = -5.0')\n")
+            f.write("print('  Maximum = 300.0')\n")
+            f.write("print('End_Group')\n")
+        os.chmod(stats_app, os.stat(stats_app).st_mode | stat.S_IXUSR)
+        self.saved_path = os.environ["PATH"]
+        os.environ["PATH"] = self.work_dir + os.pathsep + self.saved_path
+
+    def tearDown(self):
+        os.environ["PATH"] = self.saved_path
+        shutil.rmtree(self.work_dir)
+
+    def __cube(self, name, values):
+        file_name = os.path.join(self.work_dir, name)
+        with cube.create(file_name, values.shape[1], values.shape[0]) as c:
+            c.write(1, values)
+        return file_name
+
+    def __stats_calls(self):
+        if not os.path.exists(self.calls_file):
+            return []
+        with open(self.calls_file) as f:
+            return [line.strip() for line in f.readlines()]
+
+    def test_native(self):
+        a = self.__cube("a.cub", np.array([[1.0, 2.0], [3.0, np.nan]], dtype=np.float32))
+        b = self.__cube("b.cub", np.array([[10.0, 0.5]], dtype=np.float32))
+        assert match.get_files_min_max_values([a, b]) == (0.5, 10.0)
+        assert self.__stats_calls() == []
+
+    def test_falls_back_to_isis(self):
+        a = self.__cube("a.cub", np.array([[1.0, 2.0]], dtype=np.float32))
+        detached = os.path.join(self.work_dir, "detached.lbl")
+        with open(detached, "w") as f:
+            f.write("Object = IsisCube\n  ^Core = detached.dat\nEnd_Object\nEnd\n")
+
+        assert match.get_files_min_max_values([a, detached]) == (-5.0, 300.0)
+        assert self.__stats_calls() == ["from=%s"%detached]
+
+    def test_band_attribute(self):
+        a = self.__cube("a.cub", np.array([[1.0, 2.0]], dtype=np.float32))
+        assert match.get_files_min_max_values(["%s+1"%a]) == (-5.0, 300.0)
+        assert self.__stats_calls() == ["from=%s+1"%a]
+
+
+if __name__ == '__main__':
+    unittest.main()
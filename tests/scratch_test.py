@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+from sciimg.isis3 import scratch
+
+
+class TestIsis3Scratch(unittest.TestCase):
+
+    CASSINI_LBL_FILE = "tests/data/N1489034146_2.LBL"
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.source_dir = os.path.join(self.base_dir, "source")
+        self.scratch_dir = os.path.join(self.base_dir, "scratch")
+        self.spill_dir = os.path.join(self.base_dir, "spill")
+        for d in (self.source_dir, self.scratch_dir, self.spill_dir):
+            os.mkdir(d)
+
+    def tearDown(self):
+        scratch.set_scratch_dir(None)
+        shutil.rmtree(self.base_dir)
+
+    def test_default_under_source(self):
+        with scratch.work_dir(self.source_dir, "N1489034146") as work:
+            assert os.path.dirname(work.path) == os.path.join(self.source_dir, "work")
+            assert os.path.isdir(work.subdir("mapped"))
+        assert not os.path.exists(work.path)
+
+    def test_scratch_then_spill(self):
+        scratch.set_scratch_dir(self.scratch_dir, 1024 * 1024, self.spill_dir)
+        with scratch.work_dir(self.source_dir, "first") as first:
+            assert first.path.startswith(self.scratch_dir)
+            with open(first.file("__first_raw.cub"), "wb") as f:
+                f.write(b"\0" * 1024 * 1024)
+            with scratch.work_dir(self.source_dir, "second", TestIsis3Scratch.CASSINI_LBL_FILE) as second:
+                assert second.path.startswith(self.spill_dir)
+
+    def test_cleanup_on_exception(self):
+        scratch.set_scratch_dir(self.scratch_dir)
+        try:
+            with scratch.work_dir(self.source_dir, "failed") as work:
+                open(work.file("__failed_raw.cub"), "w").close()
+                raise Exception("ISIS failed")
+        except Exception:
+            pass
+        assert os.listdir(self.scratch_dir) == []
+
+    def test_runs_isolated(self):
+        with scratch.work_dir(self.source_dir, "same") as first:
+            with scratch.work_dir(self.source_dir, "same") as second:
+                assert first.path != second.path
+                assert os.environ[scratch.ISIS_PREFERENCES_ENV] == second.file(scratch.ISIS_PREFERENCES_FILE)
+            assert os.environ[scratch.ISIS_PREFERENCES_ENV] == first.file(scratch.ISIS_PREFERENCES_FILE)
+            assert os.path.isdir(first.path)
+        assert scratch.ISIS_PREFERENCES_ENV not in os.environ
+
+    def test_promote(self):
+        scratch.set_scratch_dir(self.scratch_dir)
+        out_file = os.path.join(self.source_dir, "product.cub")
+        with scratch.work_dir(self.source_dir, "product") as work:
+            with open(work.file("product.cub"), "w") as f:
+                f.write("cube")
+            work.promote(work.file("product.cub"), out_file)
+            assert not os.path.exists(work.file("product.cub"))
+        with open(out_file, "r") as f:
+            assert f.read() == "cube"
+
+    def test_keep(self):
+        with scratch.work_dir(self.source_dir, "kept", keep=True) as work:
+            pass
+        assert os.path.isdir(work.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
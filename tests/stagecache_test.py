@@ -0,0 +1,86 @@
+import io
+import os
+import glob
+import shutil
+import tempfile
+import unittest
+import contextlib
+from sciimg.isis3 import stagecache
+
+
+class TestIsis3StageCache(unittest.TestCase):
+
+    GALILEO_CUB_FILE = "tests/data/6300R_IO_GREEN_1999-11-26.cub"
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        stagecache.set_cache_dir(os.path.join(self.work_dir, "cache"))
+        self.runs = 0
+
+    def tearDown(self):
+        stagecache.set_cache_dir(None)
+        shutil.rmtree(self.work_dir)
+
+    def __copy_runner(self, cmd, params):
+        self.runs += 1
+        shutil.copyfile(params["from"], params["to"])
+        return "ran %s"%cmd
+
+    def test_hit_restores_output(self):
+        to_file = os.path.join(self.work_dir, "a.cub")
+        params = {"from": TestIsis3StageCache.GALILEO_CUB_FILE, "to": to_file, "units": "I/F"}
+
+        assert stagecache.run_cached("cisscal", params, self.__copy_runner) == "ran cisscal"
+        os.unlink(to_file)
+
+        params["to"] = os.path.join(self.work_dir, "b.cub")
+        assert stagecache.run_cached("cisscal", params, self.__copy_runner) == "ran cisscal"
+        assert self.runs == 1
+        assert os.path.getsize(params["to"]) == os.path.getsize(TestIsis3StageCache.GALILEO_CUB_FILE)
+
+    def test_params_and_input_change_key(self):
+        params = {"from": TestIsis3StageCache.GALILEO_CUB_FILE, "to": os.path.join(self.work_dir, "a.cub"), "units": "I/F"}
+        key = stagecache.cache_key("cisscal", params)
+
+        assert stagecache.cache_key("cisscal", dict(params, to="other.cub")) == key
+        assert stagecache.cache_key("cisscal", dict(params, units="DN")) != key
+        assert stagecache.cache_key("voycal", params) != key
+
+        changed = os.path.join(self.work_dir, "changed.cub")
+        shutil.copyfile(TestIsis3StageCache.GALILEO_CUB_FILE, changed)
+        assert stagecache.cache_key("cisscal", dict(params, **{"from": changed})) == key
+        with open(changed, "r+b") as f:
+            f.seek(-1, 2)
+            f.write(b"\x01")
+        assert stagecache.cache_key("cisscal", dict(params, **{"from": changed})) != key
+
+    def test_eviction_bounds_size(self):
+        for units in ("A", "B", "C"):
+            params = {"from": TestIsis3StageCache.GALILEO_CUB_FILE, "to": os.path.join(self.work_dir, "%s.cub"%units), "units": units}
+            stagecache.run_cached("cisscal", params, self.__copy_runner)
+
+        entry_size = os.path.getsize(TestIsis3StageCache.GALILEO_CUB_FILE)
+        stagecache.evict(max_bytes=int(entry_size * 1.5))
+        entries = glob.glob(os.path.join(stagecache.get_cache_dir(), "??", "*", stagecache.MANIFEST_FILE))
+        assert len(entries) == 1
+
+    def test_broken_entry_is_a_quiet_miss(self):
+        params = {"from": TestIsis3StageCache.GALILEO_CUB_FILE, "to": os.path.join(self.work_dir, "a.cub"), "units": "I/F"}
+        stagecache.run_cached("cisscal", params, self.__copy_runner)
+        key = stagecache.cache_key("cisscal", params)
+        manifest_file = glob.glob(os.path.join(stagecache.get_cache_dir(), "??", key, stagecache.MANIFEST_FILE))[0]
+        with open(manifest_file, "w") as f:
+            f.write("{")
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            assert stagecache.fetch("cisscal", params, key) is None
+        assert out.getvalue() == ""
+
+        with contextlib.redirect_stdout(out):
+            assert stagecache.fetch("cisscal", params, key, verbose=True) is None
+        assert "Traceback" in out.getvalue()
+
+
+if __name__ == "__main__":
+    unittest.main()
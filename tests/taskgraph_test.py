@@ -0,0 +1,55 @@
+import os
+import asyncio
+import unittest
+from sciimg.isis3 import _core
+from sciimg.isis3 import taskgraph
+
+
+class TestIsis3TaskGraph(unittest.TestCase):
+
+    def test_dependencies_run_first(self):
+        order = []
+        graph = taskgraph.TaskGraph()
+
+        def step(name, value, delay=0.0):
+            async def run(*deps):
+                await asyncio.sleep(delay)
+                order.append(name)
+                return value + sum(deps)
+            return run
+
+        graph.add("slow", step("slow", 1, delay=0.05))
+        graph.add("fast", step("fast", 2))
+        graph.add("after_fast", step("after_fast", 10), ("fast",))
+        graph.add("join", step("join", 100), ("slow", "after_fast"))
+
+        results = asyncio.run(graph.run())
+        assert results == {"slow": 1, "fast": 2, "after_fast": 12, "join": 113}
+        # after_fast doesn't wait on the unrelated slow task
+        assert order == ["fast", "after_fast", "slow", "join"]
+
+    def test_failure_propagates(self):
+        graph = taskgraph.TaskGraph()
+
+        async def fail():
+            raise Exception("failed")
+
+        async def ok(*deps):
+            return 1
+
+        graph.add("fail", fail)
+        graph.add("dependent", ok, ("fail",))
+        graph.add("independent", ok)
+
+        results = asyncio.run(graph.run())
+        assert isinstance(results["fail"], Exception)
+        assert results["dependent"] is results["fail"]
+        assert results["independent"] == 1
+
+    def test_unknown_dependency(self):
+        graph = taskgraph.TaskGraph()
+        self.assertRaises(taskgraph.TaskGraphException, graph.add, "a", None, ("b",))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import time
+import unittest
+from sciimg.isis3 import telemetry
+
+
+class TestIsis3Telemetry(unittest.TestCase):
+
+    def setUp(self):
+        telemetry.reset_stage_times()
+
+    def tearDown(self):
+        telemetry.set_stage(None)
+        telemetry.reset_stage_times()
+
+    def test_stage_times(self):
+        telemetry.set_stage("import")
+        time.sleep(0.05)
+        telemetry.set_stage("export")
+        time.sleep(0.02)
+        telemetry.set_stage("import")
+        time.sleep(0.05)
+        telemetry.set_stage(None)
+
+        times = telemetry.stage_times()
+        self.assertEqual(sorted(times.keys()), ["export", "import"])
+        self.assertGreaterEqual(times["import"], 0.1)
+        self.assertGreaterEqual(times["export"], 0.02)
+        self.assertLess(times["export"], times["import"])
+        self.assertIsNone(telemetry.get_stage())
+
+    def test_current_stage_counted(self):
+        telemetry.set_stage("framelets")
+        time.sleep(0.02)
+        self.assertGreaterEqual(telemetry.stage_times()["framelets"], 0.02)
+        self.assertEqual(telemetry.get_stage(), "framelets")
+
+    def test_summarize_by_stage(self):
+        records = [
+            {"app": "cam2map", "stage": "framelets", "wall": 2.0},
+            {"app": "cam2map", "stage": "framelets", "wall": 1.0, "returncode": 1},
+            {"app": "cubeit", "stage": "cubeit", "wall": 0.5}
+        ]
+        summary = telemetry.summarize(records, "stage")
+        self.assertEqual(summary["framelets"]["calls"], 2)
+        self.assertEqual(summary["framelets"]["failures"], 1)
+        self.assertEqual(summary["framelets"]["wall"], 3.0)
+        self.assertEqual(summary["framelets"]["wall_max"], 2.0)
+        self.assertEqual(summary["cubeit"]["calls"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import unittest
+import threading
+from sciimg.isis3 import workers
+
+
+def set_worker_tag(tag):
+    os.environ["SCIIMG_WORKER_TEST_TAG"] = tag
+
+
+def worker_info(x):
+    return x * 2, os.environ.get("SCIIMG_WORKER_TEST_TAG"), os.getpid()
+
+
+class TestIsis3Workers(unittest.TestCase):
+
+    def tearDown(self):
+        workers.shutdown()
+
+    def test_map_in_order(self):
+        results = workers.map_items(worker_info, range(10), 2)
+        assert [r[0] for r in results] == list(range(0, 20, 2))
+        assert os.getpid() not in [r[2] for r in results]
+
+    def test_pool_reused(self):
+        pool = workers.get_pool(2)
+        workers.map_items(worker_info, range(4), 2)
+        assert workers.get_pool(2) is pool
+        assert workers.get_pool(1) is pool
+
+    def test_initializer(self):
+        workers.add_initializer(set_worker_tag, ("initialized",))
+        try:
+            results = workers.map_items(worker_info, range(4), 2)
+            assert set([r[1] for r in results]) == set(["initialized"])
+        finally:
+            workers.clear_initializers()
+
+    def test_single_worker_runs_here(self):
+        assert workers.map_items(worker_info, [1], 4)[0][2] == os.getpid()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Times mapping small jobs over python worker processes the way the stages used to (a new
+multiprocessing.Pool per call, closed afterwards) against the shared pool in sciimg.isis3.workers,
+which is started once and reused. The difference is the pool start up cost paid on every call.
+"""
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from sciimg.isis3 import workers
+
+
+def job(seed):
+    """
+    A little numpy work, standing in for the per-file stats a stage maps over its cubes
+    """
+    rng = np.random.RandomState(seed)
+    data = rng.uniform(0, 1, (256, 256))
+    return float(np.min(data)), float(np.max(data))
+
+
+def per_call_pools(calls, items, num_workers):
+    for i in range(0, calls):
+        pool = multiprocessing.Pool(num_workers)
+        pool.map(job, range(0, items))
+        pool.close()
+        pool.join()
+
+
+def shared_pool(calls, items, num_workers):
+    for i in range(0, calls):
+        workers.map_items(job, range(0, items), num_workers)
+
+
+def cold_start(num_workers, repeat):
+    """
+    Best time to start the shared pool and get a first answer back from each worker
+    """
+    best = None
+    for i in range(0, repeat):
+        workers.shutdown()
+        elapsed = time_call(lambda: workers.get_pool(num_workers).map(abs, range(0, num_workers)))
+        best = elapsed if best is None else min(best, elapsed)
+    workers.shutdown()
+    return best
+
+
+def time_call(func, repeat=1):
+    best = None
+    for i in range(0, repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--calls", help="Number of map calls (stages x products)", required=False, type=int, default=20)
+    parser.add_argument("-i", "--items", help="Items mapped per call", required=False, type=int, default=8)
+    parser.add_argument("-w", "--workers", help="Worker processes", required=False, type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("-r", "--repeat", help="Best of this many runs", required=False, type=int, default=3)
+    args = parser.parse_args()
+
+    num_workers = max(2, min(args.workers, args.items))
+    print("%d calls of %d items on %d workers"%(args.calls, args.items, num_workers))
+
+    start_time = cold_start(num_workers, args.repeat)
+    per_call_time = time_call(lambda: per_call_pools(args.calls, args.items, num_workers), args.repeat)
+    shared_time = time_call(lambda: shared_pool(args.calls, args.items, num_workers), args.repeat)
+    workers.shutdown()
+
+    print("    %-24s %9.3f s"%("pool start up", start_time))
+    print("    %-24s %9.3f s  %8.1fx"%("pool per call", per_call_time, 1.0))
+    print("    %-24s %9.3f s  %8.1fx"%("shared pool", shared_time, per_call_time / shared_time if shared_time > 0 else float("inf")))